@@ -0,0 +1,114 @@
+"""Incrementally maintained summary aggregates over the inventory table.
+
+Triggers on inventory keep three small tables up to date on every write:
+
+* inventory_location_stats - per-location drug count, total quantity and
+  number of low-stock rows
+* inventory_drug_stats     - per-drug total quantity across locations
+* inventory_expiry_stats   - number of inventory rows per expiry date
+
+/inventory/summary reads only these tables, so its cost depends on the
+number of locations rather than the size of inventory.
+"""
+import sqlite3
+from typing import List
+
+# Threshold used by the dashboard's lowStockCount figure. The triggers from
+# migration 3 use the same value; changing it needs a new migration.
+SUMMARY_LOW_STOCK_THRESHOLD = 50
+
+# Full recomputation from inventory; used to backfill and to verify the
+# incrementally maintained tables.
+RECOMPUTE_QUERIES = {
+    "inventory_location_stats": (
+        f"""
+        SELECT location, COUNT(*), SUM(quantity), SUM(quantity < {SUMMARY_LOW_STOCK_THRESHOLD})
+        FROM inventory GROUP BY location
+        """,
+        "SELECT location, drug_types, total_quantity, low_stock_count FROM inventory_location_stats",
+    ),
+    "inventory_drug_stats": (
+        "SELECT drug_name, COUNT(*), SUM(quantity) FROM inventory GROUP BY drug_name",
+        "SELECT drug_name, location_count, total_quantity FROM inventory_drug_stats",
+    ),
+    "inventory_expiry_stats": (
+        "SELECT expiry_date, COUNT(*) FROM inventory WHERE expiry_date IS NOT NULL GROUP BY expiry_date",
+        "SELECT expiry_date, item_count FROM inventory_expiry_stats",
+    ),
+}
+
+
+def rebuild(conn: sqlite3.Connection):
+    """Recompute every aggregate table from inventory (caller commits)."""
+    for table, (recompute_sql, _) in RECOMPUTE_QUERIES.items():
+        conn.execute(f"DELETE FROM {table}")
+        rows = conn.execute(recompute_sql).fetchall()
+        if rows:
+            placeholders = ", ".join("?" * len(rows[0]))
+            conn.executemany(f"INSERT INTO {table} VALUES ({placeholders})", rows)
+
+
+def check_consistency(conn: sqlite3.Connection) -> List[dict]:
+    """Compare the aggregate tables against a full recompute.
+
+    Returns one entry per mismatching key; an empty list means consistent.
+    """
+    mismatches = []
+    for table, (recompute_sql, stored_sql) in RECOMPUTE_QUERIES.items():
+        expected = {row[0]: tuple(row[1:]) for row in conn.execute(recompute_sql)}
+        stored = {row[0]: tuple(row[1:]) for row in conn.execute(stored_sql)}
+        for key in expected.keys() | stored.keys():
+            if expected.get(key) != stored.get(key):
+                mismatches.append({
+                    "table": table,
+                    "key": key,
+                    "expected": expected.get(key),
+                    "stored": stored.get(key),
+                })
+    return mismatches
+
+
+EXPIRING_COUNT_SQL = "SELECT SUM(item_count) FROM inventory_expiry_stats WHERE expiry_date <= ?"
+
+TOP_DRUGS_SQL = "SELECT drug_name, total_quantity FROM inventory_drug_stats ORDER BY total_quantity DESC LIMIT ?"
+
+
+def read_summary(conn: sqlite3.Connection, expiring_before: str, top_n: int = 5) -> dict:
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        SELECT SUM(drug_types), SUM(total_quantity), SUM(low_stock_count)
+        FROM inventory_location_stats
+    """)
+    total_drugs, total_quantity, low_stock_count = cursor.fetchone()
+
+    cursor.execute(EXPIRING_COUNT_SQL, (expiring_before,))
+    expiring_count = cursor.fetchone()[0]
+
+    cursor.execute("SELECT location, drug_types, total_quantity FROM inventory_location_stats")
+    location_stats = cursor.fetchall()
+
+    cursor.execute(TOP_DRUGS_SQL, (top_n,))
+    top_drugs = cursor.fetchall()
+
+    return {
+        "totalDrugs": total_drugs or 0,
+        "totalQuantity": total_quantity,
+        "lowStockCount": low_stock_count or 0,
+        "expiringCount": expiring_count or 0,
+        "locations": [
+            {
+                "name": row[0],
+                "drugTypes": row[1],
+                "totalQuantity": row[2]
+            }
+            for row in location_stats
+        ],
+        "topDrugs": [
+            {
+                "name": row[0],
+                "quantity": row[1]
+            }
+            for row in top_drugs
+        ],
+    }
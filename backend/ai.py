@@ -0,0 +1,232 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Optional
+
+import anyio
+
+
+class AIUnavailable(Exception):
+    pass
+
+
+class AITimeout(Exception):
+    pass
+
+
+def prompt_key(prompt: str) -> str:
+    # Prompts are built from indented f-strings; whitespace differences
+    # shouldn't split otherwise identical requests.
+    normalized = " ".join(prompt.split())
+    return hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+
+
+class GeminiModel:
+    """genai.GenerativeModel that imports and configures the SDK on first use.
+
+    Importing google.generativeai takes about a second, so it is deferred
+    until a prompt is actually sent. The async path runs the import in a
+    worker thread, so the event loop keeps serving in the meantime.
+    """
+
+    def __init__(self, api_key: str, model_name: str = "gemini-pro"):
+        self.api_key = api_key
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def _load(self):
+        with self._lock:
+            if self._model is None:
+                import google.generativeai as genai
+
+                genai.configure(api_key=self.api_key)
+                self._model = genai.GenerativeModel(self.model_name)
+            return self._model
+
+    def generate_content(self, prompt):
+        return (self._model or self._load()).generate_content(prompt)
+
+    async def generate_content_async(self, prompt):
+        model = self._model or await anyio.to_thread.run_sync(self._load)
+        return await model.generate_content_async(prompt)
+
+
+class PromptCache:
+    """LRU cache of completions keyed by prompt.
+
+    Entries are fresh for ``ttl`` seconds. After that they are only handed out
+    as a fallback when the upstream call fails, until ``stale_ttl`` expires.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 300.0, stale_ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.evictions = 0
+
+    def _lookup(self, key: str, max_age: float) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        text, stored_at = entry
+        age = time.monotonic() - stored_at
+        if age >= self.stale_ttl:
+            del self._entries[key]
+            return None
+        if age >= max_age:
+            return None
+        self._entries.move_to_end(key)
+        return text
+
+    def get(self, key: str) -> Optional[str]:
+        return self._lookup(key, self.ttl)
+
+    def get_stale(self, key: str) -> Optional[str]:
+        return self._lookup(key, self.stale_ttl)
+
+    def set(self, key: str, text: str):
+        self._entries[key] = (text, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class AIClient:
+    """Async wrapper around a Gemini model.
+
+    Calls go through the SDK's async API so a slow completion never blocks the
+    event loop. A semaphore caps how many calls are in flight at once, and the
+    timeout covers both waiting for a slot and the upstream call itself.
+
+    Completions are cached by prompt, and identical prompts already in flight
+    share a single upstream call. If that call fails or times out, an expired
+    cached answer is returned when one is still within the stale window.
+    """
+
+    def __init__(
+        self,
+        model=None,
+        timeout: float = 20.0,
+        max_concurrency: int = 8,
+        cache: Optional[PromptCache] = None,
+        observer: Optional[Callable[[str, float], None]] = None,
+    ):
+        self.model = model
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.cache = cache
+        # observer(outcome, seconds) is told about every upstream call
+        self.observer = observer
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._latencies = deque(maxlen=1000)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.coalesced = 0
+        self.stale_served = 0
+        self.upstream_calls = 0
+        self.upstream_errors = 0
+        self.timeouts = 0
+
+    @property
+    def available(self) -> bool:
+        return self.model is not None
+
+    async def _call(self, prompt: str) -> str:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            response = await self.model.generate_content_async(prompt)
+        return response.text
+
+    async def _fetch(self, key: str, prompt: str) -> str:
+        started = time.perf_counter()
+        self.upstream_calls += 1
+        error = None
+        try:
+            text = await asyncio.wait_for(self._call(prompt), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            error = AITimeout(f"Gemini call timed out after {self.timeout}s")
+        except Exception as e:
+            self.upstream_errors += 1
+            error = e
+        finally:
+            self._inflight.pop(key, None)
+
+        if self.observer is not None:
+            outcome = "ok" if error is None else "timeout" if isinstance(error, AITimeout) else "error"
+            self.observer(outcome, time.perf_counter() - started)
+        if error is not None:
+            stale = self.cache.get_stale(key) if self.cache is not None else None
+            if stale is not None:
+                self.stale_served += 1
+                return stale
+            raise error
+        self._latencies.append(time.perf_counter() - started)
+        if self.cache is not None:
+            self.cache.set(key, text)
+        return text
+
+    async def generate(self, prompt: str) -> str:
+        if not self.available:
+            raise AIUnavailable("Gemini model is not configured")
+        key = prompt_key(prompt)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.cache_hits += 1
+                return cached
+            self.cache_misses += 1
+
+        task = self._inflight.get(key)
+        if task is None:
+            # The upstream call runs as its own task so a caller that goes
+            # away does not cancel it for the others waiting on it.
+            task = asyncio.ensure_future(self._fetch(key, prompt))
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1)
+
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "available": self.available,
+            "cacheEntries": len(self.cache) if self.cache is not None else 0,
+            "cacheHits": self.cache_hits,
+            "cacheMisses": self.cache_misses,
+            "cacheHitRate": round(self.cache_hits / lookups, 4) if lookups else 0.0,
+            "cacheEvictions": self.cache.evictions if self.cache is not None else 0,
+            "coalesced": self.coalesced,
+            "staleServed": self.stale_served,
+            "inFlight": len(self._inflight),
+            "upstreamCalls": self.upstream_calls,
+            "upstreamErrors": self.upstream_errors,
+            "timeouts": self.timeouts,
+            "upstreamLatencyMs": {
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+                "max": round(latencies[-1] * 1000, 1) if latencies else None,
+            },
+        }
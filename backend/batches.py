@@ -0,0 +1,135 @@
+"""Bulk batch verification for receiving docks.
+
+Known batch IDs are kept in memory as a set, so IDs that were never
+recorded are rejected without touching the database. The remaining IDs are
+resolved in one query: they are passed as a JSON array and joined through
+json_each against the batch_id index.
+
+The set is loaded lazily and reloaded after ``invalidate()``, which the
+write paths that can introduce batch IDs call once their transaction has
+committed. Rows deleted since the last load only cost a lookup that finds
+nothing, so the set never has to shrink eagerly. With several worker
+processes, ``invalidate()`` also bumps a shared counter (see
+coordination.py), so every worker reloads its copy.
+"""
+import json
+import sqlite3
+import threading
+from datetime import date
+from typing import FrozenSet, List, Optional
+
+from coordination import BATCHES_SLOT, SharedCounters
+
+MAX_BULK_BATCH_IDS = 10000
+
+_EPOCH = date(1970, 1, 1)
+
+VERIFY_SQL = """
+    SELECT batch_id, drug_name, manufacturer, location, quantity, expiry_date, expiry_day - :today
+    FROM inventory
+    WHERE batch_id IN (SELECT value FROM json_each(:batch_ids))
+    ORDER BY batch_id, location
+"""
+
+KNOWN_BATCHES_SQL = "SELECT DISTINCT batch_id FROM inventory WHERE batch_id IS NOT NULL"
+
+
+class BatchIndex:
+    """In-memory set of batch IDs present in inventory."""
+
+    def __init__(self, shared: Optional[SharedCounters] = None):
+        self.shared = shared
+        self._known: Optional[FrozenSet[str]] = None
+        self._generation = 0
+        self._loaded_generation = None
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.lookups = 0
+        self.rejected = 0
+
+    @property
+    def generation(self):
+        if self.shared is None:
+            return self._generation
+        return self._generation, self.shared.read(BATCHES_SLOT)
+
+    def invalidate(self):
+        if self.shared is not None:
+            self.shared.bump([BATCHES_SLOT])
+        self._generation += 1
+
+    def known(self, conn: sqlite3.Connection) -> FrozenSet[str]:
+        if self._loaded_generation == self.generation and self._known is not None:
+            return self._known
+        with self._lock:
+            # Another thread may have reloaded while we waited
+            if self._loaded_generation != self.generation or self._known is None:
+                # Read the generation first: a write that commits during the
+                # load bumps it again and forces the next caller to reload.
+                generation = self.generation
+                self._known = frozenset(row[0] for row in conn.execute(KNOWN_BATCHES_SQL))
+                self._loaded_generation = generation
+                self.loads += 1
+            return self._known
+
+    def verify(self, conn: sqlite3.Connection, batch_ids: List[str]) -> dict:
+        """Verification result for each distinct ID, in request order."""
+        requested = list(dict.fromkeys(batch_ids))
+        known = self.known(conn)
+        candidates = [batch_id for batch_id in requested if batch_id in known]
+        self.lookups += len(requested)
+        self.rejected += len(requested) - len(candidates)
+
+        found = {}
+        if candidates:
+            today = (date.today() - _EPOCH).days
+            rows = conn.execute(
+                VERIFY_SQL, {"today": today, "batch_ids": json.dumps(candidates)}
+            ).fetchall()
+            for batch_id, drug_name, manufacturer, location, quantity, expiry_date, days_left in rows:
+                entry = found.get(batch_id)
+                if entry is None:
+                    entry = found[batch_id] = {
+                        "batchId": batch_id,
+                        "verified": True,
+                        "drugName": drug_name,
+                        "manufacturer": manufacturer,
+                        "expiryDate": expiry_date,
+                        "daysToExpiry": days_left,
+                        "quantity": 0,
+                        "locations": [],
+                    }
+                elif days_left is not None and (entry["daysToExpiry"] is None or days_left < entry["daysToExpiry"]):
+                    entry["expiryDate"] = expiry_date
+                    entry["daysToExpiry"] = days_left
+                entry["quantity"] += quantity
+                entry["locations"].append({"location": location, "quantity": quantity})
+
+        results = []
+        counts = {"verified": 0, "expired": 0, "notFound": 0}
+        for batch_id in requested:
+            entry = found.get(batch_id)
+            if entry is None:
+                counts["notFound"] += 1
+                results.append({"batchId": batch_id, "verified": False, "status": "not_found"})
+                continue
+            is_expired = entry["daysToExpiry"] is not None and entry["daysToExpiry"] <= 0
+            entry["isExpired"] = is_expired
+            entry["status"] = "expired" if is_expired else "verified"
+            counts["expired" if is_expired else "verified"] += 1
+            results.append(entry)
+        return {
+            "results": results,
+            "counts": counts,
+            "queried": len(candidates),
+            "rejectedFromIndex": len(requested) - len(candidates),
+        }
+
+    def stats(self) -> dict:
+        return {
+            "knownBatches": len(self._known) if self._known is not None else None,
+            "stale": self._loaded_generation != self.generation,
+            "loads": self.loads,
+            "lookups": self.lookups,
+            "rejected": self.rejected,
+        }
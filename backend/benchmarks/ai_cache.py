@@ -0,0 +1,55 @@
+"""Exercise the Gemini prompt cache and request coalescing against a stub.
+
+A burst of dashboard-style requests (a handful of distinct prompts, each
+asked by many clients at once) runs three times: cold, warm, and with the
+upstream failing after the fresh TTL has lapsed, where callers should get
+the stale cached answer.
+
+    python -m benchmarks.ai_cache --clients 200 --prompts 5 --latency 1.0
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from ai import AIClient, PromptCache
+from benchmarks.stub_model import StubGeminiModel
+
+
+async def burst(client: AIClient, clients: int, prompts: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client.generate(f"List expired medicines for location {i % prompts}")
+        for i in range(clients)
+    ))
+    return time.perf_counter() - start
+
+
+async def run(args):
+    model = StubGeminiModel(latency=args.latency)
+    cache = PromptCache(max_entries=256, ttl=args.ttl, stale_ttl=3600)
+    client = AIClient(model, timeout=args.latency * 5, max_concurrency=8, cache=cache)
+
+    for phase in ("cold", "warm", "stale"):
+        if phase == "stale":
+            await asyncio.sleep(args.ttl)
+            model.failing = True
+        calls_before = model.calls
+        elapsed = await burst(client, args.clients, args.prompts)
+        print(f"{phase:5s}: {args.clients} requests in {elapsed:.2f}s, "
+              f"{model.calls - calls_before} upstream calls")
+    print(json.dumps(client.stats(), indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--prompts", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--ttl", type=float, default=2.0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
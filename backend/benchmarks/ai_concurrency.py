@@ -0,0 +1,80 @@
+"""p99 latency of cheap endpoints while slow AI calls are in flight.
+
+Run from the backend directory:
+
+    python -m benchmarks.ai_concurrency
+    python -m benchmarks.ai_concurrency --blocking   # old behaviour, for comparison
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run(args):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    os.environ.setdefault("GEMINI_API_KEY", "")
+    os.environ["SEED_SAMPLE_DATA"] = "1"
+
+    import httpx
+    import main
+    from benchmarks.stub_model import StubGeminiModel
+
+    main.ai_client.model = StubGeminiModel(latency=args.ai_latency, blocking=args.blocking)
+    main.ai_client.timeout = args.ai_latency * args.ai_calls + 5
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.lifespan(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            # Distinct prompts, so the calls are neither cached nor coalesced
+            ai_tasks = [
+                asyncio.create_task(client.get(
+                    "/predict-demand", params={"drug": f"Drug {i}", "source": "gemini"}, timeout=None
+                ))
+                for i in range(args.ai_calls)
+            ]
+            await asyncio.sleep(0)
+
+            latencies = {"/health": [], "/inventory/Central Hospital": []}
+            deadline = time.perf_counter() + args.duration
+            while time.perf_counter() < deadline and not all(t.done() for t in ai_tasks):
+                for path, samples in latencies.items():
+                    start = time.perf_counter()
+                    response = await client.get(path)
+                    samples.append((time.perf_counter() - start) * 1000)
+                    response.raise_for_status()
+
+            ai_start = time.perf_counter()
+            responses = await asyncio.gather(*ai_tasks)
+            ai_drain = time.perf_counter() - ai_start
+
+    mode = "blocking" if args.blocking else "async"
+    print(f"mode={mode} ai_calls={args.ai_calls} ai_latency={args.ai_latency}s "
+          f"ai_ok={sum(r.status_code == 200 for r in responses)} drain_after_probe={ai_drain:.2f}s")
+    for path, samples in latencies.items():
+        if not samples:
+            print(f"{path:28s} no samples")
+            continue
+        print(f"{path:28s} n={len(samples):5d} p50={statistics.median(samples):8.2f}ms "
+              f"p99={percentile(samples, 99):8.2f}ms max={max(samples):8.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ai-calls", type=int, default=20)
+    parser.add_argument("--ai-latency", type=float, default=2.0)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--blocking", action="store_true", help="stub blocks the event loop like the sync SDK call")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
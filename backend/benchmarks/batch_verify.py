@@ -0,0 +1,82 @@
+"""Verify a pallet of batch IDs through the API: one /ai/batch-verify
+request per ID versus a single /batch-verify/bulk request.
+
+Run from the backend directory:
+
+    python -m benchmarks.batch_verify --batches 20000 --ids 2000 --unknown 0.3
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+
+async def run(args):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    os.environ.setdefault("GEMINI_API_KEY", "")
+
+    import httpx
+    import main
+
+    rng = random.Random(args.seed)
+    batch_ids = [f"BENCH-{i:06d}" for i in range(args.batches)]
+    body = "".join(
+        json.dumps({
+            "location": f"Site {i % 100:03d}",
+            "drugName": f"Drug {i:06d}",
+            "quantity": rng.randint(0, 500),
+            "batchId": batch_id,
+            "expiryDate": f"20{rng.randint(24, 29)}-{rng.randint(1, 12):02d}-15",
+        }) + "\n"
+        for i, batch_id in enumerate(batch_ids)
+    )
+    unknown = int(args.ids * args.unknown)
+    ids = rng.sample(batch_ids, args.ids - unknown) + [f"FAKE-{i}" for i in range(unknown)]
+    rng.shuffle(ids)
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.lifespan(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            response = await client.post(
+                "/inventory/bulk", content=body, headers={"content-type": "application/x-ndjson"}
+            )
+            response.raise_for_status()
+
+            start = time.perf_counter()
+            found = 0
+            for batch_id in ids:
+                response = await client.post("/ai/batch-verify", json={"batchId": batch_id})
+                found += response.json()["verified"]
+            single = time.perf_counter() - start
+
+            # First bulk call pays for loading the index after the import
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                response = await client.post("/batch-verify/bulk", json={"batchIds": ids})
+                timings.append(time.perf_counter() - start)
+            result = response.json()
+
+    counts = result["counts"]
+    print(f"{len(ids)} IDs ({unknown} unknown) against {args.batches} batches")
+    print(f"one request per ID: {single * 1000:.1f}ms, {found} found")
+    print(f"bulk request:       first {timings[0] * 1000:.1f}ms (index load), "
+          f"best {min(timings) * 1000:.1f}ms, {counts['verified'] + counts['expired']} found, "
+          f"{result['rejectedFromIndex']} rejected without a query")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batches", type=int, default=20_000)
+    parser.add_argument("--ids", type=int, default=2_000)
+    parser.add_argument("--unknown", type=float, default=0.3, help="share of IDs that are not in inventory")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Sync the DrugRegister event mirror from an in-process chain and time
+/chain/verify-style lookups against it.
+
+    python -m benchmarks.chain_mirror --drugs 2000 --verifications 4000
+"""
+import argparse
+import random
+import sqlite3
+import time
+
+import chain
+from migrations import migrate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--drugs", type=int, default=2_000)
+    parser.add_argument("--verifications", type=int, default=4_000)
+    parser.add_argument("--lookups", type=int, default=2_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    local = chain.LocalChain("0x" + "11" * 20)
+    sender = "0x" + "22" * 20
+    batch_ids = [f"B-{i:06d}" for i in range(args.drugs)]
+    start = time.perf_counter()
+    for batch_id in batch_ids:
+        local.register_drug(f"Drug {batch_id}", batch_id, "Supplier", sender, 1_700_000_000)
+        local.mine(rng.randint(0, 20))
+    for _ in range(args.verifications):
+        local.verify_drug(rng.choice(batch_ids), sender, 1_700_100_000)
+    print(f"generated {len(local.logs)} logs over {local.head} blocks in {time.perf_counter() - start:.2f}s")
+
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    migrate(conn)
+    mirror = chain.ChainMirror(local, local.address, confirmations=0)
+    result = mirror.sync(conn)
+    print(f"initial sync: {result['logs']} logs in {result['pages']} pages, {result['durationMs']}ms")
+    for _ in range(10):
+        local.verify_drug(rng.choice(batch_ids), sender, 1_700_200_000)
+    result = mirror.sync(conn)
+    print(f"incremental sync: {result['logs']} logs, {result['durationMs']}ms")
+
+    queries = [rng.choice(batch_ids) if rng.random() < 0.8 else f"FAKE-{i}" for i in range(args.lookups)]
+    timings = []
+    for batch_id in queries:
+        start = time.perf_counter()
+        mirror.verify(conn, batch_id)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f"{args.lookups} lookups: p50 {timings[len(timings) // 2] * 1000:.2f}ms, "
+          f"p99 {timings[int(len(timings) * 0.99)] * 1000:.2f}ms (keccak of the ID included)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""Seeded generator for a production-sized MedChain database.
+
+The same seed always gives the same database:
+
+- Location kinds are weighted: a few warehouses and hospitals, many clinics
+  and pharmacies.
+- Each location stocks a lognormal number of SKUs. Warehouses and hospitals
+  carry more, and popular drugs appear in more places (Zipf).
+- Quantities are lognormal, with a share out of stock and a tail of low stock.
+- Expiry dates are mostly one to three years out, with some expiring soon
+  and some already expired.
+- Every pair gets an opening-balance movement. A share of pairs also gets
+  daily consumption movements, which the demand forecaster reads.
+- Reorder history spans the last six months. Orders whose delivery date is
+  still ahead are pending or shipped, and the rest are delivered.
+
+Rows are written with plain INSERTs, so the schema's own triggers keep the
+summary aggregates and the search index in sync. The result is checked
+with the ledger and aggregate consistency checks before it is returned.
+
+    python -m benchmarks.datagen --out /tmp/medchain_bench.db --locations 2000 --skus 120000
+"""
+import argparse
+import os
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+import aggregates
+import ledger
+from migrations import migrate
+
+MOLECULES = [
+    "Paracetamol", "Ibuprofen", "Aspirin", "Amoxicillin", "Ciprofloxacin", "Metformin", "Amlodipine",
+    "Atorvastatin", "Omeprazole", "Losartan", "Salbutamol", "Prednisolone", "Doxycycline", "Azithromycin",
+    "Ceftriaxone", "Metronidazole", "Fluconazole", "Artemether", "Lumefantrine", "Chloroquine",
+    "Insulin Glargine", "Insulin Regular", "Hydrochlorothiazide", "Enalapril", "Furosemide", "Warfarin",
+    "Heparin", "Clopidogrel", "Simvastatin", "Levothyroxine", "Diazepam", "Morphine", "Tramadol",
+    "Oxytocin", "Misoprostol", "Magnesium Sulfate", "Ferrous Sulfate", "Folic Acid", "Zinc Sulfate",
+    "Oral Rehydration Salts", "Cotrimoxazole", "Gentamicin", "Benzylpenicillin", "Nevirapine",
+    "Tenofovir", "Lamivudine", "Efavirenz", "Isoniazid", "Rifampicin", "Ethambutol", "Pyrazinamide",
+    "Albendazole", "Mebendazole", "Ivermectin", "Ranitidine", "Loratadine", "Cetirizine", "Dexamethasone",
+    "Hydrocortisone", "Lidocaine",
+]
+STRENGTHS = ["5mg", "10mg", "20mg", "25mg", "50mg", "100mg", "250mg", "400mg", "500mg", "1g", "5ml", "10ml"]
+FORMS = ["", " Tablet", " Capsule", " Syrup", " Injection"]
+MANUFACTURERS = [
+    "PharmaCorp Ltd", "MediLab Inc", "Global Pharma", "AntiBio Labs", "DiabetesCare Ltd",
+    "HealthTech Solutions", "CureWell Pharmaceuticals", "Unity Generics", "Meridian Biotech",
+    "Apex Formulations", "Sunrise Remedies", "Northfield Labs", "Equator Health", "Baobab Pharma",
+    "Crescent Medical", "Lakeside Generics", "Summit Therapeutics", "Harbor Pharma",
+]
+CITIES = [
+    "Nairobi", "Mombasa", "Kisumu", "Nakuru", "Eldoret", "Kampala", "Gulu", "Mbarara", "Arusha", "Dodoma",
+    "Mwanza", "Kigali", "Huye", "Lusaka", "Ndola", "Lilongwe", "Blantyre", "Accra", "Kumasi", "Tamale",
+]
+# (kind, share of locations, SKU multiplier)
+LOCATION_KINDS = [
+    ("Medical Warehouse", 0.02, 8.0),
+    ("Regional Hospital", 0.06, 4.0),
+    ("District Hospital", 0.12, 2.0),
+    ("Health Centre", 0.30, 0.8),
+    ("Rural Clinic", 0.25, 0.5),
+    ("Pharmacy", 0.25, 1.0),
+]
+REORDER_STATUSES = ["pending", "shipped"]
+
+_EPOCH = date(1970, 1, 1)
+
+
+def drug_catalog(size: int, rng: np.random.Generator) -> list:
+    names = sorted({
+        f"{molecule} {strength}{form}"
+        for molecule in MOLECULES for strength in STRENGTHS for form in FORMS
+    })
+    return [names[i] for i in sorted(rng.choice(len(names), size=min(size, len(names)), replace=False))]
+
+
+def location_names(count: int, rng: np.random.Generator) -> list:
+    shares = np.array([share for _, share, _ in LOCATION_KINDS])
+    kinds = rng.choice(len(LOCATION_KINDS), size=count, p=shares / shares.sum())
+    cities = rng.choice(len(CITIES), size=count)
+    return [
+        (f"{CITIES[city]} {LOCATION_KINDS[kind][0]} {i:04d}", LOCATION_KINDS[kind][2])
+        for i, (kind, city) in enumerate(zip(kinds, cities))
+    ]
+
+
+def generate(
+    path: str,
+    locations: int = 2_000,
+    skus: int = 120_000,
+    drugs: int = 1_500,
+    history_days: int = 90,
+    history_share: float = 0.05,
+    reorder_share: float = 0.08,
+    seed: int = 42,
+) -> dict:
+    """Write a fresh database to ``path`` and return row counts and timings."""
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    today = date.today()
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    migrate(conn)
+
+    catalog = drug_catalog(drugs, rng)
+    sites = location_names(locations, rng)
+    popularity = 1.0 / np.arange(1, len(catalog) + 1) ** 0.8
+    popularity = rng.permutation(popularity)
+    popularity /= popularity.sum()
+
+    # SKUs per location: lognormal weights scaled by kind, normalised to the total
+    weights = rng.lognormal(0.0, 0.6, size=len(sites)) * np.array([multiplier for _, multiplier in sites])
+    per_site = np.clip(np.round(weights / weights.sum() * skus), 1, len(catalog)).astype(int)
+
+    pairs = []
+    for (site, _), count in zip(sites, per_site):
+        for drug in rng.choice(len(catalog), size=count, replace=False, p=popularity):
+            pairs.append((site, catalog[drug]))
+    n = len(pairs)
+
+    quantities = np.round(rng.lognormal(5.0, 1.3, size=n)).astype(int)
+    quantities[rng.random(n) < 0.04] = 0
+    # Mostly 1-3 years out; ~6% within 30 days, ~3% already expired
+    bucket = rng.random(n)
+    expiry_offsets = np.where(
+        bucket < 0.03, rng.integers(-180, 0, size=n),
+        np.where(bucket < 0.09, rng.integers(0, 31, size=n), rng.integers(31, 1100, size=n)),
+    )
+    manufacturers = rng.choice(len(MANUFACTURERS), size=n)
+    stamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    inventory_rows = [
+        (
+            location, drug_name, int(quantities[i]),
+            f"{MANUFACTURERS[manufacturers[i]][:2].upper()}-{today.year}-{i:07d}",
+            (today + timedelta(days=int(expiry_offsets[i]))).isoformat(),
+            MANUFACTURERS[manufacturers[i]], stamp,
+        )
+        for i, (location, drug_name) in enumerate(pairs)
+    ]
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT INTO inventory (location, drug_name, quantity, batch_id, expiry_date, manufacturer, last_updated) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        inventory_rows,
+    )
+
+    # Ledger: consumption for a share of pairs, opening balances that make
+    # every pair's movements sum to its current quantity
+    opened_at = datetime.combine(today - timedelta(days=history_days), datetime.min.time())
+    consumed = np.zeros(n, dtype=np.int64)
+    movements = []
+    tracked = np.flatnonzero(rng.random(n) < history_share)
+    for i in tracked:
+        location, drug_name = pairs[i]
+        rate = max(quantities[i], 20) / 60
+        daily = rng.poisson(rate, size=history_days)
+        daily[rng.random(history_days) < 0.3] = 0  # days without dispensing
+        for day in np.flatnonzero(daily):
+            at = opened_at + timedelta(days=int(day) + 1, hours=int(rng.integers(7, 19)))
+            movements.append((location, drug_name, -int(daily[day]), "dispensed", None,
+                              at.strftime("%Y-%m-%d %H:%M:%S.000")))
+        consumed[i] = daily.sum()
+    opening_stamp = opened_at.strftime("%Y-%m-%d %H:%M:%S.000")
+    opening = [
+        (location, drug_name, int(quantities[i] + consumed[i]), "opening_balance", None, opening_stamp)
+        for i, (location, drug_name) in enumerate(pairs)
+    ]
+    # Opening balances first so movement ids follow recorded_at
+    conn.executemany(
+        "INSERT INTO stock_movements (location, drug_name, delta, reason, reference, recorded_at) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        opening + sorted(movements, key=lambda row: row[5]),
+    )
+
+    reorders = []
+    for i in np.flatnonzero(rng.random(n) < reorder_share):
+        location, drug_name = pairs[i]
+        for _ in range(int(rng.integers(1, 4))):
+            ordered = today - timedelta(days=int(rng.integers(0, 180)))
+            delivery = ordered + timedelta(days=int(rng.integers(3, 21)))
+            status = "delivered" if delivery < today else REORDER_STATUSES[int(rng.integers(0, 2))]
+            reorders.append((
+                drug_name, int(rng.integers(50, 2000)), location, status,
+                f"{ordered.isoformat()} {int(rng.integers(8, 18)):02d}:00:00",
+                delivery.isoformat(), MANUFACTURERS[manufacturers[i]],
+            ))
+    conn.executemany(
+        "INSERT INTO reorders (drug_name, quantity, location, status, order_date, expected_delivery, supplier) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        reorders,
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+
+    ledger_mismatches = ledger.check_consistency(conn)
+    aggregate_mismatches = aggregates.check_consistency(conn)
+    conn.close()
+    if ledger_mismatches or aggregate_mismatches:
+        raise RuntimeError(
+            f"generated database is inconsistent: {len(ledger_mismatches)} ledger, "
+            f"{len(aggregate_mismatches)} aggregate mismatches"
+        )
+    return {
+        "seed": seed,
+        "locations": len(sites),
+        "drugs": len(catalog),
+        "skus": n,
+        "movements": len(opening) + len(movements),
+        "reorders": len(reorders),
+        "outOfStock": int((quantities == 0).sum()),
+        "expired": int((expiry_offsets < 0).sum()),
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default="medchain_bench.db")
+    parser.add_argument("--locations", type=int, default=2_000)
+    parser.add_argument("--skus", type=int, default=120_000, help="(location, drug) pairs, approximately")
+    parser.add_argument("--drugs", type=int, default=1_500, help="distinct drug names")
+    parser.add_argument("--history-days", type=int, default=90)
+    parser.add_argument("--history-share", type=float, default=0.05, help="share of pairs with consumption history")
+    parser.add_argument("--reorder-share", type=float, default=0.08, help="share of pairs with reorder history")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    stats = generate(
+        args.out, args.locations, args.skus, args.drugs,
+        args.history_days, args.history_share, args.reorder_share, args.seed,
+    )
+    print(", ".join(f"{key} {value}" for key, value in stats.items()))
+
+
+if __name__ == "__main__":
+    main()
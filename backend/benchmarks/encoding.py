@@ -0,0 +1,107 @@
+"""Response encoding cost: bytes and encode time per 100k inventory rows.
+
+Reads the low-stock listing columns for every inventory row of a
+benchmarks.datagen database. It then encodes the same document in several
+ways:
+
+- dicts + jsonable_encoder + json: the path used before serialization.py
+- dicts + serialization.dumps: the row-object format with orjson
+- columnar + json / columnar + serialization.dumps: ``format=columnar``
+
+Times cover building the document from the row tuples plus encoding it. The
+SQL read is not included. Gzip sizes show what the formats cost on the wire
+behind a compressing proxy.
+
+    python -m benchmarks.encoding --db /tmp/medchain_bench.db --runs 5
+"""
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+import serialization
+from benchmarks.datagen import generate
+
+DEFAULT_DB = os.path.join(tempfile.gettempdir(), "medchain_bench.db")
+
+QUERY = """
+    SELECT location, drug_name, quantity, batch_id, expiry_date, manufacturer,
+        CASE WHEN quantity < 10 THEN 'critical' WHEN quantity < 25 THEN 'low' ELSE 'moderate' END
+    FROM inventory
+"""
+KEYS = ("location", "name", "quantity", "batchId", "expiryDate", "manufacturer", "status")
+
+
+def legacy(rows: list) -> bytes:
+    body = {"lowStockDrugs": [
+        {
+            "location": row[0],
+            "name": row[1],
+            "quantity": row[2],
+            "batchId": row[3],
+            "expiryDate": row[4],
+            "manufacturer": row[5],
+            "status": row[6],
+        }
+        for row in rows
+    ]}
+    return json.dumps(jsonable_encoder(body), separators=(",", ":")).encode()
+
+
+def rows_fast(rows: list) -> bytes:
+    return serialization.dumps({"lowStockDrugs": serialization.table(KEYS, rows)})
+
+
+def columnar_json(rows: list) -> bytes:
+    return json.dumps({"lowStockDrugs": serialization.table(KEYS, rows, columnar=True)},
+                      separators=(",", ":")).encode()
+
+
+def columnar_fast(rows: list) -> bytes:
+    return serialization.dumps({"lowStockDrugs": serialization.table(KEYS, rows, columnar=True)})
+
+
+ENCODERS = {
+    "dicts + jsonable_encoder": legacy,
+    "dicts + dumps": rows_fast,
+    "columnar + json": columnar_json,
+    "columnar + dumps": columnar_fast,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DEFAULT_DB, help="database from benchmarks.datagen")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print("generating:", generate(args.db))
+    conn = sqlite3.connect(args.db)
+    rows = conn.execute(QUERY).fetchall()
+    conn.close()
+    scale = 100_000 / len(rows)
+    print(f"{len(rows)} rows, encoder {'orjson' if serialization.orjson else 'json'}; figures per 100k rows")
+
+    baseline = None
+    for name, encode in ENCODERS.items():
+        body = encode(rows)
+        timings = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            encode(rows)
+            timings.append(time.perf_counter() - started)
+        per_100k = statistics.median(timings) * scale
+        baseline = baseline or per_100k
+        print(f"{name:26s} {per_100k * 1000:8.1f}ms ({baseline / per_100k:5.1f}x)  "
+              f"{len(body) * scale / 1e6:6.2f}MB  gzip {len(gzip.compress(body, 6)) * scale / 1e6:5.2f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Fan-out cost of the SSE event broker with many connected subscribers.
+
+Subscribers are drained in-process (no sockets), so this measures the
+broker itself: coalescing, per-subscriber filtering and wake-ups.
+
+    python -m benchmarks.event_fanout --subscribers 5000 --locations 50 --writes 2000
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from events import EventBroker
+
+
+async def drain(broker: EventBroker, subscriber, received: list):
+    async for chunk in broker.stream(subscriber):
+        received.append((time.perf_counter(), chunk.count(b"\nevent: ")))
+
+
+async def run(args):
+    broker = EventBroker(coalesce_window=args.window / 1000, heartbeat=60, max_subscribers=args.subscribers)
+    broker.start()
+    rng = random.Random(42)
+    locations = [f"Site {i:03d}" for i in range(args.locations)]
+
+    received = []
+    tasks = []
+    for i in range(args.subscribers):
+        # Most dashboards watch one location; every tenth watches all of them
+        wanted = None if i % 10 == 0 else {rng.choice(locations)}
+        tasks.append(asyncio.create_task(drain(broker, broker.subscribe(wanted), received)))
+    await asyncio.sleep(0.1)
+    received.clear()
+
+    start = time.perf_counter()
+    for _ in range(args.writes):
+        broker.publish("inventory", [rng.choice(locations)], reason="update")
+    await asyncio.sleep(args.window / 1000 * 2 + 0.5)
+    broker.stop()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    last = max((at for at, _ in received), default=start)
+    events = sum(count for _, count in received)
+    stats = broker.stats()
+    print(f"{args.subscribers} subscribers, {args.writes} writes over {args.locations} locations")
+    print(f"published={stats['published']} coalesced={stats['coalesced']} dispatched={stats['dispatched']}")
+    print(f"delivered {events} events in {len(received)} chunks; "
+          f"last delivery {(last - start) * 1000:.1f}ms after the burst started")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=5000)
+    parser.add_argument("--locations", type=int, default=50)
+    parser.add_argument("--writes", type=int, default=2000)
+    parser.add_argument("--window", type=float, default=250, help="coalescing window in ms")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Time fitting synthetic demand series in-process, chunk by chunk.
+
+    python -m benchmarks.forecast_fit --series 100000 --days 90
+"""
+import argparse
+import time
+
+import numpy as np
+
+from forecasting import fit_all
+
+
+def synthetic_demand(series: int, days: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    rates = rng.lognormal(1.5, 1.0, size=(series, 1))
+    # Demand occurs on 5-100% of days, so most series come out intermittent
+    occurrence = rng.uniform(0.05, 1.0, size=(series, 1))
+    active = rng.uniform(size=(series, days)) < occurrence
+    return np.where(active, rng.poisson(rates, size=(series, days)), 0).astype(np.float64)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--series", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--horizon", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    demand = synthetic_demand(args.series, args.days, args.seed)
+    print(f"{args.series} series x {args.days} days")
+
+    start = time.perf_counter()
+    fitted = fit_all(demand, args.horizon)
+    elapsed = time.perf_counter() - start
+    print(f"{elapsed:.2f}s ({int(fitted['intermittent'].sum())} intermittent, {args.series / elapsed:,.0f} series/s)")
+
+
+if __name__ == "__main__":
+    main()
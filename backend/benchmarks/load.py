@@ -0,0 +1,232 @@
+"""In-process ASGI load driver for the inventory endpoints.
+
+Runs against a database from benchmarks.datagen. The database is copied
+first, so write paths never change the fixture. Each endpoint gets a fixed
+number of concurrent clients for a fixed time. The driver reports
+throughput and p50/p95/p99 latency per endpoint. Gemini is replaced by
+StubGeminiModel, so /ai/chat measures the app around the model call.
+
+The response cache is off by default, so the numbers reflect the queries.
+Pass --cache to measure the cached path instead.
+
+    python -m benchmarks.load --generate --save-baseline baseline.json
+    python -m benchmarks.load --compare baseline.json --tolerance 0.2
+
+--compare exits with status 1 when an endpoint's p95 latency rose, or its
+throughput fell, by more than the tolerance.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.datagen import generate
+from benchmarks.stub_model import StubGeminiModel
+
+DEFAULT_DB = os.path.join(tempfile.gettempdir(), "medchain_bench.db")
+
+# name -> (method, path template, JSON body template)
+SCENARIOS = {
+    "summary": ("GET", "/inventory/summary", None),
+    "expired": ("GET", "/inventory/expired?days=30&n={n}", None),
+    "low_stock": ("GET", "/inventory/low-stock?threshold=50&n={n}", None),
+    "all_page": ("GET", "/inventory/all?limit=1000&n={n}", None),
+    "all_full": ("GET", "/inventory/all?fields=name,quantity&n={n}", None),
+    "location": ("GET", "/inventory/{location}", None),
+    "search": ("GET", "/inventory/search?q={drug}", None),
+    "reorder_plan": ("POST", "/inventory/reorder", {"threshold": 50, "dryRun": True}),
+    "ai_chat": ("POST", "/ai/chat", {"message": "How much {drug} is left and where is it running low?"}),
+}
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, round(q * (len(sorted_values) - 1)))]
+
+
+def dataset_stats(path: str) -> dict:
+    conn = sqlite3.connect(path)
+    try:
+        return {
+            "locations": conn.execute("SELECT COUNT(DISTINCT location) FROM inventory").fetchone()[0],
+            "skus": conn.execute("SELECT COUNT(*) FROM inventory").fetchone()[0],
+            "movements": conn.execute("SELECT COUNT(*) FROM stock_movements").fetchone()[0],
+            "reorders": conn.execute("SELECT COUNT(*) FROM reorders").fetchone()[0],
+        }
+    finally:
+        conn.close()
+
+
+def sample_values(path: str, count: int = 200) -> tuple:
+    conn = sqlite3.connect(path)
+    try:
+        locations = [row[0] for row in conn.execute(
+            "SELECT location FROM inventory_location_stats ORDER BY location LIMIT ?", (count,)
+        )]
+        drugs = [row[0].split()[0] for row in conn.execute(
+            "SELECT drug_name FROM inventory_drug_stats ORDER BY drug_name LIMIT ?", (count,)
+        )]
+        return locations, drugs
+    finally:
+        conn.close()
+
+
+async def drive(client, name: str, locations: list, drugs: list, concurrency: int,
+                duration: float, min_requests: int) -> dict:
+    method, template, body = SCENARIOS[name]
+    latencies, errors = [], 0
+    counter = iter(range(10 ** 9))
+    started = time.perf_counter()
+    deadline = started + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline or len(latencies) + errors < min_requests:
+            n = next(counter)
+            values = {"n": n, "location": locations[n % len(locations)], "drug": drugs[n % len(drugs)]}
+            kwargs = {}
+            if body is not None:
+                kwargs["json"] = {k: v.format(**values) if isinstance(v, str) else v for k, v in body.items()}
+            request_started = time.perf_counter()
+            response = await client.request(method, template.format(**values), **kwargs)
+            await response.aread()
+            if response.status_code >= 400:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - request_started)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    if not latencies:
+        return {"requests": 0, "errors": errors}
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": round(len(latencies) / elapsed, 2),
+        "p50Ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95Ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99Ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+async def run(args, db_path: str) -> dict:
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["GEMINI_API_KEY"] = ""
+    if not args.cache:
+        os.environ["RESPONSE_CACHE_SIZE"] = "0"
+        os.environ["GEMINI_CACHE_SIZE"] = "0"
+
+    import httpx
+    import main
+
+    main.ai_client.model = StubGeminiModel(latency=args.ai_latency, text="Stock levels look stable.")
+    locations, drugs = sample_values(db_path)
+    names = args.endpoints.split(",") if args.endpoints else list(SCENARIOS)
+    results = {}
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.lifespan(main.app):
+        # Let the startup monitor pass and chat context load finish first
+        deadline = time.time() + 120
+        while (main.inventory_monitor.runs == 0 or main.chat_context.snapshot is None) and time.time() < deadline:
+            await asyncio.sleep(0.1)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for name in names:
+                await drive(client, name, locations, drugs, 1, 0, 1)  # warm-up
+                results[name] = await drive(
+                    client, name, locations, drugs, args.concurrency, args.duration, args.min_requests
+                )
+                print(format_row(name, results[name]))
+    return results
+
+
+def format_row(name: str, result: dict) -> str:
+    if not result["requests"]:
+        return f"{name:14s} all {result['errors']} requests failed"
+    return (f"{name:14s} {result['throughput']:9.1f} req/s  p50 {result['p50Ms']:8.2f}ms  "
+            f"p95 {result['p95Ms']:8.2f}ms  p99 {result['p99Ms']:8.2f}ms  "
+            f"{result['requests']} ok, {result['errors']} errors")
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> list:
+    """Print current vs baseline per endpoint; return the regressed endpoints."""
+    regressions = []
+    if baseline["dataset"] != current["dataset"]:
+        print(f"warning: dataset differs from the baseline ({baseline['dataset']} vs {current['dataset']})")
+    print(f"{'endpoint':14s} {'req/s':>18s} {'p95 ms':>22s}")
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if not before or not before.get("requests") or not result.get("requests"):
+            print(f"{name:14s} no baseline")
+            continue
+        throughput_change = result["throughput"] / before["throughput"] - 1
+        p95_change = result["p95Ms"] / before["p95Ms"] - 1
+        regressed = throughput_change < -tolerance or p95_change > tolerance
+        if regressed:
+            regressions.append(name)
+        print(f"{name:14s} {before['throughput']:8.1f} -> {result['throughput']:8.1f} "
+              f"{before['p95Ms']:9.2f} -> {result['p95Ms']:9.2f} "
+              f"({throughput_change:+.0%} req/s, {p95_change:+.0%} p95){'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DEFAULT_DB, help="database from benchmarks.datagen")
+    parser.add_argument("--generate", action="store_true", help="(re)generate --db with the default dataset")
+    parser.add_argument("--seed", type=int, default=42, help="generator seed with --generate")
+    parser.add_argument("--endpoints", help=f"comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per endpoint")
+    parser.add_argument("--min-requests", type=int, default=20)
+    parser.add_argument("--ai-latency", type=float, default=0.05, help="stub Gemini latency in seconds")
+    parser.add_argument("--cache", action="store_true", help="keep the response cache enabled")
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--compare", metavar="PATH", help="baseline to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    if args.generate or not os.path.exists(args.db):
+        print("generating:", generate(args.db, seed=args.seed))
+
+    workdir = tempfile.mkdtemp()
+    db_path = os.path.join(workdir, "load.db")
+    shutil.copy(args.db, db_path)
+    try:
+        current = {
+            "createdAt": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "settings": {
+                "concurrency": args.concurrency,
+                "duration": args.duration,
+                "cache": args.cache,
+                "aiLatency": args.ai_latency,
+            },
+            "dataset": dataset_stats(db_path),
+            "results": asyncio.run(run(args, db_path)),
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"baseline saved to {args.save_baseline}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), current, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} endpoint(s) regressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
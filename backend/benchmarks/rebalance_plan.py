@@ -0,0 +1,98 @@
+"""Rebalancing planner cost: end to end on a generated database, and the
+vectorised matching step on its own at larger synthetic sizes.
+
+The end-to-end pass runs on a copy of a benchmarks.datagen database. It
+times the load query, the planning step and the bulk insert of the
+proposals.
+
+The synthetic pass builds random (location, drug) stock arrays. Each
+location stocks a ``--density`` share of the catalogue. The pass times
+rebalance.match_transfers alone, the part that has to scale to thousands of
+locations and 100k drugs.
+
+    python -m benchmarks.rebalance_plan --db /tmp/medchain_bench.db
+    python -m benchmarks.rebalance_plan --synthetic 2000x100000 --density 0.02
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+import rebalance
+from benchmarks.datagen import generate
+from migrations import migrate
+
+DEFAULT_DB = os.path.join(tempfile.gettempdir(), "medchain_bench.db")
+
+
+def end_to_end(path: str, threshold: int, runs: int):
+    workdir = tempfile.mkdtemp()
+    db_path = os.path.join(workdir, "rebalance.db")
+    shutil.copy(path, db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        migrate(conn)
+        for _ in range(runs):
+            plan = rebalance.plan_transfers(conn, threshold)
+            print(f"plan     {plan['pairs']} pairs, {len(plan['proposals'])} proposals, "
+                  f"{plan['covered']}/{plan['shortfall']} units of shortfall covered  "
+                  f"load {plan['loadSeconds'] * 1000:.0f}ms  plan {plan['planSeconds'] * 1000:.0f}ms")
+        conn.execute("BEGIN IMMEDIATE")
+        started = time.perf_counter()
+        rebalance.create_transfers(conn, plan["proposals"])
+        conn.commit()
+        print(f"store    {len(plan['proposals'])} proposals in {(time.perf_counter() - started) * 1000:.0f}ms")
+        replan = rebalance.plan_transfers(conn, threshold)
+        print(f"replan   {len(replan['proposals'])} proposals once the first batch is open")
+    finally:
+        conn.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def synthetic(locations: int, drugs: int, density: float, seed: int):
+    rng = np.random.default_rng(seed)
+    started = time.perf_counter()
+    per_location = max(1, int(drugs * density))
+    drug = np.concatenate([rng.choice(drugs, per_location, replace=False) for _ in range(locations)])
+    drug = np.sort(drug)
+    n = len(drug)
+    quantity = np.round(rng.lognormal(5.0, 1.3, size=n)).astype(np.int64)
+    target = np.full(n, 100, dtype=np.int64)
+    surplus = np.maximum(quantity - target, 0)
+    shortfall = np.where(quantity < 50, target - quantity, 0)
+    expiry_day = rng.integers(20000, 21100, size=n)
+    print(f"built    {locations} locations x {drugs} drugs at {density:.1%}: {n} pairs "
+          f"in {time.perf_counter() - started:.2f}s")
+
+    started = time.perf_counter()
+    donors, receivers, quantities = rebalance.match_transfers(drug, surplus, shortfall, expiry_day, quantity)
+    elapsed = time.perf_counter() - started
+    print(f"match    {len(quantities)} transfers, {int(quantities.sum())}/{int(shortfall.sum())} units "
+          f"in {elapsed:.2f}s ({n / elapsed / 1e6:.1f}M pairs/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DEFAULT_DB, help="database from benchmarks.datagen")
+    parser.add_argument("--threshold", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--synthetic", metavar="LOCATIONSxDRUGS", help="e.g. 2000x100000; skips the database pass")
+    parser.add_argument("--density", type=float, default=0.02, help="share of drugs each location stocks")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        locations, drugs = (int(value) for value in args.synthetic.lower().split("x"))
+        synthetic(locations, drugs, args.density, args.seed)
+        return
+    if not os.path.exists(args.db):
+        print("generating:", generate(args.db, seed=args.seed))
+    end_to_end(args.db, args.threshold, args.runs)
+
+
+if __name__ == "__main__":
+    main()
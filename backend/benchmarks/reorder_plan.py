@@ -0,0 +1,65 @@
+"""Time a network-wide reorder dry run over a synthetic inventory.
+
+    python -m benchmarks.reorder_plan --skus 100000
+"""
+import argparse
+import random
+import sqlite3
+import time
+
+from migrations import migrate
+from reorder import plan_reorders
+
+
+def build_database(skus: int, locations: int, seed: int) -> sqlite3.Connection:
+    rng = random.Random(seed)
+    conn = sqlite3.connect(":memory:")
+    migrate(conn)
+    drugs_per_location = max(1, skus // locations)
+    rows = [
+        (f"Site {loc:05d}", f"Drug {drug:05d}", int(rng.lognormvariate(5, 1)), f"B-{loc}-{drug}", "Supplier")
+        for loc in range(locations)
+        for drug in range(drugs_per_location)
+    ]
+    conn.executemany(
+        "INSERT INTO inventory (location, drug_name, quantity, batch_id, manufacturer) VALUES (?, ?, ?, ?, ?)",
+        rows,
+    )
+    sample = rng.sample(rows, len(rows) // 10)
+    conn.executemany(
+        "INSERT INTO reorders (drug_name, quantity, location, status) VALUES (?, ?, ?, ?)",
+        [(r[1], 200, r[0], rng.choice(["pending", "shipped", "delivered"])) for r in sample],
+    )
+    conn.executemany(
+        "INSERT INTO demand_predictions (location, drug_name, predicted_demand, confidence) VALUES (?, ?, ?, ?)",
+        [(r[0], r[1], rng.randint(0, 2000), 0.8) for r in rng.sample(rows, len(rows) // 4)],
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+    return conn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--skus", type=int, default=100_000)
+    parser.add_argument("--locations", type=int, default=1_000)
+    parser.add_argument("--threshold", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    conn = build_database(args.skus, args.locations, args.seed)
+    print(f"built {args.skus} SKUs in {time.perf_counter() - start:.2f}s")
+
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        plan = plan_reorders(conn, args.threshold)
+        timings.append(time.perf_counter() - start)
+    print(f"plan: {len(plan)} reorders, best {min(timings) * 1000:.1f}ms, "
+          f"worst {max(timings) * 1000:.1f}ms over {args.repeat} runs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Cold-start cost: importing main.py and time to the first /health.
+
+Each measurement starts a fresh interpreter:
+
+- import: ``python -c "import main"``, timed from spawn to exit
+- first /health: ``uvicorn main:app`` from spawn to the first 200 from
+  /health. This is run on a new database and again on one that is already
+  migrated.
+
+Run from the backend directory:
+
+    python -m benchmarks.startup --runs 5
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def environment(database_url: str, gemini_key: str) -> dict:
+    return {**os.environ, "DATABASE_URL": database_url, "GEMINI_API_KEY": gemini_key, "PYTHONWARNINGS": "ignore"}
+
+
+def time_import(env: dict) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import main"], cwd=BACKEND_DIR, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+
+def time_first_health(env: dict, timeout: float = 60.0) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=1) as sock:
+                    sock.sendall(b"GET /health HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n\r\n")
+                    if sock.recv(16).startswith(b"HTTP/1.1 200"):
+                        return time.perf_counter() - started
+            except OSError:
+                pass
+            time.sleep(0.005)
+        raise RuntimeError(f"/health did not answer within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def report(label: str, timings: list):
+    print(f"{label:34s} median {statistics.median(timings) * 1000:7.0f}ms  "
+          f"min {min(timings) * 1000:7.0f}ms  max {max(timings) * 1000:7.0f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--gemini-key", default="bench-key",
+                        help="GEMINI_API_KEY for the child processes (the SDK is configured, never called)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    existing = environment(f"sqlite:///{workdir}/existing.db", args.gemini_key)
+    time_first_health(existing)  # migrate it once
+
+    report("import main", [time_import(existing) for _ in range(args.runs)])
+    report("first /health, new database", [
+        time_first_health(environment(f"sqlite:///{workdir}/fresh{i}.db", args.gemini_key))
+        for i in range(args.runs)
+    ])
+    report("first /health, migrated database", [time_first_health(existing) for _ in range(args.runs)])
+
+
+if __name__ == "__main__":
+    main()
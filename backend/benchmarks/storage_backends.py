@@ -0,0 +1,138 @@
+"""Run the same endpoint checks against SQLite and PostgreSQL and compare.
+
+Each backend runs in a fresh process with its own DATABASE_URL. The
+responses (minus timestamps) must match, and the timings are printed side
+by side. PostgreSQL needs a server (a local container works); its database
+is dropped and recreated for the run.
+
+    python -m benchmarks.storage_backends --postgres-url postgresql://postgres@localhost/medchain_bench
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+VOLATILE_KEYS = {"timestamp", "lastSync", "lastUpdated"}
+
+
+def normalise(value):
+    if isinstance(value, dict):
+        return {k: normalise(v) for k, v in value.items() if k not in VOLATILE_KEYS}
+    if isinstance(value, list):
+        return [normalise(v) for v in value]
+    return value
+
+
+async def run_checks(rows: int) -> dict:
+    import httpx
+    import main
+
+    results, timings = {}, {}
+    bulk_body = "".join(
+        json.dumps({
+            "location": f"Site {i % 50:03d}",
+            "drugName": f"Drug {i:06d}",
+            "quantity": i % 700,
+            "batchId": f"BULK-{i:06d}",
+            "expiryDate": f"2027-{i % 12 + 1:02d}-01",
+            "manufacturer": "Supplier",
+        }) + "\n"
+        for i in range(rows)
+    )
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.lifespan(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            async def call(name, method, path, **kwargs):
+                start = time.perf_counter()
+                response = await client.request(method, path, **kwargs)
+                timings[name] = round((time.perf_counter() - start) * 1000, 2)
+                body = response.json() if response.headers.get("content-type", "").startswith("application/json") else None
+                results[name] = {"status": response.status_code, "body": normalise(body)}
+                return body
+
+            await call("list_location", "GET", "/inventory/Central Hospital")
+            await call("update_level", "POST", "/inventory/update",
+                       json={"location": "Central Hospital", "drugName": "Paracetamol 500mg", "quantity": 1100})
+            await call("new_pair", "POST", "/inventory/update",
+                       json={"location": "Central Hospital", "drugName": "Insulin 10ml", "quantity": 40})
+            page = await call("first_page", "GET", "/inventory/Central Hospital", params={"limit": 2})
+            await call("second_page", "GET", "/inventory/Central Hospital",
+                       params={"limit": 2, "cursor": page["nextCursor"]})
+            await call("fields", "GET", "/inventory/Rural Clinic A", params={"fields": "name,quantity,expiryDate"})
+            await call("verify_known", "POST", "/ai/batch-verify", json={"batchId": "PC-2024-001"})
+            await call("verify_unknown", "POST", "/ai/batch-verify", json={"batchId": "FAKE-1"})
+            await call("bulk_load", "POST", "/inventory/bulk", content=bulk_body,
+                       headers={"content-type": "application/x-ndjson"})
+            await call("bulk_reload", "POST", "/inventory/bulk", content=bulk_body,
+                       headers={"content-type": "application/x-ndjson"})
+            await call("list_bulk_location", "GET", "/inventory/Site 007")
+            await call("verify_bulk_batch", "POST", "/ai/batch-verify", json={"batchId": f"BULK-{rows - 1:06d}"})
+    return {"backend": main.repository.backend, "results": results, "timings": timings}
+
+
+def run_backend(url: str, rows: int) -> dict:
+    env = {**os.environ, "DATABASE_URL": url, "GEMINI_API_KEY": "", "SEED_SAMPLE_DATA": "1"}
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.storage_backends", "--child", "--rows", str(rows)],
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def reset_postgres(url: str):
+    import asyncpg
+    from urllib.parse import urlparse
+
+    parsed = urlparse(url)
+    name = parsed.path.lstrip("/")
+
+    async def reset():
+        conn = await asyncpg.connect(parsed._replace(path="/postgres").geturl())
+        try:
+            await conn.execute(f'DROP DATABASE IF EXISTS "{name}"')
+            await conn.execute(f'CREATE DATABASE "{name}"')
+        finally:
+            await conn.close()
+
+    asyncio.run(reset())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--postgres-url", default=os.getenv("MEDCHAIN_POSTGRES_URL"))
+    parser.add_argument("--rows", type=int, default=20_000, help="rows per bulk upload")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(run_checks(args.rows))))
+        return 0
+
+    runs = [run_backend(f"sqlite:///{tempfile.mkdtemp()}/bench.db", args.rows)]
+    if args.postgres_url:
+        reset_postgres(args.postgres_url)
+        runs.append(run_backend(args.postgres_url, args.rows))
+    else:
+        print("No --postgres-url given; running SQLite only")
+
+    names = list(runs[0]["timings"])
+    print(f"{'check':<20}" + "".join(f"{run['backend']:>14}" for run in runs))
+    for name in names:
+        print(f"{name:<20}" + "".join(f"{run['timings'][name]:>12}ms" for run in runs))
+
+    mismatches = [name for name in names if any(run["results"][name] != runs[0]["results"][name] for run in runs)]
+    for name in mismatches:
+        for run in runs:
+            print(f"MISMATCH {name} [{run['backend']}]: {json.dumps(run['results'][name])[:400]}")
+    if len(runs) > 1 and not mismatches:
+        print("Responses match across backends")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
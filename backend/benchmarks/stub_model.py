@@ -0,0 +1,49 @@
+import asyncio
+import json
+import time
+
+DEFAULT_RESPONSE = json.dumps({
+    "predictions": [
+        {"drug": "Paracetamol 500mg", "predicted_demand": 2400, "confidence": 0.92, "trend": "increasing"},
+        {"drug": "Aspirin 325mg", "predicted_demand": 900, "confidence": 0.95, "trend": "decreasing"},
+    ]
+})
+
+
+class StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubError(Exception):
+    pass
+
+
+class StubGeminiModel:
+    """Stand-in for genai.GenerativeModel with a fixed latency and answer.
+
+    With ``blocking=True`` the async API sleeps synchronously, reproducing a
+    handler that calls the SDK's blocking API from the event loop. Setting
+    ``failing`` makes calls raise StubError after the latency.
+    """
+
+    def __init__(self, latency: float = 2.0, text: str = DEFAULT_RESPONSE, blocking: bool = False):
+        self.latency = latency
+        self.text = text
+        self.blocking = blocking
+        self.failing = False
+        self.calls = 0
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        time.sleep(self.latency)
+        return StubResponse(self.text)
+
+    async def generate_content_async(self, prompt):
+        if self.blocking:
+            return self.generate_content(prompt)
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.failing:
+            raise StubError("stub model failure")
+        return StubResponse(self.text)
@@ -0,0 +1,197 @@
+"""Read throughput of the API under gunicorn with 1..N worker processes.
+
+Each worker count gets a fresh gunicorn (gunicorn.conf.py) on the same
+SQLite file. Client processes keep a fixed number of connections busy on the
+read endpoints for a while, and the achieved req/s is compared with the
+single-worker run. Before each load run, the script checks that an update
+handled by one worker is visible through every worker's response cache.
+
+Run from the backend directory:
+
+    python -m benchmarks.worker_scaling --workers 1,2,4 --duration 10
+
+Scaling is bounded by the cores available to the server and the clients;
+with fewer cores than workers + client processes, expect it to flatten.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SITES = 50
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def read_paths(no_cache: bool) -> list:
+    paths = [f"/inventory/Site {i:03d}" for i in range(SITES)]
+    paths += ["/inventory/summary", "/inventory/expired?days=30", "/inventory/low-stock?threshold=50"]
+    if no_cache:
+        # A unique query string per request bypasses the response cache
+        return [path + ("&" if "?" in path else "?") + "nocache={n}" for path in paths]
+    return paths
+
+
+async def client_loop(base_url: str, paths: list, connections: int, duration: float) -> int:
+    import httpx
+
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + duration
+        done = 0
+
+        async def worker(offset: int):
+            nonlocal done
+            n = offset
+            while time.perf_counter() < deadline:
+                path = paths[n % len(paths)].replace("{n}", str(n))
+                response = await client.get(path)
+                response.raise_for_status()
+                done += 1
+                n += connections
+
+        await asyncio.gather(*(worker(i) for i in range(connections)))
+        return done
+
+
+def client_process(args) -> int:
+    base_url, paths, connections, duration = args
+    return asyncio.run(client_loop(base_url, paths, connections, duration))
+
+
+def start_server(workers: int, port: int, database_url: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "WEB_CONCURRENCY": str(workers),
+        "BIND": f"127.0.0.1:{port}",
+        "DATABASE_URL": database_url,
+        "GEMINI_API_KEY": "",
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--log-level", "warning", "main:app"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL,
+    )
+
+
+def wait_ready(base_url: str, workers: int, timeout: float = 60.0):
+    import httpx
+
+    seen = set()
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            # New connections get spread over the workers; wait until all answer
+            seen.add(httpx.get(base_url + "/health", timeout=2).json()["worker"])
+            if len(seen) >= workers:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"only {len(seen)} of {workers} workers answered within {timeout}s")
+
+
+def stop_server(process: subprocess.Popen):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def load_data(base_url: str, rows: int):
+    import httpx
+
+    body = "".join(
+        json.dumps({
+            "location": f"Site {i % SITES:03d}",
+            "drugName": f"Drug {i:06d}",
+            "quantity": i % 400,
+            "batchId": f"SCALE-{i:06d}",
+            "expiryDate": f"20{25 + i % 4}-{i % 12 + 1:02d}-15",
+            "manufacturer": "Supplier",
+        }) + "\n"
+        for i in range(rows)
+    )
+    response = httpx.post(
+        base_url + "/inventory/bulk", content=body,
+        headers={"content-type": "application/x-ndjson"}, timeout=None,
+    )
+    response.raise_for_status()
+
+
+def check_coherence(base_url: str, workers: int, quantity: int) -> bool:
+    """Prime every worker's cache, update through one, re-read through all."""
+    import httpx
+
+    path = "/inventory/Site 000"
+
+    def quantities():
+        # A fresh connection per request lands on whichever worker accepts it
+        seen = {}
+        for _ in range(workers * 8):
+            with httpx.Client(base_url=base_url, timeout=10) as client:
+                worker = client.get("/health").json()["worker"]
+                drugs = client.get(path).json()["drugs"]
+                seen[worker] = next(d["quantity"] for d in drugs if d["name"] == "Drug 000000")
+        return seen
+
+    quantities()
+    httpx.post(base_url + "/inventory/update", json={
+        "location": "Site 000", "drugName": "Drug 000000", "quantity": quantity,
+    }, timeout=10).raise_for_status()
+    return all(value == quantity for value in quantities().values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--rows", type=int, default=5_000)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--clients", type=int, default=4, help="client processes")
+    parser.add_argument("--connections", type=int, default=16, help="connections per client process")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the response cache")
+    args = parser.parse_args()
+
+    database_url = f"sqlite:///{tempfile.mkdtemp()}/scaling.db"
+    paths = read_paths(args.no_cache)
+    print(f"{os.cpu_count()} CPUs, {args.clients} client processes x {args.connections} connections, "
+          f"{args.duration:.0f}s per run, response cache {'bypassed' if args.no_cache else 'on'}")
+
+    baseline = None
+    for run, workers in enumerate(int(w) for w in args.workers.split(",")):
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        server = start_server(workers, port, database_url)
+        try:
+            wait_ready(base_url, workers)
+            if run == 0:
+                load_data(base_url, args.rows)
+            coherent = check_coherence(base_url, workers, quantity=1000 + run)
+            with multiprocessing.Pool(args.clients) as pool:
+                counts = pool.map(
+                    client_process, [(base_url, paths, args.connections, args.duration)] * args.clients
+                )
+        finally:
+            stop_server(server)
+        rate = sum(counts) / args.duration
+        baseline = baseline or rate
+        speedup = rate / baseline
+        print(f"{workers:>2} workers: {rate:8.0f} req/s  x{speedup:.2f}  "
+              f"({speedup / workers * 100:.0f}% of linear)  "
+              f"cross-worker cache {'coherent' if coherent else 'STALE'}")
+
+
+if __name__ == "__main__":
+    main()
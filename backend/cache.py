@@ -0,0 +1,222 @@
+"""In-process response cache for the inventory read endpoints.
+
+Entries are keyed on route path + query string, bounded by an LRU size limit
+and a TTL, and tagged with the locations they depend on. Write paths call
+``invalidate(locations)`` so only entries touching those locations (and
+network-wide entries) are dropped.
+
+With several worker processes, pass a ``SharedCounters`` (see
+coordination.py). ``invalidate`` then also bumps the shared epochs for those
+locations. Each entry remembers the epochs it was built against, and a
+lookup drops it once any of them has moved, so a write handled by one
+worker invalidates the matching entries in every other worker.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Iterable, Optional
+
+from fastapi import Request, Response
+
+from coordination import RESET_SLOT, WRITES_SLOT, SharedCounters
+from serialization import encode
+
+# Response fields stamped with the time the body was built (or, for alerts,
+# the last monitor run). They are left out of the ETag so a rebuilt entry
+# with the same data keeps answering 304.
+VOLATILE_FIELDS = frozenset({"generatedAt", "lastSync", "timestamp", "monitor"})
+
+# Tag for entries that aggregate over every location (summary, unfiltered
+# expiry / low-stock reports); any write invalidates them.
+ALL_LOCATIONS = "*"
+
+
+def make_etag(content: bytes) -> str:
+    return '"' + hashlib.blake2b(content, digest_size=12).hexdigest() + '"'
+
+
+def payload_etag(payload: dict) -> str:
+    """ETag over the payload without its VOLATILE_FIELDS."""
+    return make_etag(encode({key: value for key, value in payload.items() if key not in VOLATILE_FIELDS}))
+
+
+class CacheEntry:
+    __slots__ = ("body", "etag", "tags", "expires_at", "epochs")
+
+    def __init__(self, body: bytes, tags: frozenset, expires_at: float, epochs: tuple = (),
+                 etag: Optional[str] = None):
+        self.body = body
+        self.etag = etag or make_etag(body)
+        self.tags = tags
+        self.expires_at = expires_at
+        # (slot, value) pairs of the shared epochs this entry was built against
+        self.epochs = epochs
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 1024, ttl: float = 30.0, shared: Optional[SharedCounters] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared = shared
+        self._entries: "OrderedDict[tuple, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.not_modified = 0
+        self.remote_invalidations = 0
+
+    @property
+    def generation(self):
+        if self.shared is None:
+            return self._generation
+        return self._generation, self.shared.read(WRITES_SLOT)
+
+    def _epoch_slots(self, tags: Iterable[str]) -> list:
+        # Network-wide entries depend on every write, the rest on their location
+        return [RESET_SLOT] + [WRITES_SLOT if tag == ALL_LOCATIONS else self.shared.slot(tag) for tag in tags]
+
+    def _is_current(self, entry: CacheEntry) -> bool:
+        return all(self.shared.read(slot) == value for slot, value in entry.epochs)
+
+    def get(self, key: tuple) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            if self.shared is not None and not self._is_current(entry):
+                del self._entries[key]
+                self.remote_invalidations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key: tuple, body: bytes, tags: Iterable[str], generation, etag: Optional[str] = None) -> CacheEntry:
+        tags = frozenset(tags)
+        epochs = ()
+        if self.shared is not None:
+            # Read before the generation check below: if no write landed
+            # since ``generation`` was taken, these are the epochs the body
+            # was computed against.
+            epochs = tuple((slot, self.shared.read(slot)) for slot in self._epoch_slots(tags))
+        entry = CacheEntry(body, tags, time.monotonic() + self.ttl, epochs, etag)
+        with self._lock:
+            # A write landed while this response was being computed; it may
+            # already be stale, so hand it back without caching it.
+            if generation != self.generation:
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def invalidate(self, locations: Optional[Iterable[str]] = None):
+        """Drop entries for the given locations plus all network-wide entries.
+
+        ``None`` clears the whole cache.
+        """
+        if locations is not None:
+            locations = set(locations)
+        if self.shared is not None:
+            if locations is None:
+                self.shared.bump([RESET_SLOT, WRITES_SLOT])
+            else:
+                self.shared.bump([WRITES_SLOT] + [self.shared.slot(location) for location in locations])
+        with self._lock:
+            self._generation += 1
+            if locations is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                return
+            affected = locations | {ALL_LOCATIONS}
+            stale = [key for key, entry in self._entries.items() if entry.tags & affected]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "ttlSeconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "notModified": self.not_modified,
+                "shared": self.shared is not None,
+                "remoteInvalidations": self.remote_invalidations,
+            }
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def _cache_key(request: Request) -> tuple:
+    return (request.url.path, tuple(sorted(request.query_params.multi_items())))
+
+
+def _respond(cache: ResponseCache, request: Request, entry) -> Response:
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+        cache.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+def cached_json_response(
+    cache: ResponseCache,
+    request: Request,
+    location: Optional[str],
+    compute: Callable[[], dict],
+) -> Response:
+    """Serve ``compute()`` through the cache with ETag / If-None-Match support.
+
+    ``location`` is the single location the response depends on, or None for
+    responses that cover every location.
+    """
+    key = _cache_key(request)
+    entry = cache.get(key)
+    if entry is None:
+        generation = cache.generation
+        payload = compute()
+        entry = cache.set(key, encode(payload), [location or ALL_LOCATIONS], generation, payload_etag(payload))
+    return _respond(cache, request, entry)
+
+
+async def cached_json_response_async(
+    cache: ResponseCache,
+    request: Request,
+    location: Optional[str],
+    compute: Callable[[], Awaitable[dict]],
+) -> Response:
+    """``cached_json_response`` for handlers whose ``compute`` is a coroutine."""
+    key = _cache_key(request)
+    entry = cache.get(key)
+    if entry is None:
+        generation = cache.generation
+        payload = await compute()
+        entry = cache.set(key, encode(payload), [location or ALL_LOCATIONS], generation, payload_etag(payload))
+    return _respond(cache, request, entry)
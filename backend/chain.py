@@ -0,0 +1,422 @@
+"""Local mirror of DrugRegister contract events.
+
+DrugRegistered and DrugVerified logs are copied into SQLite so batch
+authenticity checks are answered from an index instead of an on-chain call
+per batch. The mirror advances from a per-contract block cursor: each sync
+fetches logs for the next block range, applies them and moves the cursor in
+one transaction, so a crash or restart resumes where it stopped and replays
+nothing twice. Blocks closer to the head than ``confirmations`` are left for
+a later sync, which keeps short reorgs out of the mirror.
+
+``batchId`` is an indexed string in both events, so logs carry only its
+keccak-256 hash. Rows are keyed by that hash and lookups hash the requested
+ID the same way.
+
+Logs come from a source with ``block_number()`` and ``get_logs()``:
+``JsonRpcSource`` talks to a node over JSON-RPC, ``LocalChain`` is an
+in-process stand-in that emits the same log shapes and can be saved to /
+loaded from a fixture file.
+
+    python chain.py --fixture fixtures/drug_register_events.json
+    python chain.py --rpc-url http://localhost:8545 --address 0x...
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from Crypto.Hash import keccak
+
+DEFAULT_CONFIRMATIONS = 6
+DEFAULT_PAGE_BLOCKS = 2000
+
+# --- keccak-256 -------------------------------------------------------------
+# Ethereum hashes with the original Keccak padding, which hashlib's sha3_256
+# does not implement.
+
+
+def keccak256(data: bytes) -> bytes:
+    return keccak.new(digest_bits=256, data=data).digest()
+
+
+def batch_hash(batch_id: str) -> str:
+    return "0x" + keccak256(batch_id.encode()).hex()
+
+
+DRUG_REGISTERED_TOPIC = "0x" + keccak256(b"DrugRegistered(string,string,string,uint256,address)").hex()
+DRUG_VERIFIED_TOPIC = "0x" + keccak256(b"DrugVerified(string,address,uint256)").hex()
+
+# --- ABI helpers ------------------------------------------------------------
+
+
+def _words(data: str) -> bytes:
+    return bytes.fromhex(data[2:] if data.startswith("0x") else data)
+
+
+def _uint(raw: bytes, index: int) -> int:
+    return int.from_bytes(raw[32 * index:32 * index + 32], "big")
+
+
+def _address(raw: bytes, index: int) -> str:
+    return "0x" + raw[32 * index + 12:32 * index + 32].hex()
+
+
+def _string(raw: bytes, index: int) -> str:
+    offset = _uint(raw, index)
+    length = int.from_bytes(raw[offset:offset + 32], "big")
+    return raw[offset + 32:offset + 32 + length].decode("utf-8", errors="replace")
+
+
+def _encode(*values) -> str:
+    """ABI-encode a flat tuple of str / int / address ("0x" + 40 hex) values."""
+    head, tail = [], b""
+    for value in values:
+        if isinstance(value, int):
+            head.append(value.to_bytes(32, "big"))
+        elif value.startswith("0x") and len(value) == 42:
+            head.append(bytes.fromhex(value[2:]).rjust(32, b"\x00"))
+        else:
+            encoded = value.encode()
+            head.append((32 * len(values) + len(tail)).to_bytes(32, "big"))
+            tail += len(encoded).to_bytes(32, "big") + encoded + b"\x00" * (-len(encoded) % 32)
+    return "0x" + (b"".join(head) + tail).hex()
+
+
+def decode_log(log: dict) -> Optional[dict]:
+    """Decode a JSON-RPC log into a mirror row, or None for other events."""
+    topics = log.get("topics") or []
+    if len(topics) < 2:
+        return None
+    raw = _words(log["data"])
+    row = {
+        "batchHash": topics[1].lower(),
+        "blockNumber": int(log["blockNumber"], 16),
+        "txHash": log["transactionHash"],
+        "logIndex": int(log["logIndex"], 16),
+    }
+    if topics[0] == DRUG_REGISTERED_TOPIC:
+        return {
+            **row, "event": "DrugRegistered",
+            "name": _string(raw, 0), "manufacturer": _string(raw, 1),
+            "timestamp": _uint(raw, 2), "account": _address(raw, 3),
+        }
+    if topics[0] == DRUG_VERIFIED_TOPIC:
+        return {**row, "event": "DrugVerified", "account": _address(raw, 0), "timestamp": _uint(raw, 1)}
+    return None
+
+# --- event sources ----------------------------------------------------------
+
+
+class ChainSourceError(Exception):
+    pass
+
+
+class ChainRpcError(ChainSourceError):
+    """The node answered with a JSON-RPC error (e.g. too many results)."""
+
+
+class JsonRpcSource:
+    """eth_blockNumber / eth_getLogs over HTTP JSON-RPC."""
+
+    def __init__(self, url: str, timeout: float = 10.0):
+        import httpx
+
+        self.url = url
+        self._client = httpx.Client(timeout=timeout)
+        self._id = 0
+
+    def _call(self, method: str, params: list):
+        self._id += 1
+        try:
+            response = self._client.post(self.url, json={"jsonrpc": "2.0", "id": self._id, "method": method, "params": params})
+            response.raise_for_status()
+            body = response.json()
+        except Exception as e:
+            raise ChainSourceError(f"{method} failed: {e}")
+        if body.get("error"):
+            raise ChainRpcError(f"{method} failed: {body['error'].get('message', body['error'])}")
+        return body["result"]
+
+    def block_number(self) -> int:
+        return int(self._call("eth_blockNumber", []), 16)
+
+    def get_logs(self, address: str, from_block: int, to_block: int, topics: list) -> List[dict]:
+        return self._call("eth_getLogs", [{
+            "address": address, "fromBlock": hex(from_block), "toBlock": hex(to_block), "topics": topics,
+        }])
+
+    def close(self):
+        self._client.close()
+
+
+class LocalChain:
+    """In-process stand-in for a node running DrugRegister.
+
+    Each call mines one block and emits logs in the JSON-RPC shape, so the
+    mirror can be exercised without a node. ``save``/``load`` turn the log
+    list into a recorded fixture.
+    """
+
+    def __init__(self, address: str, head: int = 0, logs: Optional[List[dict]] = None):
+        self.address = address.lower()
+        self.head = head
+        self.logs = logs or []
+        self._registered = {log["topics"][1] for log in self.logs if log["topics"][0] == DRUG_REGISTERED_TOPIC}
+
+    def _emit(self, topic: str, key: str, data: str):
+        self.head += 1
+        self.logs.append({
+            "address": self.address,
+            "topics": [topic, key],
+            "data": data,
+            "blockNumber": hex(self.head),
+            # Any unique 32 bytes will do for a stand-in transaction hash
+            "transactionHash": "0x" + hashlib.sha256(f"{self.head}:{key}:{topic}".encode()).hexdigest(),
+            "logIndex": "0x0",
+            "removed": False,
+        })
+
+    def register_drug(self, name: str, batch_id: str, manufacturer: str, sender: str, timestamp: Optional[int] = None):
+        key = batch_hash(batch_id)
+        if key in self._registered:
+            raise ChainSourceError("Drug with this batch ID already exists")
+        self._registered.add(key)
+        self._emit(DRUG_REGISTERED_TOPIC, key,
+                   _encode(name, manufacturer, timestamp or int(time.time()), sender.lower()))
+
+    def verify_drug(self, batch_id: str, sender: str, timestamp: Optional[int] = None):
+        key = batch_hash(batch_id)
+        if key not in self._registered:
+            raise ChainSourceError("Drug not found")
+        self._emit(DRUG_VERIFIED_TOPIC, key, _encode(sender.lower(), timestamp or int(time.time())))
+
+    def mine(self, blocks: int = 1):
+        self.head += blocks
+
+    def block_number(self) -> int:
+        return self.head
+
+    def get_logs(self, address: str, from_block: int, to_block: int, topics: list) -> List[dict]:
+        wanted = set(topics[0]) if topics and topics[0] else None
+        return [
+            log for log in self.logs
+            if log["address"] == address.lower()
+            and from_block <= int(log["blockNumber"], 16) <= to_block
+            and (wanted is None or log["topics"][0] in wanted)
+        ]
+
+    def save(self, path: str):
+        with open(path, "w") as f:
+            json.dump({"address": self.address, "head": self.head, "logs": self.logs}, f, indent=1)
+
+    @classmethod
+    def load(cls, path: str) -> "LocalChain":
+        with open(path) as f:
+            fixture = json.load(f)
+        return cls(fixture["address"], fixture["head"], fixture["logs"])
+
+# --- mirror -----------------------------------------------------------------
+
+
+VERIFY_SQL = """
+    SELECT d.name, d.manufacturer, d.registered_at, d.registered_by, d.block_number, d.tx_hash,
+        COUNT(v.tx_hash), MAX(v.verified_at)
+    FROM chain_drugs d
+    LEFT JOIN chain_verifications v ON v.contract = d.contract AND v.batch_hash = d.batch_hash
+    WHERE d.contract = ? AND d.batch_hash = ?
+    GROUP BY d.contract, d.batch_hash
+"""
+
+
+def apply_logs(conn: sqlite3.Connection, contract: str, logs: List[dict]) -> dict:
+    """Insert decoded logs; replays of already mirrored logs are ignored."""
+    registered = verified = 0
+    for log in logs:
+        if log.get("removed"):
+            continue
+        row = decode_log(log)
+        if row is None:
+            continue
+        if row["event"] == "DrugRegistered":
+            registered += conn.execute(
+                """
+                INSERT OR IGNORE INTO chain_drugs
+                    (contract, batch_hash, name, manufacturer, registered_at, registered_by, block_number, tx_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (contract, row["batchHash"], row["name"], row["manufacturer"], row["timestamp"],
+                 row["account"], row["blockNumber"], row["txHash"]),
+            ).rowcount
+        else:
+            verified += conn.execute(
+                """
+                INSERT OR IGNORE INTO chain_verifications
+                    (contract, tx_hash, log_index, batch_hash, verified_by, verified_at, block_number)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (contract, row["txHash"], row["logIndex"], row["batchHash"], row["account"],
+                 row["timestamp"], row["blockNumber"]),
+            ).rowcount
+    return {"registered": registered, "verified": verified}
+
+
+class ChainMirror:
+    """Incrementally copies DrugRegister events from ``source`` into SQLite."""
+
+    def __init__(self, source, address: str, confirmations: int = DEFAULT_CONFIRMATIONS,
+                 start_block: int = 0, page_blocks: int = DEFAULT_PAGE_BLOCKS, interval: float = 30.0):
+        self.source = source
+        self.address = address.lower()
+        self.confirmations = confirmations
+        self.start_block = start_block
+        self.page_blocks = page_blocks
+        self.interval = interval
+        self.syncs = 0
+        self.last_sync: Optional[dict] = None
+
+    def cursor(self, conn: sqlite3.Connection) -> Optional[int]:
+        row = conn.execute("SELECT last_block FROM chain_cursors WHERE contract = ?", (self.address,)).fetchone()
+        return row[0] if row else None
+
+    def _save_cursor(self, conn: sqlite3.Connection, block: int):
+        conn.execute(
+            """
+            INSERT INTO chain_cursors (contract, last_block, updated_at) VALUES (?, ?, ?)
+            ON CONFLICT(contract) DO UPDATE SET last_block = excluded.last_block, updated_at = excluded.updated_at
+            """,
+            (self.address, block, datetime.now()),
+        )
+
+    def sync(self, conn: sqlite3.Connection, max_pages: Optional[int] = None) -> dict:
+        """Mirror confirmed blocks past the cursor, one transaction per page of logs."""
+        started = time.perf_counter()
+        head = self.source.block_number() - self.confirmations
+        saved = self.cursor(conn)
+        cursor = self.start_block - 1 if saved is None else saved
+        page = self.page_blocks
+        totals = {"registered": 0, "verified": 0, "logs": 0, "pages": 0}
+        while cursor < head and (max_pages is None or totals["pages"] < max_pages):
+            to_block = min(head, cursor + page)
+            try:
+                logs = self.source.get_logs(
+                    self.address, cursor + 1, to_block, [[DRUG_REGISTERED_TOPIC, DRUG_VERIFIED_TOPIC]]
+                )
+            except ChainRpcError:
+                # Providers cap the size of one eth_getLogs answer; retry smaller
+                if page == 1:
+                    raise
+                page = max(1, page // 2)
+                continue
+
+            # Empty ranges only move the cursor, which is saved once at the end
+            if logs:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    applied = apply_logs(conn, self.address, logs)
+                    self._save_cursor(conn, to_block)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                saved = to_block
+                totals["registered"] += applied["registered"]
+                totals["verified"] += applied["verified"]
+                totals["logs"] += len(logs)
+            totals["pages"] += 1
+            cursor = to_block
+        if cursor != saved:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._save_cursor(conn, cursor)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        self.syncs += 1
+        self.last_sync = {
+            "at": datetime.now().isoformat(),
+            "durationMs": round((time.perf_counter() - started) * 1000, 2),
+            "cursor": cursor,
+            "confirmedHead": head,
+            **totals,
+        }
+        return self.last_sync
+
+    def verify(self, conn: sqlite3.Connection, batch_id: str) -> dict:
+        row = conn.execute(VERIFY_SQL, (self.address, batch_hash(batch_id))).fetchone()
+        result = {"batchId": batch_id, "contract": self.address, "mirroredThroughBlock": self.cursor(conn)}
+        if row is None:
+            return {**result, "registered": False}
+        name, manufacturer, registered_at, registered_by, block_number, tx_hash, verifications, last_verified = row
+        return {
+            **result,
+            "registered": True,
+            "name": name,
+            "manufacturer": manufacturer,
+            "registeredAt": datetime.fromtimestamp(registered_at).isoformat(),
+            "registeredBy": registered_by,
+            "blockNumber": block_number,
+            "transactionHash": tx_hash,
+            "verificationCount": verifications,
+            "lastVerifiedAt": datetime.fromtimestamp(last_verified).isoformat() if last_verified else None,
+        }
+
+    def stats(self) -> dict:
+        return {
+            "contract": self.address,
+            "connected": self.source is not None,
+            "confirmations": self.confirmations,
+            "syncs": self.syncs,
+            "lastSync": self.last_sync,
+        }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--fixture", help="recorded event fixture (JSON) to mirror")
+    source.add_argument("--rpc-url", help="JSON-RPC endpoint of an Ethereum node")
+    parser.add_argument("--address", default=os.getenv("CONTRACT_ADDRESS"), help="DrugRegister contract address")
+    parser.add_argument("--confirmations", type=int, default=DEFAULT_CONFIRMATIONS)
+    parser.add_argument("--start-block", type=int, help="first block to read (default: the deployment block "
+                        "for a fixture, 0 for a node)")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    from database import DatabaseSettings
+    from migrations import migrate
+
+    load_dotenv()
+    settings = DatabaseSettings.from_url(os.getenv("DATABASE_URL", "sqlite:///./medchain.db"))
+    if args.fixture:
+        chain = LocalChain.load(args.fixture)
+        first = min((int(log["blockNumber"], 16) for log in chain.logs), default=chain.head)
+        start_block = first if args.start_block is None else args.start_block
+        mirror = ChainMirror(chain, args.address or chain.address, confirmations=0, start_block=start_block)
+    else:
+        if not args.address:
+            parser.error("--address (or CONTRACT_ADDRESS) is required with --rpc-url")
+        mirror = ChainMirror(JsonRpcSource(args.rpc_url), args.address, args.confirmations, args.start_block or 0)
+
+    conn = sqlite3.connect(settings.path, isolation_level=None)
+    try:
+        migrate(conn)
+        result = mirror.sync(conn)
+        print(f"Mirrored blocks through {result['cursor']}: {result['registered']} registrations, "
+              f"{result['verified']} verifications from {result['logs']} logs in {result['durationMs']}ms")
+        return 0
+    except ChainSourceError as e:
+        print(f"Sync failed: {e}")
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
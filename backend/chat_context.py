@@ -0,0 +1,191 @@
+"""Grounded context for the AI chat prompt.
+
+A compact snapshot of the figures the assistant is asked about (per-location
+totals, low stock, batches expiring soon, pending reorders) is read from the
+aggregate tables and hot-path indexes, then kept in memory and refreshed on
+an interval. Each chat message gets only the slice relevant to its question,
+trimmed to a token budget, so answering costs no database work.
+"""
+import re
+import threading
+from datetime import date, datetime
+from typing import List, Optional
+
+from aggregates import SUMMARY_LOW_STOCK_THRESHOLD
+
+EXPIRY_WINDOW_DAYS = 30
+SNAPSHOT_ROWS = 200
+DEFAULT_TOKEN_BUDGET = 600
+
+_EPOCH = date(1970, 1, 1)
+
+# Question keywords -> snapshot sections
+INTENT_KEYWORDS = {
+    "expiring": ("expir", "expiry", "expired", "date", "waste"),
+    "low_stock": ("low", "stock", "shortage", "out of", "running", "reorder", "order", "supply"),
+    "reorders": ("reorder", "order", "pending", "delivery", "supplier", "shipment"),
+    "locations": ("summary", "overview", "report", "weekly", "total", "location", "site", "hospital", "clinic", "pharmacy"),
+}
+
+
+LOW_STOCK_SQL = "SELECT location, drug_name, quantity FROM inventory WHERE quantity < ? ORDER BY quantity ASC LIMIT ?"
+
+EXPIRING_SQL = """
+    SELECT location, drug_name, quantity, expiry_date, expiry_day - ?
+    FROM inventory WHERE expiry_day <= ? ORDER BY expiry_day ASC LIMIT ?
+"""
+
+PENDING_REORDERS_SQL = """
+    SELECT location, drug_name, quantity, expected_delivery FROM reorders
+    WHERE status = 'pending' ORDER BY expected_delivery ASC LIMIT ?
+"""
+
+
+def estimate_tokens(text: str) -> int:
+    # Rough average for English text
+    return len(text) // 4 + 1
+
+
+class InventorySnapshot:
+    def __init__(self, taken_at: datetime, drug_types: int, locations: list, low_stock: list,
+                 expiring: list, pending_reorders: list, pending_count: int):
+        self.taken_at = taken_at
+        self.drug_types = drug_types
+        self.locations = locations
+        self.low_stock = low_stock
+        self.expiring = expiring
+        self.pending_reorders = pending_reorders
+        self.pending_count = pending_count
+
+
+def read_snapshot(conn) -> InventorySnapshot:
+    today = (date.today() - _EPOCH).days
+    drug_types = conn.execute("SELECT COUNT(*) FROM inventory_drug_stats").fetchone()[0]
+    locations = conn.execute(
+        "SELECT location, drug_types, total_quantity, low_stock_count FROM inventory_location_stats ORDER BY location"
+    ).fetchall()
+    low_stock = conn.execute(LOW_STOCK_SQL, (SUMMARY_LOW_STOCK_THRESHOLD, SNAPSHOT_ROWS)).fetchall()
+    expiring = conn.execute(EXPIRING_SQL, (today, today + EXPIRY_WINDOW_DAYS, SNAPSHOT_ROWS)).fetchall()
+    pending_reorders = conn.execute(PENDING_REORDERS_SQL, (SNAPSHOT_ROWS,)).fetchall()
+    pending_count = conn.execute("SELECT COUNT(*) FROM reorders WHERE status = 'pending'").fetchone()[0]
+    return InventorySnapshot(
+        datetime.now(), drug_types, locations, low_stock, expiring, pending_reorders, pending_count
+    )
+
+
+class ChatContextBuilder:
+    """Holds the latest snapshot and renders question-specific context."""
+
+    def __init__(self, refresh_interval: float = 60.0, token_budget: int = DEFAULT_TOKEN_BUDGET):
+        self.refresh_interval = refresh_interval
+        self.token_budget = token_budget
+        self.snapshot: Optional[InventorySnapshot] = None
+        self._lock = threading.Lock()
+        self.refreshes = 0
+
+    def refresh(self, conn) -> InventorySnapshot:
+        snapshot = read_snapshot(conn)
+        with self._lock:
+            self.snapshot = snapshot
+            self.refreshes += 1
+        return snapshot
+
+    def _intents(self, question: str) -> set:
+        lowered = question.lower()
+        intents = {name for name, words in INTENT_KEYWORDS.items() if any(word in lowered for word in words)}
+        # Nothing recognisable (or another language): give a bit of everything
+        return intents or set(INTENT_KEYWORDS)
+
+    def _mentions(self, question: str, names) -> set:
+        lowered = question.lower()
+        mentioned = set()
+        for name in names:
+            # "Paracetamol 500mg" is mentioned by "paracetamol"
+            stem = re.split(r"\s+\d", name.lower(), maxsplit=1)[0]
+            if name.lower() in lowered or (len(stem) >= 4 and stem in lowered):
+                mentioned.add(name)
+        return mentioned
+
+    def render(self, question: str) -> str:
+        snapshot = self.snapshot
+        if snapshot is None:
+            return "Live inventory data is not available right now."
+
+        intents = self._intents(question)
+        locations = self._mentions(question, [row[0] for row in snapshot.locations])
+        drugs = self._mentions(
+            question,
+            {row[1] for row in snapshot.low_stock} | {row[1] for row in snapshot.expiring}
+            | {row[1] for row in snapshot.pending_reorders},
+        )
+
+        def relevant(rows):
+            return [
+                row for row in rows
+                if (not locations or row[0] in locations) and (not drugs or row[1] in drugs)
+            ]
+
+        expired = sum(1 for row in snapshot.expiring if row[4] <= 0)
+        lines = [
+            f"Live data as of {snapshot.taken_at.strftime('%Y-%m-%d %H:%M')}: "
+            f"{snapshot.drug_types} drug types across {len(snapshot.locations)} locations; "
+            f"{sum(row[3] for row in snapshot.locations)} items below {SUMMARY_LOW_STOCK_THRESHOLD} units; "
+            f"{len(snapshot.expiring)}{'+' if len(snapshot.expiring) == SNAPSHOT_ROWS else ''} batches expired "
+            f"or expiring within {EXPIRY_WINDOW_DAYS} days ({expired} already expired); "
+            f"{snapshot.pending_count} pending reorders."
+        ]
+
+        sections = []
+        if "locations" in intents or locations:
+            sections.append(("Per-location totals (location: drug types, units, low-stock items)", [
+                f"{row[0]}: {row[1]}, {row[2]}, {row[3]}"
+                for row in snapshot.locations if not locations or row[0] in locations
+            ]))
+        if "expiring" in intents:
+            sections.append(("Expired or expiring soon (drug @ location: units, expiry, days left)", [
+                f"{row[1]} @ {row[0]}: {row[2]}, {row[3]}, {row[4]}"
+                for row in relevant(snapshot.expiring)
+            ]))
+        if "low_stock" in intents:
+            sections.append(("Low stock (drug @ location: units)", [
+                f"{row[1]} @ {row[0]}: {row[2]}" for row in relevant(snapshot.low_stock)
+            ]))
+        if "reorders" in intents:
+            sections.append(("Pending reorders (drug @ location: units, expected delivery)", [
+                f"{row[1]} @ {row[0]}: {row[2]}, {row[3] or 'n/a'}"
+                for row in relevant(snapshot.pending_reorders)
+            ]))
+
+        # Split what is left of the budget evenly over the remaining sections,
+        # so one long list can't crowd out the others.
+        remaining = self.token_budget - estimate_tokens(lines[0])
+        for index, (title, items) in enumerate(sections):
+            if remaining <= 0:
+                break
+            block: List[str] = [f"{title}:"]
+            used = estimate_tokens(block[0])
+            limit = remaining // (len(sections) - index)
+            shown = 0
+            for item in items:
+                cost = estimate_tokens(item)
+                if used + cost > limit:
+                    break
+                block.append(f"- {item}")
+                used += cost
+                shown += 1
+            if not items:
+                block.append("- none")
+            elif shown < len(items):
+                block.append(f"- ... {len(items) - shown} more not shown")
+            lines.extend(block)
+            remaining -= used
+        return "\n".join(lines)
+
+    def stats(self) -> dict:
+        snapshot = self.snapshot
+        return {
+            "refreshes": self.refreshes,
+            "refreshIntervalSeconds": self.refresh_interval,
+            "tokenBudget": self.token_budget,
+            "snapshotTakenAt": snapshot.taken_at.isoformat() if snapshot else None,
+        }
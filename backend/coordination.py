@@ -0,0 +1,131 @@
+"""Coordination between worker processes serving the same database.
+
+When gunicorn or uvicorn runs several workers, each one imports main.py and
+keeps its own caches and background loops. This module holds what they
+share. Everything lives next to the SQLite file (or in the temp directory
+for PostgreSQL), so no extra service is needed:
+
+- ``file_lock``: an exclusive flock. Startup migration and seeding run
+  under it, one worker after another.
+- ``SharedCounters``: a small mmap'd array of epoch counters. Writers bump
+  the counters for the locations they changed. Readers compare the values
+  their cached entries were built against, which costs a few memory reads
+  and no syscalls.
+- ``LeaderLock``: a non-blocking flock held by one worker at a time. Only
+  that worker runs the singleton jobs (monitor, ledger maintenance, chain
+  sync). The OS releases the lock when the process dies, so another worker
+  takes over.
+
+On platforms without fcntl the locks are no-ops, so only one worker is
+supported there.
+"""
+import mmap
+import os
+import struct
+import zlib
+from contextlib import contextmanager
+from typing import Iterable
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process only
+    fcntl = None
+
+SLOT_COUNT = 1024
+
+# Reserved slots. Locations hash into the remaining ones; a collision only
+# costs an extra invalidation.
+WRITES_SLOT = 0      # bumped by every write
+RESET_SLOT = 1       # bumped when everything must be dropped
+BATCHES_SLOT = 2     # bumped when new batch IDs may exist
+_FIRST_LOCATION_SLOT = 8
+
+_COUNTER = struct.Struct("<Q")
+
+
+@contextmanager
+def file_lock(path: str):
+    """Hold an exclusive lock on ``path`` for the duration of the block."""
+    with open(path, "a+b") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+class SharedCounters:
+    """Fixed array of 64-bit counters in a memory-mapped file."""
+
+    def __init__(self, path: str, slots: int = SLOT_COUNT):
+        self.path = path
+        self.slots = slots
+        size = slots * _COUNTER.size
+        self._file = open(path, "a+b")
+        with self._locked():
+            if os.fstat(self._file.fileno()).st_size < size:
+                self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+
+    @contextmanager
+    def _locked(self):
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+
+    def slot(self, location: str) -> int:
+        span = self.slots - _FIRST_LOCATION_SLOT
+        return _FIRST_LOCATION_SLOT + zlib.crc32(location.encode()) % span
+
+    def read(self, slot: int) -> int:
+        return _COUNTER.unpack_from(self._map, slot * _COUNTER.size)[0]
+
+    def bump(self, slots: Iterable[int]):
+        # Read-modify-write under the file lock so concurrent bumps from
+        # different workers are never lost.
+        with self._locked():
+            for slot in set(slots):
+                offset = slot * _COUNTER.size
+                _COUNTER.pack_into(self._map, offset, _COUNTER.unpack_from(self._map, offset)[0] + 1)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class LeaderLock:
+    """Non-blocking lock that elects one worker to run the singleton jobs."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._handle = None
+
+    @property
+    def held(self) -> bool:
+        return self._handle is not None
+
+    def try_acquire(self) -> bool:
+        if self._handle is not None:
+            return True
+        handle = open(self.path, "a+b")
+        if fcntl is not None:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                handle.close()
+                return False
+        self._handle = handle
+        return True
+
+    def release(self):
+        if self._handle is not None:
+            if fcntl is not None:
+                fcntl.flock(self._handle, fcntl.LOCK_UN)
+            self._handle.close()
+            self._handle = None
@@ -0,0 +1,154 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlparse
+
+# Pragmas applied to every pooled connection. Any of them can be overridden
+# from the DATABASE_URL query string, e.g.
+#   sqlite:///./medchain.db?pool_size=8&synchronous=FULL&mmap_size=0
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": "-20000",       # negative value = size in KiB (~20MB)
+    "mmap_size": "268435456",     # 256MB
+    "temp_store": "MEMORY",
+    "busy_timeout": "5000",
+}
+
+DEFAULT_POOL_SIZE = 8
+DEFAULT_STATEMENT_CACHE_SIZE = 256
+DEFAULT_POOL_TIMEOUT = 30.0
+
+
+class DatabaseSettings:
+    def __init__(
+        self,
+        path: str,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        statement_cache_size: int = DEFAULT_STATEMENT_CACHE_SIZE,
+        pool_timeout: float = DEFAULT_POOL_TIMEOUT,
+        pragmas: Optional[Dict[str, str]] = None,
+    ):
+        self.path = path
+        self.pool_size = pool_size
+        self.statement_cache_size = statement_cache_size
+        self.pool_timeout = pool_timeout
+        self.pragmas = {**DEFAULT_PRAGMAS, **(pragmas or {})}
+
+    @classmethod
+    def from_url(cls, url: str) -> "DatabaseSettings":
+        parsed = urlparse(url)
+        if parsed.scheme != "sqlite":
+            raise ValueError(f"Unsupported DATABASE_URL scheme: {parsed.scheme!r}")
+
+        # sqlite:///./medchain.db -> ./medchain.db, sqlite:////data/x.db -> /data/x.db
+        path = parsed.path[1:] if parsed.path.startswith("/") else parsed.path
+        if not path:
+            path = "medchain.db"
+
+        options = dict(parse_qsl(parsed.query))
+        pool_size = int(options.pop("pool_size", os.getenv("DB_POOL_SIZE", DEFAULT_POOL_SIZE)))
+        statement_cache_size = int(options.pop("statement_cache_size", DEFAULT_STATEMENT_CACHE_SIZE))
+        pool_timeout = float(options.pop("pool_timeout", DEFAULT_POOL_TIMEOUT))
+
+        unknown = set(options) - set(DEFAULT_PRAGMAS)
+        if unknown:
+            raise ValueError(f"Unknown DATABASE_URL options: {', '.join(sorted(unknown))}")
+
+        return cls(
+            path=path,
+            pool_size=pool_size,
+            statement_cache_size=statement_cache_size,
+            pool_timeout=pool_timeout,
+            pragmas=options,
+        )
+
+
+class ConnectionPool:
+    """Fixed-size pool of SQLite connections shared across requests.
+
+    Connections are created lazily up to ``pool_size`` and handed out to one
+    caller at a time, so they can be used from any worker thread.
+    """
+
+    def __init__(self, settings: DatabaseSettings):
+        self.settings = settings
+        self._idle = queue.LifoQueue()
+        self._all = []
+        self._lock = threading.Lock()
+        # Optional metrics.SqlProfiler; set before the first connection opens
+        self.profiler = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.settings.path,
+            check_same_thread=False,
+            cached_statements=self.settings.statement_cache_size,
+            factory=self.profiler.connection_factory if self.profiler is not None else sqlite3.Connection,
+        )
+        for name, value in self.settings.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def open(self):
+        # Pre-warm one connection so the journal mode is switched to WAL and
+        # any configuration error surfaces at startup rather than on first use.
+        with self.connection():
+            pass
+
+    def close(self):
+        with self._lock:
+            connections, self._all = self._all, []
+            self._idle = queue.LifoQueue()
+        for conn in connections:
+            conn.close()
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if len(self._all) < self.settings.pool_size:
+                conn = self._connect()
+                self._all.append(conn)
+                return conn
+
+        try:
+            return self._idle.get(timeout=self.settings.pool_timeout)
+        except queue.Empty:
+            raise RuntimeError("Timed out waiting for a database connection")
+
+    def _release(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        if conn in self._all:
+            self._idle.put(conn)
+        else:
+            # Pool was closed while the connection was checked out
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        if self.profiler is None:
+            conn = self._acquire()
+        else:
+            started = time.perf_counter()
+            conn = self._acquire()
+            self.profiler.record_pool_wait(time.perf_counter() - started)
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    def stats(self) -> dict:
+        return {
+            "size": self.settings.pool_size,
+            "open": len(self._all),
+            "idle": self._idle.qsize(),
+        }
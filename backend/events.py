@@ -0,0 +1,289 @@
+"""Server-Sent Events push feed for inventory, reorder and alert changes.
+
+Write paths call ``EventBroker.publish`` (from any thread). Events are
+buffered for a short coalescing window, keyed by (type, location), so a
+burst of writes to one location becomes a single event carrying a count.
+When the window closes, each event is serialised once and handed to the
+subscribers watching that location, looked up through a location index.
+Subscribers are plain objects woken by an asyncio.Event, so thousands of
+idle connections cost one parked task each and no polling.
+
+A slow client cannot grow its buffer without bound: pending events for it
+are keyed the same way and replace each other, and past MAX_PENDING keys
+the client is told to resync instead.
+
+With several worker processes, an ``EventRelay`` carries flushed events
+between them through a small SQLite file. Each worker appends what it
+flushes and polls once per coalescing window for what the others flushed,
+so a client sees every change whichever worker holds its connection. The
+relay file is only touched from a dedicated thread, never from the event
+loop, so a busy or slow disk cannot stall the SSE streams or the API.
+"""
+import asyncio
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Event location for changes that span every location
+ALL_LOCATIONS = "*"
+MAX_PENDING = 256
+
+
+class Subscriber:
+    __slots__ = ("locations", "pending", "wakeup", "overflowed")
+
+    def __init__(self, locations: Optional[Set[str]]):
+        self.locations = locations
+        self.pending: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self.wakeup = asyncio.Event()
+        self.overflowed = False
+
+
+class EventRelay:
+    """Append-only SQLite log of flushed events shared by the workers."""
+
+    def __init__(self, path: str, retention: float = 60.0):
+        self.path = path
+        self.retention = retention
+        self.origin = os.getpid()
+        self._conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS relay_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                origin INTEGER NOT NULL,
+                created REAL NOT NULL,
+                event TEXT NOT NULL
+            )
+        """)
+        self._last_id = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM relay_events").fetchone()[0]
+        self._pruned_at = time.time()
+        self.pushed = 0
+        self.pulled = 0
+
+    def push(self, events: List[dict]):
+        now = time.time()
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.executemany(
+                "INSERT INTO relay_events (origin, created, event) VALUES (?, ?, ?)",
+                [(self.origin, now, json.dumps(event, separators=(",", ":"))) for event in events],
+            )
+            if now - self._pruned_at > self.retention:
+                self._conn.execute("DELETE FROM relay_events WHERE created < ?", (now - self.retention,))
+                self._pruned_at = now
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self.pushed += len(events)
+
+    def pull(self) -> List[dict]:
+        """Events flushed by other workers since the last call."""
+        rows = self._conn.execute(
+            "SELECT id, origin, event FROM relay_events WHERE id > ? ORDER BY id", (self._last_id,)
+        ).fetchall()
+        if not rows:
+            return []
+        self._last_id = rows[-1][0]
+        events = [json.loads(event) for _, origin, event in rows if origin != self.origin]
+        self.pulled += len(events)
+        return events
+
+    def close(self):
+        self._conn.close()
+
+
+class EventBroker:
+    def __init__(self, coalesce_window: float = 0.25, heartbeat: float = 15.0, max_subscribers: int = 10000,
+                 relay: Optional[EventRelay] = None):
+        self.coalesce_window = coalesce_window
+        self.heartbeat = heartbeat
+        self.max_subscribers = max_subscribers
+        self.relay = relay
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscribers: Set[Subscriber] = set()
+        # Subscribers indexed by the locations they watch; None = all
+        self._by_location: Dict[Optional[str], Set[Subscriber]] = {None: set()}
+        self._buffer: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._flush_scheduled = False
+        self._relay_outbox: "queue.SimpleQueue[Optional[List[dict]]]" = queue.SimpleQueue()
+        self._relay_thread: Optional[threading.Thread] = None
+        self._sequence = 0
+        self.published = 0
+        self.coalesced = 0
+        self.dispatched = 0
+        self.deliveries = 0
+        self.resyncs = 0
+
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self._loop = loop or asyncio.get_running_loop()
+        if self.relay is not None:
+            self._relay_thread = threading.Thread(
+                target=self._run_relay, args=(self._loop,), name="event-relay", daemon=True
+            )
+            self._relay_thread.start()
+
+    def stop(self):
+        if self._relay_thread is not None:
+            self._relay_outbox.put(None)
+            self._relay_thread.join()
+            self._relay_thread = None
+        self._loop = None
+        for subscriber in self._subscribers:
+            subscriber.wakeup.set()
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None
+
+    def publish(self, event_type: str, locations: Optional[Iterable[str]], **data):
+        """Queue an event for each location (None means every location).
+
+        Safe to call from worker threads; a no-op until the broker is started.
+        """
+        loop = self._loop
+        if loop is None:
+            return
+        targets = [ALL_LOCATIONS] if locations is None else list(locations)
+        loop.call_soon_threadsafe(self._enqueue, event_type, targets, data)
+
+    def _enqueue(self, event_type: str, locations, data: dict):
+        for location in locations:
+            self.published += 1
+            key = (event_type, location)
+            event = self._buffer.get(key)
+            if event is None:
+                self._buffer[key] = {"type": event_type, "location": location, "count": 1, **data}
+            else:
+                self.coalesced += 1
+                event.update(data)
+                event["count"] += 1
+        if not self._flush_scheduled and self._loop is not None:
+            self._flush_scheduled = True
+            self._loop.call_later(self.coalesce_window, self._flush)
+
+    def _flush(self):
+        self._flush_scheduled = False
+        events, self._buffer = self._buffer, OrderedDict()
+        for event in events.values():
+            event["at"] = datetime.now().isoformat()
+            self._dispatch(event)
+        if self._relay_thread is not None and events:
+            self._relay_outbox.put(list(events.values()))
+
+    def _run_relay(self, loop: asyncio.AbstractEventLoop):
+        # Pushes what this worker flushed and polls once per coalescing window
+        # for what the others flushed; only this thread uses the relay file.
+        while True:
+            try:
+                batch = self._relay_outbox.get(timeout=self.coalesce_window)
+            except queue.Empty:
+                batch = []
+            if batch is None:
+                return
+            try:
+                if batch:
+                    self.relay.push(batch)
+                events = self.relay.pull()
+            except sqlite3.Error:
+                logger.exception("Event relay error")
+                continue
+            if events:
+                try:
+                    loop.call_soon_threadsafe(self._dispatch_relayed, events)
+                except RuntimeError:  # loop already closed
+                    return
+
+    def _dispatch_relayed(self, events: List[dict]):
+        if self._loop is None:
+            return
+        for event in events:
+            self._dispatch(event)
+
+    def _dispatch(self, event: dict):
+        key = (event["type"], event["location"])
+        self._sequence += 1
+        payload = (
+            f"id: {self._sequence}\nevent: {event['type']}\n"
+            f"data: {json.dumps(event, separators=(',', ':'))}\n\n"
+        ).encode()
+        self.dispatched += 1
+        for subscriber in self._audience(event["location"]):
+            if key not in subscriber.pending and len(subscriber.pending) >= MAX_PENDING:
+                subscriber.overflowed = True
+            else:
+                subscriber.pending[key] = payload
+                subscriber.pending.move_to_end(key)
+            subscriber.wakeup.set()
+
+    def _audience(self, location: str) -> Iterable[Subscriber]:
+        if location == ALL_LOCATIONS:
+            return self._subscribers
+        return self._by_location[None] | self._by_location.get(location, set())
+
+    def subscribe(self, locations: Optional[Set[str]] = None) -> Subscriber:
+        if len(self._subscribers) >= self.max_subscribers:
+            raise OverflowError("Too many event subscribers")
+        subscriber = Subscriber(locations)
+        self._subscribers.add(subscriber)
+        for location in locations if locations is not None else [None]:
+            self._by_location.setdefault(location, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+        for location in subscriber.locations if subscriber.locations is not None else [None]:
+            watchers = self._by_location.get(location)
+            if watchers is not None:
+                watchers.discard(subscriber)
+                if not watchers and location is not None:
+                    del self._by_location[location]
+
+    async def stream(self, subscriber: Subscriber) -> AsyncIterator[bytes]:
+        """SSE byte stream for one subscriber; ends when the broker stops."""
+        try:
+            yield f"retry: 3000\nevent: ready\ndata: {json.dumps({'locations': sorted(subscriber.locations or [])})}\n\n".encode()
+            while self.running:
+                try:
+                    await asyncio.wait_for(subscriber.wakeup.wait(), timeout=self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                subscriber.wakeup.clear()
+                if subscriber.overflowed:
+                    subscriber.overflowed = False
+                    subscriber.pending.clear()
+                    self.resyncs += 1
+                    yield b"event: resync\ndata: {}\n\n"
+                    continue
+                chunks, subscriber.pending = list(subscriber.pending.values()), OrderedDict()
+                if chunks:
+                    self.deliveries += len(chunks)
+                    yield b"".join(chunks)
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "subscribers": len(self._subscribers),
+            "maxSubscribers": self.max_subscribers,
+            "coalesceWindowMs": round(self.coalesce_window * 1000),
+            "published": self.published,
+            "coalesced": self.coalesced,
+            "dispatched": self.dispatched,
+            "deliveries": self.deliveries,
+            "resyncs": self.resyncs,
+            "relayed": {"pushed": self.relay.pushed, "pulled": self.relay.pulled} if self.relay else None,
+        }
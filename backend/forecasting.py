@@ -0,0 +1,300 @@
+"""Local demand forecasting from inventory consumption history.
+
+Consumption is the sum of stock decreases per (location, drug, day), taken
+from the stock_movements ledger. Every series is fitted at once on a NumPy matrix
+(series x days):
+
+* smooth series use simple exponential smoothing (SES)
+* intermittent series (average demand interval > 1.32 days) use Croston's
+  method with the Syntetos-Boylan bias correction
+
+Series are fitted in-process, chunk by chunk. The results are written to
+demand_predictions, which /predict-demand then serves. Each refit is
+logged in forecast_runs, so an empty result after a fit can be told apart
+from a store that was never fitted.
+
+    python forecasting.py [--horizon 30] [--lookback 90]
+"""
+import argparse
+import os
+import sqlite3
+import time
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_HORIZON_DAYS = 30
+DEFAULT_LOOKBACK_DAYS = 90
+DEFAULT_ALPHA = 0.2
+INTERMITTENT_ADI = 1.32
+TREND_TOLERANCE = 0.1
+CHUNK_SIZE = 10_000
+
+# Epoch-day of a SQLite timestamp, matching inventory.expiry_day numbering
+_DAY_SQL = "CAST(julianday(recorded_at) - 2440587.5 AS INTEGER)"
+
+# Day leads the GROUP BY so the planner drives the query from the
+# recorded_at range instead of walking the whole (location, drug) index.
+CONSUMPTION_SQL = f"""
+    SELECT location, drug_name, {_DAY_SQL} AS day, -SUM(delta)
+    FROM stock_movements
+    WHERE recorded_at >= strftime('%Y-%m-%d %H:%M:%f', 'now', :window) AND delta < 0{{filters}}
+    GROUP BY day, location, drug_name
+"""
+
+
+def has_fitted(conn: sqlite3.Connection) -> bool:
+    return conn.execute("SELECT 1 FROM forecast_runs LIMIT 1").fetchone() is not None
+
+
+def consumption_query(
+    lookback_days: int = DEFAULT_LOOKBACK_DAYS,
+    location: Optional[str] = None,
+    drug_name: Optional[str] = None,
+) -> Tuple[str, dict]:
+    filters = ""
+    params = {"window": f"-{lookback_days} days"}
+    if location:
+        filters += " AND location = :location"
+        params["location"] = location
+    if drug_name:
+        filters += " AND drug_name = :drug_name"
+        params["drug_name"] = drug_name
+    return CONSUMPTION_SQL.format(filters=filters), params
+
+
+def load_consumption(
+    conn: sqlite3.Connection,
+    lookback_days: int = DEFAULT_LOOKBACK_DAYS,
+    location: Optional[str] = None,
+    drug_name: Optional[str] = None,
+) -> Tuple[List[Tuple[str, str]], np.ndarray]:
+    """Return (keys, matrix) where matrix[i, d] is units consumed on day d."""
+    today = conn.execute("SELECT CAST(julianday('now') - 2440587.5 AS INTEGER)").fetchone()[0]
+    first_day = today - lookback_days + 1
+
+    rows = conn.execute(*consumption_query(lookback_days, location, drug_name)).fetchall()
+    keys = sorted({(row[0], row[1]) for row in rows})
+    index = {key: i for i, key in enumerate(keys)}
+    matrix = np.zeros((len(keys), lookback_days), dtype=np.float64)
+    if rows:
+        series = np.fromiter((index[(row[0], row[1])] for row in rows), dtype=np.int64, count=len(rows))
+        days = np.fromiter((row[2] - first_day for row in rows), dtype=np.int64, count=len(rows))
+        valid = (days >= 0) & (days < lookback_days)
+        amounts = np.fromiter((row[3] for row in rows), dtype=np.float64, count=len(rows))
+        np.add.at(matrix, (series[valid], days[valid]), amounts[valid])
+    return keys, matrix
+
+
+def simple_exponential_smoothing(demand: np.ndarray, alpha: float = DEFAULT_ALPHA) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorised SES; returns (final level, mean absolute one-step error)."""
+    level = demand[:, 0].copy()
+    abs_error = np.zeros(demand.shape[0])
+    for t in range(1, demand.shape[1]):
+        abs_error += np.abs(demand[:, t] - level)
+        level += alpha * (demand[:, t] - level)
+    return level, abs_error / max(demand.shape[1] - 1, 1)
+
+
+def croston_sba(demand: np.ndarray, alpha: float = DEFAULT_ALPHA) -> np.ndarray:
+    """Vectorised Croston (SBA) per-day demand rate for intermittent series."""
+    n_series, n_days = demand.shape
+    nonzero = demand > 0
+    has_demand = nonzero.any(axis=1)
+    first = np.where(has_demand, nonzero.argmax(axis=1), 0)
+
+    size = demand[np.arange(n_series), first].astype(np.float64)
+    interval = first.astype(np.float64) + 1.0
+    since_last = np.ones(n_series)
+    for t in range(n_days):
+        active = nonzero[:, t] & (t > first)
+        size = np.where(active, size + alpha * (demand[:, t] - size), size)
+        interval = np.where(active, interval + alpha * (since_last - interval), interval)
+        since_last = np.where(active, 1.0, np.where(t > first, since_last + 1.0, since_last))
+
+    rate = (1 - alpha / 2) * size / np.maximum(interval, 1.0)
+    return np.where(has_demand, rate, 0.0)
+
+
+def fit_chunk(demand: np.ndarray, horizon_days: int, alpha: float = DEFAULT_ALPHA) -> dict:
+    """Fit one chunk of series; safe to run in a worker process."""
+    n_days = demand.shape[1]
+    nonzero_days = (demand > 0).sum(axis=1)
+    adi = np.where(nonzero_days > 0, n_days / np.maximum(nonzero_days, 1), np.inf)
+    intermittent = adi > INTERMITTENT_ADI
+
+    ses_rate, mae = simple_exponential_smoothing(demand, alpha)
+    croston_rate = croston_sba(demand, alpha)
+    rate = np.where(intermittent, croston_rate, ses_rate)
+
+    half = n_days // 2
+    recent = demand[:, half:].mean(axis=1)
+    earlier = demand[:, :half].mean(axis=1)
+    change = (recent - earlier) / np.maximum(earlier, 1e-9)
+    trend = np.where(change > TREND_TOLERANCE, 1, np.where(change < -TREND_TOLERANCE, -1, 0))
+    trend = np.where((recent == 0) & (earlier == 0), 0, trend)
+
+    # Confidence shrinks as the one-step error grows relative to mean demand
+    mean = demand.mean(axis=1)
+    confidence = np.clip(1.0 / (1.0 + mae / np.maximum(mean, 1e-9)), 0.05, 0.99)
+    confidence = np.where(mean == 0, 0.5, confidence)
+
+    return {
+        "predicted_demand": np.rint(rate * horizon_days).astype(np.int64),
+        "confidence": np.round(confidence, 3),
+        "trend": trend.astype(np.int8),
+        "intermittent": intermittent,
+    }
+
+
+def fit_all(demand: np.ndarray, horizon_days: int = DEFAULT_HORIZON_DAYS, chunk_size: int = CHUNK_SIZE) -> dict:
+    """Fit every series in-process, chunk by chunk to bound temporary arrays."""
+    if demand.shape[0] == 0:
+        return fit_chunk(demand.reshape(0, max(demand.shape[1], 1)), horizon_days)
+    results = [fit_chunk(demand[i:i + chunk_size], horizon_days) for i in range(0, demand.shape[0], chunk_size)]
+    return {key: np.concatenate([r[key] for r in results]) for key in results[0]}
+
+
+TREND_LABELS = {1: "increasing", 0: "stable", -1: "decreasing"}
+
+
+def store_predictions(
+    conn: sqlite3.Connection,
+    keys: List[Tuple[str, str]],
+    fitted: dict,
+    horizon_days: int,
+    replace_all: bool,
+):
+    """Replace stored predictions for the fitted series (caller commits)."""
+    now = datetime.now()
+    if replace_all:
+        conn.execute("DELETE FROM demand_predictions")
+    else:
+        conn.executemany(
+            "DELETE FROM demand_predictions WHERE location = ? AND drug_name = ?", keys
+        )
+    conn.executemany(
+        """
+        INSERT INTO demand_predictions
+            (location, drug_name, predicted_demand, confidence, prediction_date, horizon_days, method, trend)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            (
+                location, drug_name, int(demand), float(confidence), now, horizon_days,
+                "croston_sba" if intermittent else "ses", TREND_LABELS[int(trend)],
+            )
+            for (location, drug_name), demand, confidence, trend, intermittent in zip(
+                keys,
+                fitted["predicted_demand"],
+                fitted["confidence"],
+                fitted["trend"],
+                fitted["intermittent"],
+            )
+        ),
+    )
+
+
+def refit(
+    conn: sqlite3.Connection,
+    horizon_days: int = DEFAULT_HORIZON_DAYS,
+    lookback_days: int = DEFAULT_LOOKBACK_DAYS,
+    location: Optional[str] = None,
+    drug_name: Optional[str] = None,
+) -> dict:
+    """Refit every series (or one location / drug) and store the forecasts."""
+    started = time.perf_counter()
+    keys, demand = load_consumption(conn, lookback_days, location, drug_name)
+    loaded = time.perf_counter()
+    fitted = fit_all(demand, horizon_days)
+    fitted_at = time.perf_counter()
+    store_predictions(conn, keys, fitted, horizon_days, replace_all=not (location or drug_name))
+    conn.execute(
+        """
+        INSERT INTO forecast_runs (fitted_at, series, horizon_days, lookback_days, location, drug_name)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        (datetime.now(), len(keys), horizon_days, lookback_days, location, drug_name),
+    )
+    conn.commit()
+    return {
+        "series": len(keys),
+        "intermittent": int(fitted["intermittent"].sum()),
+        "horizonDays": horizon_days,
+        "lookbackDays": lookback_days,
+        "loadSeconds": round(loaded - started, 3),
+        "fitSeconds": round(fitted_at - loaded, 3),
+        "storeSeconds": round(time.perf_counter() - fitted_at, 3),
+    }
+
+
+def read_predictions(
+    conn: sqlite3.Connection,
+    days: int,
+    location: Optional[str] = None,
+    drug: Optional[str] = None,
+) -> List[dict]:
+    """Per-drug predictions scaled to ``days`` and summed over locations."""
+    query = """
+        SELECT drug_name, COALESCE(trend, 'stable'),
+               SUM(predicted_demand * 1.0 * ? / horizon_days), SUM(confidence), COUNT(*)
+        FROM demand_predictions
+        WHERE horizon_days > 0
+    """
+    params: list = [days]
+    if location:
+        query += " AND location = ?"
+        params.append(location)
+    if drug:
+        query += " AND drug_name LIKE ?"
+        params.append(f"%{drug}%")
+    query += " GROUP BY drug_name, trend"
+    return summarise_predictions(conn.execute(query, params))
+
+
+def summarise_predictions(rows: Iterable[tuple]) -> List[dict]:
+    """Merge (drug_name, trend, demand, confidence_sum, count) groups per drug."""
+    per_drug = {}
+    for name, trend, demand, confidence_sum, count in rows:
+        entry = per_drug.setdefault(name, {"demand": 0.0, "confidence_sum": 0.0, "count": 0, "trends": {}})
+        entry["demand"] += demand
+        entry["confidence_sum"] += confidence_sum
+        entry["count"] += count
+        entry["trends"][trend] = entry["trends"].get(trend, 0.0) + demand
+
+    predictions = [
+        {
+            "drug": name,
+            "predicted_demand": int(round(entry["demand"])),
+            "confidence": round(entry["confidence_sum"] / entry["count"], 2),
+            # Dominant trend, weighted by each location's predicted volume
+            "trend": max(entry["trends"], key=entry["trends"].get),
+        }
+        for name, entry in per_drug.items()
+    ]
+    predictions.sort(key=lambda p: -p["predicted_demand"])
+    return predictions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--horizon", type=int, default=DEFAULT_HORIZON_DAYS)
+    parser.add_argument("--lookback", type=int, default=DEFAULT_LOOKBACK_DAYS)
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    from database import DatabaseSettings
+
+    load_dotenv()
+    settings = DatabaseSettings.from_url(os.getenv("DATABASE_URL", "sqlite:///./medchain.db"))
+    conn = sqlite3.connect(settings.path)
+    try:
+        print(refit(conn, args.horizon, args.lookback))
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
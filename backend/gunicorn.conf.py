@@ -0,0 +1,29 @@
+"""Gunicorn settings for running the API with several worker processes.
+
+    gunicorn -c gunicorn.conf.py main:app
+
+WEB_CONCURRENCY sets the worker count. One worker per CPU core is a good
+start: reads scale across workers, and writes still go through SQLite's
+single writer. main.py reads the same variable to decide whether caches and
+events must be shared between workers (see coordination.py). Each worker has
+its own connection pool (DB_POOL_SIZE) and thread pool (THREADPOOL_SIZE).
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Each worker imports main.py itself and migrates (under a file lock) in its
+# lifespan hook, so no SQLite connection is opened before the fork.
+preload_app = False
+
+# A worker whose event loop stays blocked this long is restarted
+timeout = int(os.getenv("WORKER_TIMEOUT", 60))
+graceful_timeout = 30
+keepalive = 5
+
+# main.py decides on cross-worker sharing from WEB_CONCURRENCY, so keep it
+# in sync with the worker count when only the default was used
+os.environ["WEB_CONCURRENCY"] = str(workers)
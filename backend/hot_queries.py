@@ -0,0 +1,50 @@
+"""Hot statements checked by ``python migrations.py --check-plans``.
+
+Each entry is built by the same helper its endpoint calls, with
+representative params, so the check EXPLAINs exactly what production runs.
+"""
+import aggregates
+import batches
+import chain
+import chat_context
+import forecasting
+import ledger
+import monitor
+import pagination
+import reorder
+import repository
+
+HOT_QUERIES = {
+    "get_inventory": pagination.page_query(["quantity", "batchId"], 100, location="Central Hospital"),
+    "get_inventory_page": pagination.page_query(
+        ["quantity"], 100, after=("Central Hospital", "Paracetamol 500mg"), location="Central Hospital"
+    ),
+    "get_all_inventory_page": pagination.page_query(
+        ["quantity"], 100, after=("Central Hospital", "Paracetamol 500mg")
+    ),
+    "get_expired_drugs": repository.expiring_query(20000, 30),
+    "get_expired_drugs_window": repository.expiring_query(20000, 30, since_days=0, location="Central Hospital"),
+    "get_low_stock": repository.low_stock_query(50),
+    "get_low_stock_by_location": repository.low_stock_query(50, location="Central Hospital"),
+    "verify_batch_ai": (repository.VERIFY_BATCH_SQLITE, (20000, "PC-2024-001")),
+    "verify_batches_bulk": (
+        batches.VERIFY_SQL,
+        {"today": 20000, "batch_ids": '["PC-2024-001", "ML-2024-045"]'},
+    ),
+    "inventory_summary_expiring": (aggregates.EXPIRING_COUNT_SQL, ("2025-01-01",)),
+    "reorder_plan": reorder.plan_query(50, drug_names=["Aspirin 325mg"]),
+    "reorder_plan_location": reorder.plan_query(50, location="Central Hospital"),
+    "reorder_plan_network": reorder.plan_query(50),
+    "ledger_nearest_snapshot": (ledger.NEAREST_SNAPSHOT_SQL, ("2025-01-01 00:00:00.000",)),
+    "ledger_stock_as_of": ledger.as_of_query(1, 0, "2025-01-01 00:00:00.000", location="Central Hospital"),
+    "forecast_consumption": forecasting.consumption_query(90),
+    "forecast_consumption_location": forecasting.consumption_query(90, location="Central Hospital"),
+    "open_alerts_by_location": monitor.alerts_query(location="Central Hospital", severity="critical"),
+    "chain_verify": (
+        chain.VERIFY_SQL,
+        ("0xd4763ed0b2ac82a5ff322715869743c28a98ab52", chain.batch_hash("PC-2024-001")),
+    ),
+    "chat_low_stock": (chat_context.LOW_STOCK_SQL, (50, 200)),
+    "chat_expiring": (chat_context.EXPIRING_SQL, (20000, 20030, 200)),
+    "chat_pending_reorders": (chat_context.PENDING_REORDERS_SQL, (200,)),
+}
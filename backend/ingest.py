@@ -0,0 +1,258 @@
+import csv
+import json
+from datetime import date, datetime
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Set, Tuple
+
+from pydantic import BaseModel, ValidationError, field_validator
+
+from database import ConnectionPool
+import ledger
+
+SUPPORTED_FORMATS = ("ndjson", "csv")
+
+# Past this many distinct locations an upload invalidates every cached
+# response rather than tracking locations one by one.
+MAX_TRACKED_LOCATIONS = 1000
+
+# A single NDJSON object or CSV record is a few hundred bytes; anything past
+# this is rejected as a row error instead of being buffered.
+MAX_LINE_BYTES = 64 * 1024
+
+# Columns accepted in a bulk upload. CSV headers and NDJSON keys use the same
+# camelCase names as InventoryUpdate.
+BULK_FIELDS = ("location", "drugName", "quantity", "batchId", "expiryDate", "manufacturer")
+
+# Quantities go through the ledger; this only creates rows (at zero stock)
+# and refreshes their batch details.
+UPSERT_INVENTORY_DETAILS = """
+    INSERT INTO inventory (location, drug_name, quantity, batch_id, expiry_date, manufacturer, last_updated)
+    VALUES (?, ?, 0, ?, ?, ?, ?)
+    ON CONFLICT(location, drug_name) DO UPDATE SET
+        batch_id = COALESCE(excluded.batch_id, inventory.batch_id),
+        expiry_date = COALESCE(excluded.expiry_date, inventory.expiry_date),
+        manufacturer = COALESCE(excluded.manufacturer, inventory.manufacturer),
+        last_updated = excluded.last_updated
+"""
+
+
+class BulkInventoryRow(BaseModel):
+    location: str
+    drugName: str
+    quantity: int
+    batchId: Optional[str] = None
+    expiryDate: Optional[date] = None
+    manufacturer: Optional[str] = None
+
+    @field_validator("location", "drugName")
+    @classmethod
+    def not_blank(cls, value: str) -> str:
+        value = value.strip()
+        if not value:
+            raise ValueError("must not be empty")
+        return value
+
+    @field_validator("quantity")
+    @classmethod
+    def not_negative(cls, value: int) -> int:
+        if value < 0:
+            raise ValueError("must not be negative")
+        return value
+
+
+class BulkFormatError(ValueError):
+    pass
+
+
+def detect_format(requested: Optional[str], content_type: Optional[str]) -> str:
+    if requested:
+        if requested not in SUPPORTED_FORMATS:
+            raise BulkFormatError(f"Unsupported format {requested!r}, expected one of {', '.join(SUPPORTED_FORMATS)}")
+        return requested
+    content_type = (content_type or "").lower()
+    if "csv" in content_type:
+        return "csv"
+    if "ndjson" in content_type or "jsonl" in content_type or "json" in content_type:
+        return "ndjson"
+    raise BulkFormatError("Cannot infer upload format; set ?format=ndjson|csv or a matching Content-Type")
+
+
+async def iter_lines(byte_stream: AsyncIterator[bytes],
+                     max_line_bytes: int = MAX_LINE_BYTES) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """Yield (line_number, raw_line) pairs from a chunked byte stream.
+
+    Only the current partial line is buffered, so memory does not grow with
+    the size of the upload. A line longer than max_line_bytes is dropped up to
+    its newline and yielded as None so the caller can report it as a row error.
+    """
+    buffer = b""
+    line_no = 0
+    overlong = False
+    async for chunk in byte_stream:
+        if not chunk:
+            continue
+        lines = (buffer + chunk).split(b"\n")
+        buffer = lines.pop()
+        for raw in lines:
+            line_no += 1
+            if overlong or len(raw) > max_line_bytes:
+                overlong = False
+                yield line_no, None
+            else:
+                yield line_no, raw
+        if len(buffer) > max_line_bytes:
+            buffer = b""
+            overlong = True
+    if buffer or overlong:
+        line_no += 1
+        yield line_no, None if overlong else buffer
+
+
+def _decode(line_no: int, raw: bytes) -> str:
+    try:
+        return raw.decode("utf-8-sig" if line_no == 1 else "utf-8").rstrip("\r")
+    except UnicodeDecodeError as e:
+        raise ValueError(f"invalid UTF-8 at byte {e.start}")
+
+
+def _format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in item['loc']) or 'row'}: {item['msg']}"
+        for item in error.errors()
+    )
+
+
+class BulkIngestReport:
+    def __init__(self, fmt: str, max_errors: int):
+        self.format = fmt
+        self.max_errors = max_errors
+        self.rows_received = 0
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.batches = 0
+        self.errors: List[dict] = []
+
+    def add_error(self, line_no: int, message: str):
+        self.rows_failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line_no, "error": message})
+
+    def to_dict(self) -> dict:
+        return {
+            "success": self.rows_failed == 0,
+            "format": self.format,
+            "rowsReceived": self.rows_received,
+            "rowsWritten": self.rows_written,
+            "rowsFailed": self.rows_failed,
+            "batches": self.batches,
+            "errors": self.errors,
+            "errorsTruncated": self.rows_failed > len(self.errors),
+            "timestamp": datetime.now().isoformat(),
+        }
+
+
+def write_batch(pool: ConnectionPool, rows: List[tuple]):
+    with pool.connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(UPSERT_INVENTORY_DETAILS, (row[:2] + row[3:] for row in rows))
+        ledger.record_levels(conn, (row[:3] for row in rows), reason="bulk_import")
+        conn.commit()
+
+
+class BulkInventoryLoader:
+    """Validate streamed rows and write them in batched transactions."""
+
+    def __init__(self, write: Callable[[List[tuple]], Awaitable[None]], fmt: str, batch_size: int = 5000,
+                 max_errors: int = 1000):
+        # write(rows) stores one batch, e.g. InventoryRepository.write_inventory_batch
+        self.write = write
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.report = BulkIngestReport(fmt, max_errors)
+        self.timestamp = datetime.now()
+        self._pending: List[tuple] = []
+        self._header: Optional[List[str]] = None
+        # Locations written so far, or None once there are too many to track
+        self.touched_locations: Optional[Set[str]] = set()
+
+    def _parse(self, line: str) -> Optional[dict]:
+        if self.fmt == "ndjson":
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"invalid JSON: {e.msg}")
+            if not isinstance(record, dict):
+                raise ValueError("expected a JSON object")
+            return record
+
+        # Records are one per line: a quoted field that runs past the end of
+        # the line (an embedded newline) is reported rather than stitched
+        # together with the following lines.
+        try:
+            values = next(csv.reader([line], strict=True))
+        except csv.Error:
+            raise ValueError("unterminated quoted field; CSV fields must not span lines")
+        if self._header is None:
+            self._header = [name.strip() for name in values]
+            missing = {"location", "drugName", "quantity"} - set(self._header)
+            if missing:
+                raise BulkFormatError(f"CSV header is missing column(s): {', '.join(sorted(missing))}")
+            return None
+        if len(values) != len(self._header):
+            raise ValueError(f"expected {len(self._header)} columns, got {len(values)}")
+        return {name: (value if value != "" else None) for name, value in zip(self._header, values)}
+
+    def _to_params(self, row: BulkInventoryRow) -> tuple:
+        return (
+            row.location,
+            row.drugName,
+            row.quantity,
+            row.batchId,
+            row.expiryDate.isoformat() if row.expiryDate else None,
+            row.manufacturer,
+            self.timestamp,
+        )
+
+    async def _flush(self):
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        await self.write(rows)
+        if self.touched_locations is not None:
+            self.touched_locations.update(row[0] for row in rows)
+            if len(self.touched_locations) > MAX_TRACKED_LOCATIONS:
+                self.touched_locations = None
+        self.report.rows_written += len(rows)
+        self.report.batches += 1
+
+    async def load(self, byte_stream: AsyncIterator[bytes]) -> dict:
+        async for line_no, raw in iter_lines(byte_stream):
+            if raw is not None and not raw.strip():
+                continue
+            try:
+                if raw is None:
+                    raise ValueError(f"line is longer than {MAX_LINE_BYTES} bytes")
+                record = self._parse(_decode(line_no, raw))
+            except BulkFormatError:
+                raise
+            except ValueError as e:
+                self.report.rows_received += 1
+                self.report.add_error(line_no, str(e))
+                continue
+            if record is None:
+                continue
+
+            self.report.rows_received += 1
+            try:
+                row = BulkInventoryRow.model_validate(
+                    {key: record[key] for key in BULK_FIELDS if key in record}
+                )
+            except ValidationError as e:
+                self.report.add_error(line_no, _format_validation_error(e))
+                continue
+
+            self._pending.append(self._to_params(row))
+            if len(self._pending) >= self.batch_size:
+                await self._flush()
+
+        await self._flush()
+        return self.report.to_dict()
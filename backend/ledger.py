@@ -0,0 +1,383 @@
+"""Append-only stock movement ledger with snapshot compaction.
+
+Every quantity change is appended to stock_movements as a signed delta.
+The inventory table is the materialized current state: each appended batch
+is folded into it with one aggregated upsert, so inventory.quantity always
+equals the sum of a pair's movements.
+
+Checkpoints copy inventory quantities into inventory_snapshots, tagged with
+the last movement they include. "Stock as of X" then reads the nearest
+snapshot at or before X and replays only the movements after it.
+Compaction deletes movements older than the retention window that an
+older snapshot already covers.
+
+Timestamps are UTC, formatted 'YYYY-MM-DD HH:MM:SS.SSS'.
+
+    python ledger.py [--checkpoint] [--compact] [--retention-days N] [--check]
+"""
+import argparse
+import os
+import sqlite3
+from datetime import date, datetime, time as dt_time
+from typing import Iterable, List, Optional, Tuple
+
+DEFAULT_RETENTION_DAYS = 730
+CHECKPOINT_MIN_MOVEMENTS = 1000
+
+_NOW_SQL = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+# Fold the movements appended after :after_id into inventory. New pairs
+# start from zero; the WHERE clause keeps the upsert parser unambiguous.
+APPLY_SQL = """
+    INSERT INTO inventory (location, drug_name, quantity, last_updated)
+    SELECT location, drug_name, SUM(delta), :now
+    FROM stock_movements
+    WHERE id > :after_id
+    GROUP BY location, drug_name
+    ON CONFLICT(location, drug_name) DO UPDATE SET
+        quantity = inventory.quantity + excluded.quantity,
+        last_updated = excluded.last_updated
+"""
+
+# Record a movement that brings a pair to an absolute level.
+SET_LEVEL_SQL = """
+    INSERT INTO stock_movements (location, drug_name, delta, reason, reference)
+    SELECT location, drug_name, delta, reason, reference FROM (
+        SELECT
+            :location AS location,
+            :drug_name AS drug_name,
+            :quantity - COALESCE((
+                SELECT quantity FROM inventory WHERE location = :location AND drug_name = :drug_name
+            ), 0) AS delta,
+            :reason AS reason,
+            :reference AS reference
+    )
+    WHERE delta != 0
+"""
+
+
+# Snapshot quantities plus the movements recorded after it, up to :at
+AS_OF_SQL = """
+    SELECT location, drug_name, SUM(quantity), SUM(movements)
+    FROM (
+        SELECT location, drug_name, quantity, 0 AS movements
+        FROM inventory_snapshot_items
+        WHERE snapshot_id = :snapshot_id{filters}
+        UNION ALL
+        SELECT location, drug_name, SUM(delta), COUNT(*)
+        FROM stock_movements
+        WHERE id > :after_id AND recorded_at <= :at{filters}
+        GROUP BY location, drug_name
+    )
+    GROUP BY location, drug_name
+    ORDER BY location, drug_name
+"""
+
+
+NEAREST_SNAPSHOT_SQL = """
+    SELECT id, taken_at, last_movement_id FROM inventory_snapshots
+    WHERE taken_at <= ? ORDER BY taken_at DESC LIMIT 1
+"""
+
+
+def as_of_query(
+    snapshot_id: Optional[int],
+    after_id: int,
+    at: str,
+    location: Optional[str] = None,
+    drug_name: Optional[str] = None,
+) -> Tuple[str, dict]:
+    filters, params = "", {"snapshot_id": snapshot_id, "after_id": after_id, "at": at}
+    if location:
+        filters += " AND location = :location"
+        params["location"] = location
+    if drug_name:
+        filters += " AND drug_name = :drug_name"
+        params["drug_name"] = drug_name
+    return AS_OF_SQL.format(filters=filters), params
+
+
+class LedgerError(ValueError):
+    pass
+
+
+def _last_movement_id(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT COALESCE(MAX(id), 0) FROM stock_movements").fetchone()[0]
+
+
+def _apply(conn: sqlite3.Connection, after_id: int):
+    conn.execute(APPLY_SQL, {"after_id": after_id, "now": datetime.now()})
+
+
+def append_movements(
+    conn: sqlite3.Connection,
+    movements: Iterable[Tuple[str, str, int, str, Optional[str]]],
+) -> int:
+    """Append (location, drug_name, delta, reason, reference) rows and apply them.
+
+    Raises LedgerError, leaving the transaction for the caller to roll back,
+    if the batch would take any pair below zero. The caller commits.
+    """
+    # Watermark for folding the batch into inventory. Compaction may have
+    # deleted the newest ids, so it does not count the batch.
+    after_id = _last_movement_id(conn)
+    appended = conn.executemany(
+        "INSERT INTO stock_movements (location, drug_name, delta, reason, reference) VALUES (?, ?, ?, ?, ?)",
+        movements,
+    ).rowcount
+    if not appended:
+        return 0
+    _apply(conn, after_id)
+    negative = conn.execute(
+        """
+        SELECT i.location, i.drug_name, i.quantity
+        FROM (SELECT DISTINCT location, drug_name FROM stock_movements WHERE id > ?) m
+        JOIN inventory i ON i.location = m.location AND i.drug_name = m.drug_name
+        WHERE i.quantity < 0
+        LIMIT 5
+        """,
+        (after_id,),
+    ).fetchall()
+    if negative:
+        detail = ", ".join(f"{row[1]} at {row[0]} ({row[2]})" for row in negative)
+        raise LedgerError(f"Movements would take stock below zero: {detail}")
+    return appended
+
+
+def record_levels(
+    conn: sqlite3.Connection,
+    levels: Iterable[Tuple[str, str, int]],
+    reason: str = "adjustment",
+    reference: Optional[str] = None,
+) -> int:
+    """Record absolute (location, drug_name, quantity) levels as movements.
+
+    Each level becomes the delta from the current quantity; unchanged pairs
+    append nothing. For repeated pairs the last level wins. The caller commits.
+    """
+    latest = {}
+    for location, drug_name, quantity in levels:
+        latest[(location, drug_name)] = quantity
+    after_id = _last_movement_id(conn)
+    appended = conn.executemany(
+        SET_LEVEL_SQL,
+        (
+            {
+                "location": location,
+                "drug_name": drug_name,
+                "quantity": quantity,
+                "reason": reason,
+                "reference": reference,
+            }
+            for (location, drug_name), quantity in latest.items()
+        ),
+    ).rowcount
+    if appended:
+        _apply(conn, after_id)
+    return appended
+
+
+def checkpoint(conn: sqlite3.Connection) -> Optional[int]:
+    """Snapshot current inventory quantities; returns the new snapshot id.
+
+    Returns None when nothing has moved since the latest snapshot. Must run
+    in a write transaction so no movement lands between the two statements.
+    """
+    last_id = _last_movement_id(conn)
+    latest = conn.execute(
+        "SELECT last_movement_id FROM inventory_snapshots ORDER BY id DESC LIMIT 1"
+    ).fetchone()
+    if latest and latest[0] == last_id:
+        return None
+    snapshot_id = conn.execute(
+        f"INSERT INTO inventory_snapshots (taken_at, last_movement_id) VALUES ({_NOW_SQL}, ?)",
+        (last_id,),
+    ).lastrowid
+    conn.execute(
+        """
+        INSERT INTO inventory_snapshot_items (snapshot_id, location, drug_name, quantity)
+        SELECT ?, location, drug_name, quantity FROM inventory
+        """,
+        (snapshot_id,),
+    )
+    return snapshot_id
+
+
+def compact(conn: sqlite3.Connection, retention_days: int = DEFAULT_RETENTION_DAYS) -> dict:
+    """Drop movements and snapshots older than the retention window.
+
+    The newest snapshot taken before the cutoff is kept as the base for
+    as-of queries, and only movements it already covers are deleted.
+    """
+    base = conn.execute(
+        """
+        SELECT id, last_movement_id FROM inventory_snapshots
+        WHERE taken_at <= strftime('%Y-%m-%d %H:%M:%f', 'now', ?)
+        ORDER BY taken_at DESC LIMIT 1
+        """,
+        (f"-{retention_days} days",),
+    ).fetchone()
+    if base is None:
+        return {"movementsDeleted": 0, "snapshotsDeleted": 0}
+    base_id, through_id = base
+    movements = conn.execute("DELETE FROM stock_movements WHERE id <= ?", (through_id,)).rowcount
+    conn.execute(
+        "DELETE FROM inventory_snapshot_items WHERE snapshot_id IN "
+        "(SELECT id FROM inventory_snapshots WHERE id < ?)",
+        (base_id,),
+    )
+    snapshots = conn.execute("DELETE FROM inventory_snapshots WHERE id < ?", (base_id,)).rowcount
+    if movements:
+        conn.execute(
+            f"""
+            INSERT INTO ledger_compactions
+                (compacted_at, through_movement_id, base_snapshot_id, movements_deleted)
+            VALUES ({_NOW_SQL}, ?, ?, ?)
+            """,
+            (through_id, base_id, movements),
+        )
+    return {"movementsDeleted": movements, "snapshotsDeleted": snapshots}
+
+
+def maintain(
+    conn: sqlite3.Connection,
+    min_movements: int = CHECKPOINT_MIN_MOVEMENTS,
+    retention_days: int = DEFAULT_RETENTION_DAYS,
+) -> dict:
+    """Checkpoint if enough has moved since the last snapshot, then compact."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        since = conn.execute(
+            """
+            SELECT COUNT(*) FROM stock_movements
+            WHERE id > COALESCE((SELECT MAX(last_movement_id) FROM inventory_snapshots), 0)
+            """
+        ).fetchone()[0]
+        snapshot_id = checkpoint(conn) if since >= min_movements else None
+        result = {"snapshotId": snapshot_id, "movementsSinceSnapshot": since, **compact(conn, retention_days)}
+        conn.commit()
+        return result
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def parse_as_of(value: str) -> str:
+    """Normalise an ISO date or datetime (UTC) to the ledger timestamp format.
+
+    A bare date means the end of that day.
+    """
+    try:
+        if len(value) == 10:
+            moment = datetime.combine(date.fromisoformat(value), dt_time(23, 59, 59, 999000))
+        else:
+            moment = datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+    except ValueError:
+        raise LedgerError(f"Invalid date/time: {value!r}; expected ISO 8601")
+    return moment.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+
+def stock_as_of(
+    conn: sqlite3.Connection,
+    at: str,
+    location: Optional[str] = None,
+    drug_name: Optional[str] = None,
+) -> dict:
+    """Quantities per pair as of ``at`` (ledger format, see parse_as_of)."""
+    snapshot = conn.execute(NEAREST_SNAPSHOT_SQL, (at,)).fetchone()
+    if snapshot is None:
+        compacted = conn.execute(
+            """
+            SELECT s.taken_at FROM ledger_compactions c
+            JOIN inventory_snapshots s ON s.id = c.base_snapshot_id
+            ORDER BY c.id DESC LIMIT 1
+            """
+        ).fetchone()
+        if compacted:
+            raise LedgerError(f"History before {compacted[0]} has been compacted")
+        snapshot = (None, None, 0)
+    snapshot_id, taken_at, after_id = snapshot
+
+    rows = conn.execute(*as_of_query(snapshot_id, after_id, at, location, drug_name)).fetchall()
+    return {
+        "asOf": at,
+        "snapshotId": snapshot_id,
+        "snapshotTakenAt": taken_at,
+        "replayedMovements": sum(row[3] for row in rows),
+        "items": [
+            {"location": row[0], "name": row[1], "quantity": row[2]}
+            for row in rows
+        ],
+        "count": len(rows),
+    }
+
+
+def check_consistency(conn: sqlite3.Connection) -> List[dict]:
+    """Pairs whose inventory quantity differs from their ledger balance.
+
+    After compaction the balance starts from the base snapshot.
+    """
+    rows = conn.execute(
+        """
+        WITH base AS (
+            SELECT c.base_snapshot_id, s.last_movement_id FROM ledger_compactions c
+            JOIN inventory_snapshots s ON s.id = c.base_snapshot_id
+            ORDER BY c.id DESC LIMIT 1
+        ),
+        balance AS (
+            SELECT location, drug_name, SUM(quantity) AS quantity FROM (
+                SELECT location, drug_name, quantity FROM inventory_snapshot_items
+                WHERE snapshot_id = (SELECT base_snapshot_id FROM base)
+                UNION ALL
+                SELECT location, drug_name, delta FROM stock_movements
+                WHERE id > COALESCE((SELECT last_movement_id FROM base), 0)
+            )
+            GROUP BY location, drug_name
+        )
+        SELECT i.location, i.drug_name, i.quantity, COALESCE(b.quantity, 0)
+        FROM inventory i
+        LEFT JOIN balance b ON b.location = i.location AND b.drug_name = i.drug_name
+        WHERE i.quantity != COALESCE(b.quantity, 0)
+        """
+    ).fetchall()
+    return [
+        {"location": row[0], "drugName": row[1], "inventory": row[2], "ledger": row[3]}
+        for row in rows
+    ]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checkpoint", action="store_true", help="snapshot inventory now")
+    parser.add_argument("--compact", action="store_true", help="drop history outside the retention window")
+    parser.add_argument("--retention-days", type=int, default=DEFAULT_RETENTION_DAYS)
+    parser.add_argument("--check", action="store_true", help="compare inventory with ledger balances")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    from database import DatabaseSettings
+
+    load_dotenv()
+    settings = DatabaseSettings.from_url(os.getenv("DATABASE_URL", "sqlite:///./medchain.db"))
+    conn = sqlite3.connect(settings.path, isolation_level=None)
+    try:
+        if args.checkpoint or args.compact:
+            conn.execute("BEGIN IMMEDIATE")
+            snapshot_id = checkpoint(conn) if args.checkpoint else None
+            result = compact(conn, args.retention_days) if args.compact else {}
+            conn.execute("COMMIT")
+            print({"snapshotId": snapshot_id, **result})
+        if args.check:
+            mismatches = check_consistency(conn)
+            for mismatch in mismatches:
+                print(f"MISMATCH {mismatch}")
+            if mismatches:
+                return 1
+            print("OK   inventory matches the ledger")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,19 +1,211 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Depends, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from typing import List, Optional
+from contextlib import asynccontextmanager
 import sqlite3
 import json
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import os
 from dotenv import load_dotenv
-import google.generativeai as genai
 import re
+import time
+import hashlib
+import tempfile
+import anyio
+import asyncio
+
+from ai import AIClient, AITimeout, GeminiModel, PromptCache
+import aggregates
+from batches import MAX_BULK_BATCH_IDS, BatchIndex
+from chain import ChainMirror, JsonRpcSource
+from chat_context import ChatContextBuilder
+from coordination import LeaderLock, SharedCounters, file_lock
+import ledger
+from monitor import InventoryMonitor, read_alerts
+import forecasting
+from cache import ResponseCache, cached_json_response, cached_json_response_async
+from events import EventBroker, EventRelay
+from ingest import BulkFormatError, BulkInventoryLoader, detect_format
+from metrics import Metrics, MetricsMiddleware, SqlProfiler
+from migrations import LATEST_VERSION, current_version, migrate
+from pagination import (
+    InvalidPageRequest,
+    columnar_page,
+    decode_cursor,
+    parse_fields,
+    shape_row,
+    stream_all_inventory,
+    stream_location_inventory,
+)
+from profiling import ProfilingMiddleware, SamplingProfiler, folded
+from repository import SqliteRepository, create_repository, seed_missing
+from reorder import DEFAULT_LEAD_TIME_DAYS, AmbiguousDrugNames, UnknownDrugNames, resolve_drug_names
+import rebalance
+import serialization
+from serialization import FORMAT_PATTERN
 
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="MedChain Backend API", version="1.0.0")
+# Database setup: the inventory endpoints go through a repository (SQLite or
+# PostgreSQL, see repository.py); everything else uses the SQLite pool,
+# which is None on PostgreSQL.
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./medchain.db")
+repository = create_repository(DATABASE_URL)
+db_pool = repository.pool if isinstance(repository, SqliteRepository) else None
+
+# Request timing, SQLite statement profiling and the opt-in request profiler
+# (see metrics.py and profiling.py). The pool must get its profiler before
+# its first connection opens.
+sql_profiler = SqlProfiler(slow_query_ms=float(os.getenv("SLOW_QUERY_MS", 100))) \
+    if os.getenv("SQL_PROFILING", "1") == "1" else None
+if db_pool is not None:
+    db_pool.profiler = sql_profiler
+metrics = Metrics(sql_profiler)
+request_profiler = SamplingProfiler(interval=float(os.getenv("PROFILE_INTERVAL_MS", 1)) / 1000) \
+    if os.getenv("PROFILING_ENABLED", "0") == "1" else None
+
+# Worker processes (see coordination.py). WEB_CONCURRENCY is the worker count
+# gunicorn and the __main__ block start with; caches and events are only
+# shared between processes when it is above one. The lock and epoch files
+# live next to the SQLite database, or in the temp directory for PostgreSQL.
+WORKERS = int(os.getenv("WEB_CONCURRENCY", 1))
+if db_pool is not None:
+    COORDINATION_PREFIX = os.path.abspath(db_pool.settings.path)
+else:
+    COORDINATION_PREFIX = os.path.join(
+        tempfile.gettempdir(), "medchain-" + hashlib.sha1(DATABASE_URL.encode()).hexdigest()[:12]
+    )
+shared_counters = SharedCounters(COORDINATION_PREFIX + ".epochs") if WORKERS > 1 else None
+leader_lock = LeaderLock(COORDINATION_PREFIX + ".leader.lock")
+LEADER_RETRY_INTERVAL = float(os.getenv("LEADER_RETRY_INTERVAL", 5))
+
+# Routes that touch SQLite are plain `def` handlers, which FastAPI runs in
+# anyio's worker thread pool. Cap that pool so a burst of requests queues
+# instead of spawning more threads than the connection pool can serve.
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", 40))
+
+# Read endpoints are cached in-process and invalidated per location by the
+# write paths (see cache.py).
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", 1024)),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", 30)),
+    shared=shared_counters,
+)
+
+# Server-Sent Events feed for dashboards (see events.py)
+event_broker = EventBroker(
+    coalesce_window=float(os.getenv("EVENTS_COALESCE_MS", 250)) / 1000,
+    heartbeat=float(os.getenv("EVENTS_HEARTBEAT", 15)),
+    max_subscribers=int(os.getenv("EVENTS_MAX_SUBSCRIBERS", 10000)),
+    relay=EventRelay(COORDINATION_PREFIX + ".events") if WORKERS > 1 else None,
+)
+
+def notify_change(event_type: str, locations, **data):
+    """Invalidate cached reads for ``locations`` (None = all) and push an event."""
+    response_cache.invalidate(locations)
+    event_broker.publish(event_type, locations, **data)
+
+# Known batch IDs for /batch-verify/bulk; reloaded after writes that can add batches
+batch_index = BatchIndex(shared_counters)
+
+# Periodic ledger checkpoint + compaction (see ledger.py)
+LEDGER_MAINTENANCE_INTERVAL = float(os.getenv("LEDGER_MAINTENANCE_INTERVAL", 3600))
+LEDGER_RETENTION_DAYS = int(os.getenv("LEDGER_RETENTION_DAYS", ledger.DEFAULT_RETENTION_DAYS))
+
+async def maintain_ledger():
+    while True:
+        await asyncio.sleep(LEDGER_MAINTENANCE_INTERVAL)
+        try:
+            await anyio.to_thread.run_sync(
+                with_connection, ledger.maintain, ledger.CHECKPOINT_MIN_MOVEMENTS, LEDGER_RETENTION_DAYS
+            )
+        except Exception as e:
+            print(f"Ledger maintenance error: {e}")
+
+# Inventory figures quoted to the AI chat, refreshed in the background
+chat_context = ChatContextBuilder(
+    refresh_interval=float(os.getenv("CHAT_CONTEXT_REFRESH", 60)),
+    token_budget=int(os.getenv("CHAT_CONTEXT_TOKENS", 600)),
+)
+
+async def refresh_chat_context():
+    while True:
+        try:
+            await anyio.to_thread.run_sync(with_connection, chat_context.refresh)
+        except Exception as e:
+            print(f"Chat context refresh error: {e}")
+        await asyncio.sleep(chat_context.refresh_interval)
+
+# Expiry / low-stock alert generation (see monitor.py)
+inventory_monitor = InventoryMonitor(interval=float(os.getenv("MONITOR_INTERVAL", 300)))
+
+def run_inventory_monitor() -> dict:
+    result = with_connection(inventory_monitor.run)
+    if result["locations"]:
+        notify_change("alerts", result["locations"], opened=result["opened"], resolved=result["resolved"])
+    return result
+
+async def monitor_inventory():
+    while True:
+        try:
+            await anyio.to_thread.run_sync(run_inventory_monitor)
+        except Exception as e:
+            print(f"Inventory monitor error: {e}")
+        await asyncio.sleep(inventory_monitor.interval)
+
+# Mirror of DrugRegister events (see chain.py); synced only when a node is configured
+CHAIN_RPC_URL = os.getenv("CHAIN_RPC_URL")
+chain_mirror = ChainMirror(
+    JsonRpcSource(CHAIN_RPC_URL) if CHAIN_RPC_URL else None,
+    os.getenv("CONTRACT_ADDRESS", "0xD4763eD0b2AC82A5fF322715869743C28a98aB52"),
+    confirmations=int(os.getenv("CHAIN_CONFIRMATIONS", 6)),
+    start_block=int(os.getenv("CHAIN_START_BLOCK", 0)),
+    interval=float(os.getenv("CHAIN_SYNC_INTERVAL", 30)),
+)
+
+async def sync_chain_mirror():
+    while True:
+        try:
+            await anyio.to_thread.run_sync(with_connection, chain_mirror.sync)
+        except Exception as e:
+            print(f"Chain mirror sync error: {e}")
+        await asyncio.sleep(chain_mirror.interval)
+
+async def run_singleton_jobs():
+    """Run the database-wide loops in whichever worker holds the leader lock."""
+    while not leader_lock.try_acquire():
+        await asyncio.sleep(LEADER_RETRY_INTERVAL)
+    jobs = [maintain_ledger(), monitor_inventory()]
+    if chain_mirror.source is not None:
+        jobs.append(sync_chain_mirror())
+    await asyncio.gather(*jobs)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    await repository.open()
+    event_broker.start()
+    background = []
+    if db_pool is not None:
+        await anyio.to_thread.run_sync(init_db)
+        background += [
+            asyncio.create_task(refresh_chat_context()),
+            asyncio.create_task(run_singleton_jobs()),
+        ]
+    elif SEED_SAMPLE_DATA:
+        await repository.seed(SAMPLE_INVENTORY)
+    yield
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    leader_lock.release()
+    event_broker.stop()
+    await repository.close()
+
+app = FastAPI(title="MedChain Backend API", version="1.0.0", lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -22,88 +214,81 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Profile-Id"],
 )
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+if request_profiler is not None:
+    app.add_middleware(ProfilingMiddleware, profiler=request_profiler)
 
 # Configure Gemini AI
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-    model = genai.GenerativeModel('gemini-pro')
+    # The SDK is imported on the first prompt (see ai.GeminiModel)
+    model = GeminiModel(GEMINI_API_KEY, os.getenv("GEMINI_MODEL", "gemini-pro"))
 else:
     model = None
     print("Warning: GEMINI_API_KEY not found. AI features will use mock responses.")
 
-# Database setup
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./medchain.db")
+ai_client = AIClient(
+    model,
+    timeout=float(os.getenv("GEMINI_TIMEOUT", 20)),
+    max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", 8)),
+    cache=PromptCache(
+        max_entries=int(os.getenv("GEMINI_CACHE_SIZE", 256)),
+        ttl=float(os.getenv("GEMINI_CACHE_TTL", 300)),
+        stale_ttl=float(os.getenv("GEMINI_CACHE_STALE_TTL", 3600)),
+    ),
+    observer=metrics.observe_ai,
+)
+
+def require_sqlite():
+    if db_pool is None:
+        raise HTTPException(status_code=501, detail="Not available with the PostgreSQL backend")
+
+def get_db():
+    require_sqlite()
+    with db_pool.connection() as conn:
+        yield conn
+
+def with_connection(fn, *args):
+    require_sqlite()
+    with db_pool.connection() as conn:
+        return fn(conn, *args)
+
+SAMPLE_INVENTORY = [
+    ("Central Hospital", "Paracetamol 500mg", 1250, "PC-2024-001", "2025-12-31", "PharmaCorp Ltd"),
+    ("Central Hospital", "Amoxicillin 250mg", 800, "ML-2024-045", "2025-08-15", "MediLab Inc"),
+    ("Rural Clinic A", "Paracetamol 500mg", 480, "PC-2024-002", "2025-11-20", "PharmaCorp Ltd"),
+    ("Rural Clinic A", "Aspirin 325mg", 25, "GP-2024-089", "2024-12-31", "Global Pharma"),
+    ("Rural Clinic A", "Ciprofloxacin 500mg", 15, "AB-2024-067", "2024-12-25", "AntiBio Labs"),
+    ("Regional Hospital", "Metformin 500mg", 890, "DC-2024-156", "2025-11-28", "DiabetesCare Ltd"),
+    ("City Pharmacy", "Ibuprofen 400mg", 75, "HT-2024-128", "2024-12-20", "HealthTech Solutions"),
+    ("City Pharmacy", "Aspirin 325mg", 8, "GP-2024-090", "2024-12-31", "Global Pharma"),
+    ("Medical Warehouse", "Paracetamol 500mg", 2100, "PC-2023-123", "2025-06-15", "PharmaCorp Ltd"),
+]
+
+# The sample rows above are only written when asked for (demo and dev setups)
+SEED_SAMPLE_DATA = os.getenv("SEED_SAMPLE_DATA", "0") == "1"
 
 def init_db():
-    conn = sqlite3.connect("medchain.db")
-    cursor = conn.cursor()
-    
-    # Create inventory table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS inventory (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            location TEXT NOT NULL,
-            drug_name TEXT NOT NULL,
-            quantity INTEGER NOT NULL,
-            batch_id TEXT,
-            expiry_date DATE,
-            manufacturer TEXT,
-            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(location, drug_name)
-        )
-    """)
-    
-    # Create reorders table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS reorders (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            drug_name TEXT NOT NULL,
-            quantity INTEGER NOT NULL,
-            location TEXT NOT NULL,
-            status TEXT DEFAULT 'pending',
-            order_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            expected_delivery DATE,
-            supplier TEXT
-        )
-    """)
-    
-    # Create demand_predictions table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS demand_predictions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            location TEXT NOT NULL,
-            drug_name TEXT NOT NULL,
-            predicted_demand INTEGER NOT NULL,
-            confidence REAL NOT NULL,
-            prediction_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # Insert sample data
-    sample_data = [
-        ("Central Hospital", "Paracetamol 500mg", 1250, "PC-2024-001", "2025-12-31", "PharmaCorp Ltd"),
-        ("Central Hospital", "Amoxicillin 250mg", 800, "ML-2024-045", "2025-08-15", "MediLab Inc"),
-        ("Rural Clinic A", "Paracetamol 500mg", 480, "PC-2024-002", "2025-11-20", "PharmaCorp Ltd"),
-        ("Rural Clinic A", "Aspirin 325mg", 25, "GP-2024-089", "2024-12-31", "Global Pharma"),
-        ("Rural Clinic A", "Ciprofloxacin 500mg", 15, "AB-2024-067", "2024-12-25", "AntiBio Labs"),
-        ("Regional Hospital", "Metformin 500mg", 890, "DC-2024-156", "2025-11-28", "DiabetesCare Ltd"),
-        ("City Pharmacy", "Ibuprofen 400mg", 75, "HT-2024-128", "2024-12-20", "HealthTech Solutions"),
-        ("City Pharmacy", "Aspirin 325mg", 8, "GP-2024-090", "2024-12-31", "Global Pharma"),
-        ("Medical Warehouse", "Paracetamol 500mg", 2100, "PC-2023-123", "2025-06-15", "PharmaCorp Ltd"),
-    ]
-    
-    cursor.executemany("""
-        INSERT OR IGNORE INTO inventory (location, drug_name, quantity, batch_id, expiry_date, manufacturer)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, sample_data)
-    
-    conn.commit()
-    conn.close()
+    """Bring the SQLite schema up to date and seed the sample rows if enabled.
 
-# Initialize database on startup
-init_db()
+    Runs from the lifespan hook. The PostgreSQL schema is created when the
+    repository opens instead.
+    """
+    if db_pool is None:
+        return
+    with db_pool.connection() as conn:
+        if current_version(conn) >= LATEST_VERSION and not SEED_SAMPLE_DATA:
+            return
+    # Workers starting together take turns; only the first one finds
+    # migrations to apply or sample rows missing.
+    with file_lock(COORDINATION_PREFIX + ".init.lock"):
+        with db_pool.connection() as conn:
+            migrate(conn)
+            if SEED_SAMPLE_DATA:
+                # Only pairs that don't exist yet; their stock enters through the ledger
+                seed_missing(conn, SAMPLE_INVENTORY)
 
 # Pydantic models
 class InventoryUpdate(BaseModel):
@@ -112,10 +297,32 @@ class InventoryUpdate(BaseModel):
     quantity: int
     timestamp: Optional[str] = None
 
-class ReorderRequest(BaseModel):
+class StockMovement(BaseModel):
+    location: str
     drugName: str
+    delta: int
+    reason: str = "adjustment"
+    reference: Optional[str] = None
+
+class MovementBatch(BaseModel):
+    movements: List[StockMovement] = Field(..., min_length=1, max_length=50000)
+
+class ReorderRequest(BaseModel):
+    drugName: Optional[str] = None
+    drugNames: Optional[List[str]] = None
     threshold: int
     location: Optional[str] = None
+    dryRun: bool = False
+    leadTimeDays: int = Field(DEFAULT_LEAD_TIME_DAYS, ge=0)
+
+class RebalanceRequest(BaseModel):
+    drugName: Optional[str] = None
+    drugNames: Optional[List[str]] = None
+    threshold: int = 50
+    location: Optional[str] = None
+    dryRun: bool = False
+    minTransfer: int = Field(rebalance.MIN_TRANSFER_QUANTITY, ge=1)
+    minShelfDays: int = Field(rebalance.DEFAULT_MIN_SHELF_DAYS, ge=0)
 
 class ExpiryQuery(BaseModel):
     days: Optional[int] = 0
@@ -124,6 +331,9 @@ class ExpiryQuery(BaseModel):
 class BatchVerification(BaseModel):
     batchId: str
 
+class BulkBatchVerification(BaseModel):
+    batchIds: List[str] = Field(..., min_length=1, max_length=MAX_BULK_BATCH_IDS)
+
 class ChatMessage(BaseModel):
     message: str
     language: Optional[str] = "en"
@@ -151,21 +361,109 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    return {
+        "status": "healthy",
+        "worker": os.getpid(),
+        "leader": leader_lock.held,
+        "timestamp": datetime.now().isoformat()
+    }
+
+def collect_gauges():
+    cache = response_cache.stats()
+    gauges = [
+        ("medchain_response_cache_hits_total", "counter", "Response cache hits", cache["hits"]),
+        ("medchain_response_cache_misses_total", "counter", "Response cache misses", cache["misses"]),
+        ("medchain_response_cache_entries", "gauge", "Cached responses", cache["entries"]),
+        ("medchain_sse_subscribers", "gauge", "Open event streams", event_broker.stats()["subscribers"]),
+        ("medchain_ai_cache_hits_total", "counter", "Gemini prompt cache hits", ai_client.cache_hits),
+    ]
+    if db_pool is not None:
+        pool = db_pool.stats()
+        gauges += [
+            ("medchain_db_pool_open_connections", "gauge", "Open pooled connections", pool["open"]),
+            ("medchain_db_pool_idle_connections", "gauge", "Idle pooled connections", pool["idle"]),
+        ]
+    return gauges
+
+metrics.add_collector(collect_gauges)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/sql")
+async def sql_statement_stats(limit: int = Query(20, ge=1, le=500)):
+    if sql_profiler is None:
+        raise HTTPException(status_code=404, detail="SQL profiling is disabled (SQL_PROFILING=0)")
+    return {
+        "slowQueryMs": sql_profiler.slow_query_ms,
+        "statements": sql_profiler.top(limit),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/metrics/slow-queries")
+async def slow_queries():
+    if sql_profiler is None:
+        raise HTTPException(status_code=404, detail="SQL profiling is disabled (SQL_PROFILING=0)")
+    return {
+        "slowQueryMs": sql_profiler.slow_query_ms,
+        "queries": list(reversed(sql_profiler.slow_queries)),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/debug/profiles")
+async def list_profiles():
+    if request_profiler is None:
+        raise HTTPException(status_code=404, detail="Request profiling is disabled (PROFILING_ENABLED=0)")
+    return {"profiles": request_profiler.list(), "timestamp": datetime.now().isoformat()}
+
+@app.get("/debug/profiles/{profile_id}")
+async def get_profile(profile_id: str, format: str = Query("json", pattern="^(json|folded)$")):
+    profile = request_profiler.get(profile_id) if request_profiler is not None else None
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "folded":
+        return PlainTextResponse(folded(profile))
+    return profile
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {**response_cache.stats(), "timestamp": datetime.now().isoformat()}
+
+@app.get("/events")
+async def stream_events(locations: Optional[str] = None):
+    # SSE feed of change notifications; `locations` is a comma-separated
+    # filter (network-wide events are always delivered).
+    wanted = {name.strip() for name in locations.split(",") if name.strip()} if locations else None
+    try:
+        subscriber = event_broker.subscribe(wanted or None)
+    except OverflowError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return StreamingResponse(
+        event_broker.stream(subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/events/stats")
+async def event_stats():
+    return {**event_broker.stats(), "timestamp": datetime.now().isoformat()}
+
+@app.get("/ai/stats")
+async def ai_stats():
+    return {
+        **ai_client.stats(),
+        "chatContext": chat_context.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
 
 @app.post("/inventory/update")
 async def update_inventory(inventory: InventoryUpdate):
     try:
-        conn = sqlite3.connect("medchain.db")
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT OR REPLACE INTO inventory (location, drug_name, quantity, last_updated)
-            VALUES (?, ?, ?, ?)
-        """, (inventory.location, inventory.drugName, inventory.quantity, datetime.now()))
-        
-        conn.commit()
-        conn.close()
+        # The new level is recorded as a stock movement delta, which also
+        # updates the inventory row.
+        await repository.set_levels([(inventory.location, inventory.drugName, inventory.quantity)])
+        notify_change("inventory", [inventory.location], reason="update")
         
         return {
             "success": True,
@@ -175,302 +473,488 @@ async def update_inventory(inventory: InventoryUpdate):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/inventory/{location}")
-async def get_inventory(location: str):
+@app.post("/inventory/movements")
+def append_movements(batch: MovementBatch, conn: sqlite3.Connection = Depends(get_db)):
     try:
-        conn = sqlite3.connect("medchain.db")
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT drug_name, quantity, batch_id, expiry_date, manufacturer, last_updated
-            FROM inventory
-            WHERE location = ?
-        """, (location,))
-        
-        rows = cursor.fetchall()
-        conn.close()
-        
-        drugs = [
-            {
-                "name": row[0],
-                "quantity": row[1],
-                "batchId": row[2] or "N/A",
-                "expiryDate": row[3] or "N/A",
-                "manufacturer": row[4] or "N/A",
-                "lastUpdated": row[5]
-            }
-            for row in rows
-        ]
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            appended = ledger.append_movements(conn, [
+                (m.location, m.drugName, m.delta, m.reason, m.reference) for m in batch.movements
+            ])
+        except ledger.LedgerError as e:
+            conn.rollback()
+            raise HTTPException(status_code=400, detail=str(e))
+        conn.commit()
+        notify_change("inventory", {m.location for m in batch.movements}, reason="movements")
         
         return {
-            "location": location,
-            "drugs": drugs,
-            "totalItems": len(drugs),
-            "lastSync": datetime.now().isoformat()
+            "success": True,
+            "appended": appended,
+            "timestamp": datetime.now().isoformat()
         }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/inventory/bulk")
+async def bulk_update_inventory(
+    request: Request,
+    format: Optional[str] = None,
+    batch_size: int = Query(5000, ge=1, le=50000),
+    max_errors: int = Query(1000, ge=0, le=100000),
+):
+    # Body is a streamed NDJSON or CSV upload; rows are validated and written
+    # batch_size at a time so memory stays flat regardless of upload size.
+    try:
+        fmt = detect_format(format, request.headers.get("content-type"))
+        loader = BulkInventoryLoader(repository.write_inventory_batch, fmt, batch_size=batch_size, max_errors=max_errors)
+        try:
+            return await loader.load(request.stream())
+        finally:
+            batch_index.invalidate()
+            notify_change("inventory", loader.touched_locations, reason="bulk")
+    except BulkFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/inventory/all")
-async def get_all_inventory():
+async def get_all_inventory(
+    fields: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=10000),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    format: str = Query("rows", pattern=FORMAT_PATTERN),
+):
+    # limit/cursor page through inventory by (location, drug_name); stream=true
+    # returns the full dump in constant memory. Without either, the whole
+    # inventory is returned in one document as before.
     try:
-        conn = sqlite3.connect("medchain.db")
-        cursor = conn.cursor()
+        selected = parse_fields(fields)
+        columnar = format == "columnar"
+        if stream and columnar:
+            raise InvalidPageRequest("format=columnar cannot be combined with stream=true")
+        # Streaming is SQLite-only; PostgreSQL returns the same document in one piece
+        if stream and db_pool is not None:
+            return StreamingResponse(stream_all_inventory(db_pool, selected), media_type="application/json")
         
-        cursor.execute("""
-            SELECT location, drug_name, quantity, batch_id, expiry_date, manufacturer, last_updated
-            FROM inventory
-            ORDER BY location, drug_name
-        """)
-        
-        rows = cursor.fetchall()
-        conn.close()
-        
-        # Group by location
-        locations = {}
-        for row in rows:
-            location = row[0]
-            if location not in locations:
-                locations[location] = []
-            
-            locations[location].append({
-                "name": row[1],
-                "quantity": row[2],
-                "batchId": row[3] or "N/A",
-                "expiryDate": row[4] or "N/A", 
-                "manufacturer": row[5] or "N/A",
-                "lastUpdated": row[6]
-            })
+        rows, next_cursor = await repository.inventory_page(selected, limit, decode_cursor(cursor))
         
-        return {
-            "locations": locations,
-            "totalLocations": len(locations),
-            "lastSync": datetime.now().isoformat()
-        }
+        if columnar:
+            inventory = columnar_page(selected, rows)
+            response = {
+                "inventory": inventory,
+                "totalLocations": len(set(inventory["data"][0])),
+                "lastSync": datetime.now().isoformat()
+            }
+        else:
+            # Group by location
+            locations = {}
+            for row in rows:
+                locations.setdefault(row[0], []).append(shape_row(selected, row[2:]))
+            response = {
+                "locations": locations,
+                "totalLocations": len(locations),
+                "lastSync": datetime.now().isoformat()
+            }
+        if limit is not None:
+            response["nextCursor"] = next_cursor
+        return serialization.json_response(response)
+    except InvalidPageRequest as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+EXPIRED_KEYS = ("location", "name", "quantity", "batchId", "expiryDate", "manufacturer", "daysUntilExpiry")
+
+async def read_expired_drugs(
+    days: int,
+    location: Optional[str],
+    from_days: Optional[int] = None,
+    to_days: Optional[int] = None,
+    columnar: bool = False,
+) -> dict:
+    today = date.today()
+    upper = days if to_days is None else to_days
+    check_date = today + timedelta(days=upper)
+    
+    rows = await repository.expiring(upper, from_days, location)
+    
+    response = {
+        "expiredDrugs": serialization.table(EXPIRED_KEYS, rows, columnar),
+        "count": len(rows),
+        "checkDate": check_date.strftime('%Y-%m-%d'),
+        "generatedAt": datetime.now().isoformat()
+    }
+    if from_days is not None:
+        response["fromDate"] = (today + timedelta(days=from_days)).strftime('%Y-%m-%d')
+    return response
+
 @app.get("/inventory/expired")
-async def get_expired_drugs(days: int = 0, location: Optional[str] = None):
+async def get_expired_drugs(
+    request: Request,
+    days: int = 0,
+    location: Optional[str] = None,
+    from_days: Optional[int] = None,
+    to_days: Optional[int] = None,
+    format: str = Query("rows", pattern=FORMAT_PATTERN),
+):
+    # from_days/to_days select an expiry window relative to today (negative
+    # values reach into the past); to_days overrides days when both are given.
     try:
-        conn = sqlite3.connect("medchain.db")
-        cursor = conn.cursor()
-        
-        check_date = datetime.now() + timedelta(days=days)
-        
-        query = """
-            SELECT location, drug_name, quantity, batch_id, expiry_date, manufacturer
-            FROM inventory
-            WHERE expiry_date <= ?
-        """
-        params = [check_date.strftime('%Y-%m-%d')]
-        
-        if location:
-            query += " AND location = ?"
-            params.append(location)
-            
-        query += " ORDER BY expiry_date ASC"
-        
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        conn.close()
+        return await cached_json_response_async(
+            response_cache, request, location,
+            lambda: read_expired_drugs(days, location, from_days, to_days, format == "columnar"),
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+LOW_STOCK_KEYS = ("location", "name", "quantity", "batchId", "expiryDate", "manufacturer", "status")
+
+async def read_low_stock(threshold: int, location: Optional[str], columnar: bool = False) -> dict:
+    rows = await repository.low_stock(threshold, location)
+    
+    return {
+        "lowStockDrugs": serialization.table(LOW_STOCK_KEYS, rows, columnar),
+        "count": len(rows),
+        "threshold": threshold,
+        "generatedAt": datetime.now().isoformat()
+    }
+
+@app.get("/inventory/low-stock")
+async def get_low_stock(
+    request: Request,
+    threshold: int = 50,
+    location: Optional[str] = None,
+    format: str = Query("rows", pattern=FORMAT_PATTERN),
+):
+    try:
+        return await cached_json_response_async(
+            response_cache, request, location,
+            lambda: read_low_stock(threshold, location, format == "columnar"),
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/inventory/reorder")
+async def trigger_reorder(reorder: ReorderRequest):
+    # With neither drugName nor drugNames the whole network is planned. Only
+    # dry runs may resolve a name by fuzzy match or expand it to several drugs;
+    # orders are placed only for names that pick out one drug (see
+    # InventoryRepository.place_reorders).
+    try:
+        requested = [name for name in [reorder.drugName, *(reorder.drugNames or [])] if name]
         
-        expired_drugs = [
-            {
-                "location": row[0],
-                "name": row[1],
-                "quantity": row[2],
-                "batchId": row[3],
-                "expiryDate": row[4],
-                "manufacturer": row[5],
-                "daysUntilExpiry": (datetime.strptime(row[4], '%Y-%m-%d') - datetime.now()).days if row[4] else None
-            }
-            for row in rows if row[4]  # Only include drugs with expiry dates
-        ]
+        drug_names, reorders_created = await repository.place_reorders(
+            requested, reorder.threshold, reorder.location, reorder.leadTimeDays, reorder.dryRun
+        )
+        if not reorder.dryRun and reorders_created:
+            notify_change("reorders", {r["location"] for r in reorders_created})
         
+        target = ", ".join(requested) if requested else "all drugs"
+        verb = "Planned" if reorder.dryRun else "Created"
         return {
-            "expiredDrugs": expired_drugs,
-            "count": len(expired_drugs),
-            "checkDate": check_date.strftime('%Y-%m-%d'),
-            "generatedAt": datetime.now().isoformat()
+            "success": True,
+            "dryRun": reorder.dryRun,
+            "drugNames": drug_names,
+            "reordersCreated": reorders_created,
+            "message": f"{verb} {len(reorders_created)} reorder(s) for {target}",
+            "timestamp": datetime.now().isoformat()
         }
         
+    except UnknownDrugNames as e:
+        raise HTTPException(status_code=422, detail={"message": str(e), "suggestions": e.suggestions})
+    except AmbiguousDrugNames as e:
+        raise HTTPException(status_code=422, detail={"message": str(e), "matches": e.matches})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/inventory/low-stock")
-async def get_low_stock(threshold: int = 50, location: Optional[str] = None):
+@app.get("/inventory/reorder/plan")
+async def get_reorder_plan(threshold: int = 50, location: Optional[str] = None):
+    # Network-wide dry run: what trigger_reorder would order right now
     try:
-        conn = sqlite3.connect("medchain.db")
-        cursor = conn.cursor()
-        
-        query = """
-            SELECT location, drug_name, quantity, batch_id, expiry_date, manufacturer
-            FROM inventory
-            WHERE quantity < ?
-        """
-        params = [threshold]
-        
-        if location:
-            query += " AND location = ?"
-            params.append(location)
-            
-        query += " ORDER BY quantity ASC"
-        
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        conn.close()
-        
-        low_stock_drugs = [
-            {
-                "location": row[0],
-                "name": row[1],
-                "quantity": row[2],
-                "batchId": row[3],
-                "expiryDate": row[4],
-                "manufacturer": row[5],
-                "status": "critical" if row[2] < 10 else "low" if row[2] < 25 else "moderate"
-            }
-            for row in rows
-        ]
-        
+        plan = await repository.reorder_plan(threshold, location)
         return {
-            "lowStockDrugs": low_stock_drugs,
-            "count": len(low_stock_drugs),
+            "plan": plan,
+            "count": len(plan),
+            "totalQuantity": sum(item["orderQuantity"] for item in plan),
             "threshold": threshold,
             "generatedAt": datetime.now().isoformat()
         }
-        
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/inventory/reorder")
-async def trigger_reorder(reorder: ReorderRequest):
+@app.post("/inventory/rebalance")
+def rebalance_inventory(request: RebalanceRequest, conn: sqlite3.Connection = Depends(get_db)):
+    # Transfers between sites before anyone reorders from a supplier; with
+    # neither drugName nor drugNames the whole network is planned.
     try:
-        conn = sqlite3.connect("medchain.db")
-        cursor = conn.cursor()
+        requested = [name for name in [request.drugName, *(request.drugNames or [])] if name]
         
-        # Check current stock
-        query = """
-            SELECT location, quantity, manufacturer
-            FROM inventory
-            WHERE drug_name LIKE ?
-        """
-        if reorder.location:
-            query += " AND location = ?"
-            cursor.execute(query, (f"%{reorder.drugName}%", reorder.location))
-        else:
-            cursor.execute(query, (f"%{reorder.drugName}%",))
-            
-        rows = cursor.fetchall()
+        # Same write lock as trigger_reorder: open proposals are read during
+        # planning and must not change before the new ones are inserted.
+        if not request.dryRun:
+            conn.execute("BEGIN IMMEDIATE")
         
-        reorders_created = []
-        for row in rows:
-            location, quantity, manufacturer = row
-            
-            if quantity < reorder.threshold:
-                # Calculate recommended order quantity
-                recommended_qty = max(500, reorder.threshold * 2)
-                expected_delivery = datetime.now() + timedelta(days=5)
-                
-                # Insert reorder
-                cursor.execute("""
-                    INSERT INTO reorders (drug_name, quantity, location, expected_delivery, supplier)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (reorder.drugName, recommended_qty, location, expected_delivery.strftime('%Y-%m-%d'), manufacturer))
-                
-                reorders_created.append({
-                    "location": location,
-                    "currentStock": quantity,
-                    "orderQuantity": recommended_qty,
-                    "supplier": manufacturer,
-                    "expectedDelivery": expected_delivery.strftime('%Y-%m-%d'),
-                    "orderId": f"MED-{datetime.now().strftime('%Y%m%d')}-{cursor.lastrowid}"
-                })
+        drug_names = (
+            resolve_drug_names(conn, requested, fuzzy=request.dryRun, single=not request.dryRun)
+            if requested else None
+        )
+        plan = rebalance.plan_transfers(
+            conn, request.threshold, drug_names=drug_names, location=request.location,
+            min_transfer=request.minTransfer, min_shelf_days=request.minShelfDays,
+        )
+        stored = time.perf_counter()
         
-        conn.commit()
-        conn.close()
+        if request.dryRun:
+            transfers = plan["proposals"]
+        else:
+            transfers = rebalance.create_transfers(conn, plan["proposals"])
+            conn.commit()
+            if transfers:
+                notify_change(
+                    "transfers", {t["fromLocation"] for t in transfers} | {t["toLocation"] for t in transfers}
+                )
         
+        target = ", ".join(requested) if requested else "all drugs"
+        verb = "Planned" if request.dryRun else "Proposed"
         return {
             "success": True,
-            "reordersCreated": reorders_created,
-            "message": f"Created {len(reorders_created)} reorder(s) for {reorder.drugName}",
+            "dryRun": request.dryRun,
+            "drugNames": drug_names,
+            "transfers": transfers,
+            "count": len(transfers),
+            "totalQuantity": plan["covered"],
+            "shortfall": plan["shortfall"],
+            "uncoveredShortfall": plan["shortfall"] - plan["covered"],
+            "pairsScanned": plan["pairs"],
+            "threshold": request.threshold,
+            "timings": {
+                "loadSeconds": plan["loadSeconds"],
+                "planSeconds": plan["planSeconds"],
+                "storeSeconds": round(time.perf_counter() - stored, 3),
+            },
+            "message": f"{verb} {len(transfers)} transfer(s) for {target}",
             "timestamp": datetime.now().isoformat()
         }
         
+    except UnknownDrugNames as e:
+        raise HTTPException(status_code=422, detail={"message": str(e), "suggestions": e.suggestions})
+    except AmbiguousDrugNames as e:
+        raise HTTPException(status_code=422, detail={"message": str(e), "matches": e.matches})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/inventory/rebalance/proposals")
+def get_transfer_proposals(status: Optional[str] = None, location: Optional[str] = None,
+                           limit: int = Query(1000, ge=1, le=10000),
+                           conn: sqlite3.Connection = Depends(get_db)):
+    try:
+        proposals = rebalance.read_proposals(conn, status=status, location=location, limit=limit)
+        return {
+            "proposals": proposals,
+            "count": len(proposals),
+            "generatedAt": datetime.now().isoformat()
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def read_inventory_summary() -> dict:
+    thirty_days = (datetime.now() + timedelta(days=30)).strftime('%Y-%m-%d')
+    summary = await repository.summary(expiring_before=thirty_days)
+    
+    return {
+        **summary,
+        "generatedAt": datetime.now().isoformat()
+    }
+
 @app.get("/inventory/summary")
-async def get_inventory_summary():
+async def get_inventory_summary(request: Request):
     try:
-        conn = sqlite3.connect("medchain.db")
-        cursor = conn.cursor()
-        
-        # Get total stats
-        cursor.execute("SELECT COUNT(*), SUM(quantity) FROM inventory")
-        total_drugs, total_quantity = cursor.fetchone()
-        
-        # Get low stock count
-        cursor.execute("SELECT COUNT(*) FROM inventory WHERE quantity < 50")
-        low_stock_count = cursor.fetchone()[0]
-        
-        # Get expiring soon count
-        thirty_days = (datetime.now() + timedelta(days=30)).strftime('%Y-%m-%d')
-        cursor.execute("SELECT COUNT(*) FROM inventory WHERE expiry_date <= ?", (thirty_days,))
-        expiring_count = cursor.fetchone()[0]
-        
-        # Get location breakdown
-        cursor.execute("""
-            SELECT location, COUNT(*), SUM(quantity)
-            FROM inventory
-            GROUP BY location
-        """)
-        location_stats = cursor.fetchall()
-        
-        # Get top drugs by quantity
-        cursor.execute("""
-            SELECT drug_name, SUM(quantity) as total_qty
-            FROM inventory
-            GROUP BY drug_name
-            ORDER BY total_qty DESC
-            LIMIT 5
-        """)
-        top_drugs = cursor.fetchall()
-        
-        conn.close()
+        return await cached_json_response_async(response_cache, request, None, read_inventory_summary)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/inventory/summary/check")
+def check_inventory_summary(conn: sqlite3.Connection = Depends(get_db)):
+    # Read-only; POST /inventory/summary/repair rebuilds the aggregates
+    try:
+        mismatches = aggregates.check_consistency(conn)
+        return {
+            "consistent": not mismatches,
+            "mismatches": mismatches[:100],
+            "mismatchCount": len(mismatches),
+            "checkedAt": datetime.now().isoformat()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/inventory/summary/repair")
+def repair_inventory_summary(conn: sqlite3.Connection = Depends(get_db)):
+    try:
+        # Hold the write lock so no trigger update lands between the check
+        # and the rebuild
+        conn.execute("BEGIN IMMEDIATE")
+        mismatches = aggregates.check_consistency(conn)
+        if mismatches:
+            aggregates.rebuild(conn)
+        conn.commit()
+        if mismatches:
+            notify_change("inventory", None, reason="repair")
         
         return {
-            "totalDrugs": total_drugs,
-            "totalQuantity": total_quantity,
-            "lowStockCount": low_stock_count,
-            "expiringCount": expiring_count,
-            "locations": [
-                {
-                    "name": row[0],
-                    "drugTypes": row[1],
-                    "totalQuantity": row[2]
-                }
-                for row in location_stats
-            ],
-            "topDrugs": [
-                {
-                    "name": row[0],
-                    "quantity": row[1]
-                }
-                for row in top_drugs
-            ],
+            "repaired": bool(mismatches),
+            "mismatches": mismatches[:100],
+            "mismatchCount": len(mismatches),
+            "repairedAt": datetime.now().isoformat()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/alerts")
+def get_alerts(
+    request: Request,
+    location: Optional[str] = None,
+    severity: Optional[str] = Query(None, pattern="^(low|medium|high|critical)$"),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    # Reads the alerts table written by the monitor; cached per location and
+    # invalidated when a monitor run changes that location's alerts.
+    try:
+        return cached_json_response(
+            response_cache, request, location,
+            lambda: {
+                **with_connection(read_alerts, location, severity, limit),
+                "monitor": inventory_monitor.last_run,
+                "generatedAt": datetime.now().isoformat()
+            },
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/alerts/run")
+def run_alert_monitor():
+    try:
+        return run_inventory_monitor()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/alerts/monitor")
+async def alert_monitor_stats():
+    return {**inventory_monitor.stats(), "timestamp": datetime.now().isoformat()}
+
+@app.get("/inventory/search")
+async def search_inventory(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=200),
+    location: Optional[str] = None,
+    fuzzy: bool = True,
+):
+    try:
+        started = time.perf_counter()
+        result = await repository.search(q, limit, location, fuzzy)
+        return {
+            **result,
+            "tookMs": round((time.perf_counter() - started) * 1000, 2),
+            "generatedAt": datetime.now().isoformat()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/inventory/as-of")
+def get_inventory_as_of(
+    at: str = Query(..., description="UTC ISO date or datetime; a bare date means end of day"),
+    location: Optional[str] = None,
+    drug: Optional[str] = None,
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    # Nearest ledger snapshot at or before `at`, plus the movements after it
+    try:
+        return {
+            **ledger.stock_as_of(conn, ledger.parse_as_of(at), location, drug),
             "generatedAt": datetime.now().isoformat()
         }
+    except ledger.LedgerError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Must be registered after the static /inventory/* GET routes, otherwise it
+# would swallow /inventory/all, /inventory/summary, ...
+@app.get("/inventory/{location}")
+async def get_inventory(
+    request: Request,
+    location: str,
+    fields: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=10000),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    format: str = Query("rows", pattern=FORMAT_PATTERN),
+):
+    try:
+        selected = parse_fields(fields)
+        columnar = format == "columnar"
+        if stream and columnar:
+            raise InvalidPageRequest("format=columnar cannot be combined with stream=true")
+        # Streaming is SQLite-only; PostgreSQL returns the same document in one piece
+        if stream and db_pool is not None:
+            return StreamingResponse(
+                stream_location_inventory(db_pool, selected, location), media_type="application/json"
+            )
+        
+        after = decode_cursor(cursor)
+        
+        async def read_page():
+            rows, next_cursor = await repository.inventory_page(selected, limit, after, location)
+            
+            response = {
+                "location": location,
+                "drugs": columnar_page(selected, rows, with_location=False) if columnar else [shape_row(selected, row[2:]) for row in rows],
+                "totalItems": len(rows),
+                "lastSync": datetime.now().isoformat()
+            }
+            if limit is not None:
+                response["nextCursor"] = next_cursor
+            return response
         
+        return await cached_json_response_async(response_cache, request, location, read_page)
+    except InvalidPageRequest as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/predict-demand")
-async def predict_demand(location: Optional[str] = None, drug: Optional[str] = None, days: int = 30):
+async def predict_demand(
+    location: Optional[str] = None,
+    drug: Optional[str] = None,
+    days: int = Query(30, ge=1, le=365),
+    source: str = Query("store", pattern="^(store|gemini)$"),
+):
     try:
-        # Use Gemini AI if available
-        if model:
+        # Served from demand_predictions, written by the local forecaster.
+        # Once a model has been fitted its answer stands, even when empty.
+        if source == "store":
+            predictions, fitted = await repository.predictions(days, location, drug)
+            if fitted:
+                return {
+                    "predictions": predictions,
+                    "generated_at": datetime.now().isoformat(),
+                    "source": "forecast_store"
+                }
+
+        # Gemini is opt-in (?source=gemini); it has no access to the history
+        if source == "gemini" and ai_client.available:
             prompt = f"""
             As a healthcare supply chain AI expert, predict demand for the next {days} days.
             Location: {location or 'All locations'}
@@ -488,10 +972,9 @@ async def predict_demand(location: Optional[str] = None, drug: Optional[str] = N
             """
             
             try:
-                response = model.generate_content(prompt)
+                response_text = await ai_client.generate(prompt)
                 # Try to parse JSON from response
-                import re
-                json_match = re.search(r'\{.*\}', response.text, re.DOTALL)
+                json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
                 if json_match:
                     ai_data = json.loads(json_match.group())
                     return {
@@ -502,7 +985,7 @@ async def predict_demand(location: Optional[str] = None, drug: Optional[str] = N
             except Exception as ai_error:
                 print(f"Gemini AI error: {ai_error}")
         
-        # Fallback to mock predictions
+        # Mock predictions until the first refit (or when Gemini is unavailable)
         mock_predictions = [
             {"drug": "Paracetamol 500mg", "predicted_demand": 2400, "confidence": 0.92, "trend": "increasing"},
             {"drug": "Amoxicillin 250mg", "predicted_demand": 1800, "confidence": 0.87, "trend": "stable"},
@@ -521,6 +1004,22 @@ async def predict_demand(location: Optional[str] = None, drug: Optional[str] = N
             "source": "mock_data"
         }
         
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/predict-demand/refit")
+def refit_demand_predictions(
+    horizonDays: int = Query(forecasting.DEFAULT_HORIZON_DAYS, ge=1, le=365),
+    lookbackDays: int = Query(forecasting.DEFAULT_LOOKBACK_DAYS, ge=7, le=730),
+    location: Optional[str] = None,
+    drug: Optional[str] = None,
+    conn: sqlite3.Connection = Depends(get_db)
+):
+    try:
+        stats = forecasting.refit(conn, horizonDays, lookbackDays, location, drug)
+        return {**stats, "refittedAt": datetime.now().isoformat()}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -530,10 +1029,15 @@ async def ai_chat(chat: ChatMessage):
         user_message = chat.message
         language = chat.language
         
-        # Enhanced context for medical supply chain
+        # The snapshot is built from SQLite; on PostgreSQL the prompt says
+        # live data is unavailable
+        if chat_context.snapshot is None and db_pool is not None:
+            await anyio.to_thread.run_sync(with_connection, chat_context.refresh)
+        
+        # Enhanced context for medical supply chain, grounded in the slice of
+        # the live inventory snapshot that the question is about
         medical_context = f"""
         You are an intelligent healthcare supply chain AI assistant for MedChain platform.
-        Current system status: Online and monitoring {len(mockDrugs)} drug types across multiple locations.
         
         User question ({language}): {user_message}
         
@@ -548,12 +1052,7 @@ async def ai_chat(chat: ChatMessage):
         - Regulatory compliance and reporting
         
         Current inventory snapshot:
-        - Total drugs in system: {len(mockDrugs)}
-        - Locations monitored: {len(set(drug['location'] for drug in [
-            {"location": "Central Hospital"}, {"location": "Rural Clinic A"}, 
-            {"location": "City Pharmacy"}, {"location": "Regional Hospital"}
-        ]))}
-        - Critical stock alerts: Active monitoring
+{chat_context.render(user_message)}
         
         Response guidelines:
         1. Provide actionable, specific information
@@ -570,10 +1069,13 @@ async def ai_chat(chat: ChatMessage):
         For verification queries, confirm authenticity status.
         """
         
-        if model:
-            response = model.generate_content(medical_context)
+        if ai_client.available:
+            try:
+                response_text = await ai_client.generate(medical_context)
+            except AITimeout as e:
+                raise HTTPException(status_code=504, detail=str(e))
             return {
-                "response": response.text,
+                "response": response_text,
                 "language": language,
                 "timestamp": datetime.now().isoformat(),
                 "source": "gemini_ai"
@@ -587,27 +1089,18 @@ async def ai_chat(chat: ChatMessage):
                 "source": "mock_response"
             }
             
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/ai/batch-verify")
 async def verify_batch_ai(batch: BatchVerification):
     try:
-        conn = sqlite3.connect("medchain.db")
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT drug_name, quantity, location, expiry_date, manufacturer
-            FROM inventory
-            WHERE batch_id = ?
-        """, (batch.batchId,))
-        
-        result = cursor.fetchone()
-        conn.close()
+        result = await repository.find_batch(batch.batchId)
         
         if result:
-            drug_name, quantity, location, expiry_date, manufacturer = result
-            is_expired = datetime.strptime(expiry_date, '%Y-%m-%d') < datetime.now() if expiry_date else False
+            drug_name, quantity, location, expiry_date, manufacturer, is_expired = result
             
             return {
                 "verified": True,
@@ -633,6 +1126,41 @@ async def verify_batch_ai(batch: BatchVerification):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/batch-verify/bulk")
+def verify_batches_bulk(request: BulkBatchVerification, conn: sqlite3.Connection = Depends(get_db)):
+    # IDs missing from the in-memory index are answered without a query;
+    # the rest are resolved together in one indexed lookup.
+    try:
+        result = batch_index.verify(conn, request.batchIds)
+        return {**result, "timestamp": datetime.now().isoformat()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/batch-verify/stats")
+async def batch_verify_stats():
+    return {**batch_index.stats(), "timestamp": datetime.now().isoformat()}
+
+@app.get("/chain/verify")
+def verify_batch_on_chain(batchId: str, conn: sqlite3.Connection = Depends(get_db)):
+    # Answered from the local event mirror; mirroredThroughBlock tells the
+    # caller how far behind the chain the answer may be.
+    try:
+        return {**chain_mirror.verify(conn, batchId), "timestamp": datetime.now().isoformat()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/chain/status")
+def chain_status(conn: sqlite3.Connection = Depends(get_db)):
+    return {
+        **chain_mirror.stats(),
+        "mirroredThroughBlock": chain_mirror.cursor(conn),
+        "timestamp": datetime.now().isoformat()
+    }
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    if WORKERS > 1:
+        # Each worker process imports the app itself
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=WORKERS)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
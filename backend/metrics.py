@@ -0,0 +1,419 @@
+"""Request, SQL and upstream timing, exported in Prometheus text format.
+
+``MetricsMiddleware`` times every request under its route template and keeps
+a per-request ``RequestTimings``, stored in a context variable. Code that
+runs for the request adds to it, including code in worker threads, since
+anyio copies the context into the thread:
+
+- SQL statement time, from ``SqlProfiler`` connections
+- time spent waiting for a pooled connection
+- JSON encoding time, from cache.py
+
+The remainder of the request time is Python work such as row shaping and
+framework overhead.
+
+``SqlProfiler`` supplies the connection factory for the SQLite pool. Python's
+sqlite3 module has no per-statement profile hook, so the factory's cursors
+time ``execute`` and the fetches themselves. Rows from iterated cursors are
+read in chunks, which keeps the timing overhead off the per-row path.
+Statements slower than the threshold are logged with their EXPLAIN QUERY
+PLAN and kept for /metrics/slow-queries.
+
+Each worker process keeps its own metrics; label scrapes per instance.
+"""
+import contextvars
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger("medchain.sql")
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_STATEMENTS = 500
+SLOW_QUERY_LOG_SIZE = 50
+FETCH_CHUNK = 256
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class RequestTimings:
+    __slots__ = ("sql", "pool_wait", "encode", "statements")
+
+    def __init__(self):
+        self.sql = 0.0
+        self.pool_wait = 0.0
+        self.encode = 0.0
+        self.statements = 0
+
+
+_current_timings: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+def add_phase(phase: str, seconds: float):
+    """Add ``seconds`` to a phase ("sql", "pool_wait", "encode") of the current request."""
+    timings = _current_timings.get()
+    if timings is not None:
+        setattr(timings, phase, getattr(timings, phase) + seconds)
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # per-bucket counts, then +Inf count, then sum
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def render(self, name: str, label_names: Tuple[str, ...]) -> List[str]:
+        lines = []
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in sorted(items):
+            base = _labels(label_names, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(label_names, labels, ("le", repr(bound)))} {cumulative}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{name}_bucket{_labels(label_names, labels, ("le", "+Inf"))} {cumulative}')
+            lines.append(f"{name}_sum{base} {series[-1]:.6f}")
+            lines.append(f"{name}_count{base} {cumulative}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable, extra: Optional[tuple] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def normalise_sql(sql: str) -> str:
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+class StatementStats:
+    __slots__ = ("sql", "fingerprint", "calls", "seconds", "rows", "slow")
+
+    def __init__(self, sql: str):
+        self.sql = sql
+        self.fingerprint = hashlib.blake2b(sql.encode(), digest_size=5).hexdigest()
+        self.calls = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.slow = 0
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Cursor that reports statement time and rows to its connection's profiler."""
+
+    _stats: Optional[StatementStats] = None
+    _parameters = None
+    _elapsed = 0.0
+    _logged = False
+
+    def _record(self, seconds: float, rows: int = 0, parameters=None):
+        profiler = self.connection._profiler
+        stats = self._stats
+        with profiler._lock:
+            stats.seconds += seconds
+            stats.rows += rows
+        add_phase("sql", seconds)
+        self._elapsed += seconds
+        if not self._logged and self._elapsed * 1000 >= profiler.slow_query_ms:
+            self._logged = True
+            profiler.slow_query(self.connection, stats, self._elapsed, parameters)
+
+    def execute(self, sql, parameters=()):
+        self._stats = self.connection._profiler.statement(sql)
+        self._elapsed = 0.0
+        self._logged = False
+        self._parameters = parameters
+        timings = _current_timings.get()
+        if timings is not None:
+            timings.statements += 1
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._record(time.perf_counter() - started, parameters=parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._stats = self.connection._profiler.statement(sql)
+        self._elapsed = 0.0
+        self._logged = False
+        self._parameters = None
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._record(time.perf_counter() - started)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        if self._stats is not None:
+            self._record(time.perf_counter() - started, row is not None, self._parameters)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        if self._stats is not None:
+            self._record(time.perf_counter() - started, len(rows), self._parameters)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        if self._stats is not None:
+            self._record(time.perf_counter() - started, len(rows), self._parameters)
+        return rows
+
+    def __iter__(self):
+        while True:
+            rows = self.fetchmany(FETCH_CHUNK)
+            if not rows:
+                return
+            yield from rows
+
+    def __next__(self):
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+
+class ProfiledConnection(sqlite3.Connection):
+    _profiler: "SqlProfiler"
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or ProfiledCursor)
+
+    # Connection.execute would create its cursor in C and bypass ours
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class SqlProfiler:
+    """Per-statement SQLite timing, row counts and a slow-query log."""
+
+    def __init__(self, slow_query_ms: float = 100.0):
+        self.slow_query_ms = slow_query_ms
+        self._statements: Dict[str, StatementStats] = {}
+        self._overflow = StatementStats("(other statements)")
+        self._plans: Dict[str, List[str]] = {}
+        self.slow_queries = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+        self.pool_wait = Histogram()
+        self._lock = threading.Lock()
+        profiler = self
+
+        class Connection(ProfiledConnection):
+            _profiler = profiler
+
+        self.connection_factory = Connection
+
+    def statement(self, sql: str) -> StatementStats:
+        with self._lock:
+            stats = self._statements.get(sql)
+            if stats is None:
+                if len(self._statements) >= MAX_STATEMENTS:
+                    stats = self._overflow
+                else:
+                    stats = self._statements[sql] = StatementStats(normalise_sql(sql))
+            stats.calls += 1
+            return stats
+
+    def record_pool_wait(self, seconds: float):
+        self.pool_wait.observe((), seconds)
+        add_phase("pool_wait", seconds)
+
+    def _explain(self, conn: sqlite3.Connection, sql: str, parameters) -> List[str]:
+        plan = self._plans.get(sql)
+        if plan is None:
+            try:
+                # A plain cursor, so the EXPLAIN is not profiled itself
+                rows = conn.cursor(sqlite3.Cursor).execute(f"EXPLAIN QUERY PLAN {sql}", parameters or ()).fetchall()
+                plan = [row[3] for row in rows]
+            except sqlite3.Error as e:
+                plan = [f"(no plan: {e})"]
+            self._plans[sql] = plan
+        return plan
+
+    def slow_query(self, conn: sqlite3.Connection, stats: StatementStats, seconds: float, parameters):
+        # Called once per execution, when its time first crosses the threshold
+        with self._lock:
+            stats.slow += 1
+        plan = self._explain(conn, stats.sql, parameters) if stats is not self._overflow else []
+        entry = {
+            "statement": stats.sql[:2000],
+            "fingerprint": stats.fingerprint,
+            "durationMs": round(seconds * 1000, 2),
+            "plan": plan,
+            "at": datetime.now().isoformat(),
+        }
+        self.slow_queries.append(entry)
+        logger.warning(
+            "Slow query (%sms, %s): %s | plan: %s", entry["durationMs"], stats.fingerprint, stats.sql[:200], "; ".join(plan)
+        )
+
+    def top(self, limit: int = 20) -> List[dict]:
+        with self._lock:
+            statements = sorted(self._statements.values(), key=lambda s: s.seconds, reverse=True)[:limit]
+            return [
+                {
+                    "fingerprint": s.fingerprint,
+                    "statement": s.sql[:500],
+                    "calls": s.calls,
+                    "totalMs": round(s.seconds * 1000, 2),
+                    "meanMs": round(s.seconds * 1000 / s.calls, 3) if s.calls else 0.0,
+                    "rows": s.rows,
+                    "slow": s.slow,
+                }
+                for s in statements
+            ]
+
+    def render(self) -> List[str]:
+        with self._lock:
+            statements = list(self._statements.values())
+            if self._overflow.calls:
+                statements.append(self._overflow)
+            snapshot = [(s.fingerprint, s.sql[:120], s.calls, s.seconds, s.rows, s.slow) for s in statements]
+        names = ("fingerprint", "statement")
+        lines = []
+        for metric, kind, help_text, index in (
+            ("medchain_sql_statement_calls_total", "counter", "Statement executions", 2),
+            ("medchain_sql_statement_seconds_total", "counter", "Time in execute and fetch", 3),
+            ("medchain_sql_statement_rows_total", "counter", "Rows returned", 4),
+            ("medchain_sql_slow_queries_total", "counter", "Executions over the slow-query threshold", 5),
+        ):
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+            for row in snapshot:
+                value = row[index]
+                lines.append(f"{metric}{_labels(names, row[:2])} {value:.6f}" if isinstance(value, float)
+                             else f"{metric}{_labels(names, row[:2])} {value}")
+        lines += ["# HELP medchain_db_pool_wait_seconds Time waiting for a pooled connection",
+                  "# TYPE medchain_db_pool_wait_seconds histogram"]
+        lines += self.pool_wait.render("medchain_db_pool_wait_seconds", ())
+        return lines
+
+
+class Metrics:
+    """Process-wide request and upstream metrics plus scrape-time collectors."""
+
+    PHASES = ("pool_wait", "sql", "encode")
+
+    def __init__(self, sql_profiler: Optional[SqlProfiler] = None):
+        self.sql_profiler = sql_profiler
+        self.request_duration = Histogram()
+        self.ai_upstream = Histogram()
+        self._requests: Dict[tuple, int] = {}
+        self._phases: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        self._collectors: List[Callable[[], List[tuple]]] = []
+
+    def add_collector(self, collect: Callable[[], List[tuple]]):
+        """``collect()`` returns (name, type, help, value) tuples read at scrape time."""
+        self._collectors.append(collect)
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, timings: RequestTimings):
+        self.request_duration.observe((method, route), seconds)
+        with self._lock:
+            key = (method, route, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            accounted = 0.0
+            for phase in self.PHASES:
+                value = getattr(timings, phase)
+                accounted += value
+                self._phases[(route, phase)] = self._phases.get((route, phase), 0.0) + value
+            self._phases[(route, "other")] = self._phases.get((route, "other"), 0.0) + max(seconds - accounted, 0.0)
+
+    def observe_ai(self, outcome: str, seconds: float):
+        self.ai_upstream.observe((outcome,), seconds)
+
+    def render(self) -> str:
+        lines = ["# HELP medchain_http_requests_total Requests by route and status",
+                 "# TYPE medchain_http_requests_total counter"]
+        with self._lock:
+            requests = sorted(self._requests.items())
+            phases = sorted(self._phases.items())
+        for labels, count in requests:
+            lines.append(f"medchain_http_requests_total{_labels(('method', 'route', 'status'), labels)} {count}")
+        lines += ["# HELP medchain_http_request_duration_seconds Request latency by route",
+                  "# TYPE medchain_http_request_duration_seconds histogram"]
+        lines += self.request_duration.render("medchain_http_request_duration_seconds", ("method", "route"))
+        lines += ["# HELP medchain_http_request_phase_seconds_total Request time by phase "
+                  "(pool_wait, sql, encode, other)",
+                  "# TYPE medchain_http_request_phase_seconds_total counter"]
+        for labels, seconds in phases:
+            lines.append(f"medchain_http_request_phase_seconds_total{_labels(('route', 'phase'), labels)} {seconds:.6f}")
+        lines += ["# HELP medchain_ai_upstream_seconds Gemini call latency by outcome",
+                  "# TYPE medchain_ai_upstream_seconds histogram"]
+        lines += self.ai_upstream.render("medchain_ai_upstream_seconds", ("outcome",))
+        if self.sql_profiler is not None:
+            lines += self.sql_profiler.render()
+        for collect in self._collectors:
+            for name, kind, help_text, value in collect():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each HTTP request under its route template."""
+
+    def __init__(self, app, metrics: Metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_timings.reset(token)
+            route = scope.get("route")
+            self.metrics.observe_request(
+                scope["method"], route.path if route is not None else "(unmatched)",
+                status, time.perf_counter() - started, timings,
+            )
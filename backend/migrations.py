@@ -0,0 +1,502 @@
+"""Versioned schema migrations for the MedChain SQLite database.
+
+Usage from the backend directory:
+
+    python migrations.py                  # apply pending migrations
+    python migrations.py --status         # show applied/pending versions
+    python migrations.py --check-plans    # fail if a hot query scans a table
+"""
+import argparse
+import os
+import sqlite3
+import sys
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Sequence, Tuple, Union
+
+Step = Union[str, Callable[[sqlite3.Connection], None]]
+
+EXPIRY_DAY_SQL = "CAST(julianday(expiry_date) - 2440587.5 AS INTEGER)"
+
+
+class Migration:
+    def __init__(self, version: int, name: str, steps: Sequence[Step]):
+        self.version = version
+        self.name = name
+        self.steps = steps
+
+    def apply(self, conn: sqlite3.Connection):
+        for step in self.steps:
+            if callable(step):
+                step(conn)
+            else:
+                conn.execute(step)
+
+
+# Each migration carries its own DDL, frozen as it was when the migration was
+# written. Feature modules are free to change their queries; a schema change
+# is a new migration here.
+
+
+def _stats_add_row(ref: str) -> str:
+    return f"""
+        INSERT INTO inventory_location_stats (location, drug_types, total_quantity, low_stock_count)
+        VALUES ({ref}.location, 1, {ref}.quantity, {ref}.quantity < 50)
+        ON CONFLICT(location) DO UPDATE SET
+            drug_types = drug_types + 1,
+            total_quantity = total_quantity + excluded.total_quantity,
+            low_stock_count = low_stock_count + excluded.low_stock_count;
+        INSERT INTO inventory_drug_stats (drug_name, location_count, total_quantity)
+        VALUES ({ref}.drug_name, 1, {ref}.quantity)
+        ON CONFLICT(drug_name) DO UPDATE SET
+            location_count = location_count + 1,
+            total_quantity = total_quantity + excluded.total_quantity;
+        INSERT INTO inventory_expiry_stats (expiry_date, item_count)
+        SELECT {ref}.expiry_date, 1 WHERE {ref}.expiry_date IS NOT NULL
+        ON CONFLICT(expiry_date) DO UPDATE SET item_count = item_count + 1;
+    """
+
+
+def _stats_remove_row(ref: str) -> str:
+    return f"""
+        UPDATE inventory_location_stats SET
+            drug_types = drug_types - 1,
+            total_quantity = total_quantity - {ref}.quantity,
+            low_stock_count = low_stock_count - ({ref}.quantity < 50)
+        WHERE location = {ref}.location;
+        DELETE FROM inventory_location_stats WHERE location = {ref}.location AND drug_types <= 0;
+        UPDATE inventory_drug_stats SET
+            location_count = location_count - 1,
+            total_quantity = total_quantity - {ref}.quantity
+        WHERE drug_name = {ref}.drug_name;
+        DELETE FROM inventory_drug_stats WHERE drug_name = {ref}.drug_name AND location_count <= 0;
+        UPDATE inventory_expiry_stats SET item_count = item_count - 1 WHERE expiry_date = {ref}.expiry_date;
+        DELETE FROM inventory_expiry_stats WHERE expiry_date = {ref}.expiry_date AND item_count <= 0;
+    """
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "initial schema", [
+        """
+        CREATE TABLE IF NOT EXISTS inventory (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            location TEXT NOT NULL,
+            drug_name TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            batch_id TEXT,
+            expiry_date DATE,
+            manufacturer TEXT,
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(location, drug_name)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS reorders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            drug_name TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            location TEXT NOT NULL,
+            status TEXT DEFAULT 'pending',
+            order_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expected_delivery DATE,
+            supplier TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS demand_predictions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            location TEXT NOT NULL,
+            drug_name TEXT NOT NULL,
+            predicted_demand INTEGER NOT NULL,
+            confidence REAL NOT NULL,
+            prediction_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ]),
+    Migration(2, "hot path indexes", [
+        "CREATE INDEX IF NOT EXISTS idx_inventory_expiry_date ON inventory(expiry_date)",
+        "CREATE INDEX IF NOT EXISTS idx_inventory_quantity ON inventory(quantity)",
+        "CREATE INDEX IF NOT EXISTS idx_inventory_batch_id ON inventory(batch_id)",
+        "CREATE INDEX IF NOT EXISTS idx_reorders_status_location ON reorders(status, location)",
+    ]),
+    # Triggers keep the tables in step with inventory; see aggregates.py.
+    # Low stock means a quantity under 50.
+    Migration(3, "summary aggregate tables", [
+        """
+        CREATE TABLE IF NOT EXISTS inventory_location_stats (
+            location TEXT PRIMARY KEY,
+            drug_types INTEGER NOT NULL,
+            total_quantity INTEGER NOT NULL,
+            low_stock_count INTEGER NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS inventory_drug_stats (
+            drug_name TEXT PRIMARY KEY,
+            location_count INTEGER NOT NULL,
+            total_quantity INTEGER NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_inventory_drug_stats_quantity ON inventory_drug_stats(total_quantity)",
+        """
+        CREATE TABLE IF NOT EXISTS inventory_expiry_stats (
+            expiry_date DATE PRIMARY KEY,
+            item_count INTEGER NOT NULL
+        )
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_inventory_stats_insert AFTER INSERT ON inventory
+        BEGIN {_stats_add_row("NEW")} END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_inventory_stats_delete AFTER DELETE ON inventory
+        BEGIN {_stats_remove_row("OLD")} END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_inventory_stats_update
+        AFTER UPDATE OF location, drug_name, quantity, expiry_date ON inventory
+        BEGIN {_stats_remove_row("OLD")} {_stats_add_row("NEW")} END
+        """,
+        """
+        INSERT INTO inventory_location_stats
+        SELECT location, COUNT(*), SUM(quantity), SUM(quantity < 50) FROM inventory GROUP BY location
+        """,
+        """
+        INSERT INTO inventory_drug_stats
+        SELECT drug_name, COUNT(*), SUM(quantity) FROM inventory GROUP BY drug_name
+        """,
+        """
+        INSERT INTO inventory_expiry_stats
+        SELECT expiry_date, COUNT(*) FROM inventory WHERE expiry_date IS NOT NULL GROUP BY expiry_date
+        """,
+    ]),
+    # expiry_day = days since 1970-01-01, derived from expiry_date by SQLite
+    # itself so every write path keeps it in sync without extra code.
+    Migration(4, "integer expiry day", [
+        f"""
+        ALTER TABLE inventory ADD COLUMN expiry_day INTEGER
+        GENERATED ALWAYS AS ({EXPIRY_DAY_SQL}) VIRTUAL
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_inventory_expiry_day ON inventory(expiry_day)",
+        "DROP INDEX IF EXISTS idx_inventory_expiry_date",
+    ]),
+    Migration(5, "reorder engine indexes", [
+        "CREATE INDEX IF NOT EXISTS idx_inventory_drug_name ON inventory(drug_name)",
+        "CREATE INDEX IF NOT EXISTS idx_reorders_pair_status ON reorders(location, drug_name, status)",
+        "CREATE INDEX IF NOT EXISTS idx_demand_predictions_pair ON demand_predictions(location, drug_name, id)",
+    ]),
+    # External-content FTS5 tables over inventory and the drug name
+    # vocabulary in inventory_drug_stats; see search.py.
+    Migration(6, "trigram search indexes", [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS inventory_fts USING fts5(
+            drug_name, manufacturer, batch_id,
+            content='inventory', content_rowid='id', tokenize='trigram'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_inventory_fts_insert AFTER INSERT ON inventory BEGIN
+            INSERT INTO inventory_fts(rowid, drug_name, manufacturer, batch_id)
+            VALUES (NEW.id, NEW.drug_name, NEW.manufacturer, NEW.batch_id);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_inventory_fts_delete AFTER DELETE ON inventory BEGIN
+            INSERT INTO inventory_fts(inventory_fts, rowid, drug_name, manufacturer, batch_id)
+            VALUES ('delete', OLD.id, OLD.drug_name, OLD.manufacturer, OLD.batch_id);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_inventory_fts_update
+        AFTER UPDATE OF drug_name, manufacturer, batch_id ON inventory BEGIN
+            INSERT INTO inventory_fts(inventory_fts, rowid, drug_name, manufacturer, batch_id)
+            VALUES ('delete', OLD.id, OLD.drug_name, OLD.manufacturer, OLD.batch_id);
+            INSERT INTO inventory_fts(rowid, drug_name, manufacturer, batch_id)
+            VALUES (NEW.id, NEW.drug_name, NEW.manufacturer, NEW.batch_id);
+        END
+        """,
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS drug_names_fts USING fts5(
+            drug_name, content='inventory_drug_stats', content_rowid='rowid', tokenize='trigram'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_drug_names_fts_insert AFTER INSERT ON inventory_drug_stats BEGIN
+            INSERT INTO drug_names_fts(rowid, drug_name) VALUES (NEW.rowid, NEW.drug_name);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_drug_names_fts_delete AFTER DELETE ON inventory_drug_stats BEGIN
+            INSERT INTO drug_names_fts(drug_names_fts, rowid, drug_name) VALUES ('delete', OLD.rowid, OLD.drug_name);
+        END
+        """,
+        "INSERT INTO inventory_fts(inventory_fts) VALUES ('rebuild')",
+        "INSERT INTO drug_names_fts(drug_names_fts) VALUES ('rebuild')",
+    ]),
+    # forecast_runs logs each refit so /predict-demand knows a model exists;
+    # predictions stored before the log existed count as one (unknown) run.
+    Migration(7, "forecast columns and run log", [
+        "ALTER TABLE demand_predictions ADD COLUMN horizon_days INTEGER NOT NULL DEFAULT 30",
+        "ALTER TABLE demand_predictions ADD COLUMN method TEXT",
+        "ALTER TABLE demand_predictions ADD COLUMN trend TEXT",
+        """
+        CREATE TABLE IF NOT EXISTS forecast_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fitted_at TIMESTAMP NOT NULL,
+            series INTEGER NOT NULL,
+            horizon_days INTEGER NOT NULL,
+            lookback_days INTEGER,
+            location TEXT,
+            drug_name TEXT
+        )
+        """,
+        """
+        INSERT INTO forecast_runs (fitted_at, series, horizon_days)
+        SELECT MAX(prediction_date), COUNT(*), MAX(horizon_days) FROM demand_predictions
+        HAVING COUNT(*) > 0 AND NOT EXISTS (SELECT 1 FROM forecast_runs)
+        """,
+    ]),
+    # inventory becomes a snapshot of the stock movement ledger; each pair
+    # opens at its current quantity.
+    Migration(8, "stock movement ledger", [
+        """
+        CREATE TABLE IF NOT EXISTS stock_movements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            location TEXT NOT NULL,
+            drug_name TEXT NOT NULL,
+            delta INTEGER NOT NULL,
+            reason TEXT NOT NULL DEFAULT 'adjustment',
+            reference TEXT,
+            recorded_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_stock_movements_pair ON stock_movements(location, drug_name, id)",
+        "CREATE INDEX IF NOT EXISTS idx_stock_movements_recorded_at ON stock_movements(recorded_at)",
+        """
+        CREATE TABLE IF NOT EXISTS inventory_snapshots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            taken_at TEXT NOT NULL,
+            last_movement_id INTEGER NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_inventory_snapshots_taken_at ON inventory_snapshots(taken_at)",
+        """
+        CREATE TABLE IF NOT EXISTS inventory_snapshot_items (
+            snapshot_id INTEGER NOT NULL,
+            location TEXT NOT NULL,
+            drug_name TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            PRIMARY KEY (snapshot_id, location, drug_name)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS ledger_compactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            compacted_at TEXT NOT NULL,
+            through_movement_id INTEGER NOT NULL,
+            base_snapshot_id INTEGER NOT NULL,
+            movements_deleted INTEGER NOT NULL
+        )
+        """,
+        """
+        INSERT INTO stock_movements (location, drug_name, delta, reason, recorded_at)
+        SELECT location, drug_name, quantity, 'opening_balance',
+               COALESCE(strftime('%Y-%m-%d %H:%M:%f', last_updated), strftime('%Y-%m-%d %H:%M:%f', 'now'))
+        FROM inventory
+        WHERE quantity != 0
+        ORDER BY 5, location, drug_name
+        """,
+    ]),
+    Migration(9, "inventory alerts", [
+        """
+        CREATE TABLE IF NOT EXISTS alerts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            inventory_id INTEGER NOT NULL,
+            location TEXT NOT NULL,
+            drug_name TEXT NOT NULL,
+            batch_id TEXT,
+            type TEXT NOT NULL CHECK (type IN ('expired', 'expiring', 'low_stock', 'out_of_stock')),
+            severity TEXT NOT NULL CHECK (severity IN ('low', 'medium', 'high', 'critical')),
+            message TEXT NOT NULL,
+            is_resolved INTEGER NOT NULL DEFAULT 0,
+            first_seen TIMESTAMP NOT NULL,
+            last_changed TIMESTAMP NOT NULL,
+            resolved_at TIMESTAMP
+        )
+        """,
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_alerts_open_item
+        ON alerts(inventory_id, type) WHERE is_resolved = 0
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_alerts_open_location
+        ON alerts(location, first_seen) WHERE is_resolved = 0
+        """,
+    ]),
+    Migration(10, "chain event mirror", [
+        """
+        CREATE TABLE IF NOT EXISTS chain_drugs (
+            contract TEXT NOT NULL,
+            batch_hash TEXT NOT NULL,
+            name TEXT NOT NULL,
+            manufacturer TEXT NOT NULL,
+            registered_at INTEGER NOT NULL,
+            registered_by TEXT NOT NULL,
+            block_number INTEGER NOT NULL,
+            tx_hash TEXT NOT NULL,
+            PRIMARY KEY (contract, batch_hash)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS chain_verifications (
+            contract TEXT NOT NULL,
+            tx_hash TEXT NOT NULL,
+            log_index INTEGER NOT NULL,
+            batch_hash TEXT NOT NULL,
+            verified_by TEXT NOT NULL,
+            verified_at INTEGER NOT NULL,
+            block_number INTEGER NOT NULL,
+            PRIMARY KEY (contract, tx_hash, log_index)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_chain_verifications_batch
+        ON chain_verifications(contract, batch_hash, verified_at)
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS chain_cursors (
+            contract TEXT PRIMARY KEY,
+            last_block INTEGER NOT NULL,
+            updated_at TIMESTAMP NOT NULL
+        )
+        """,
+    ]),
+    Migration(11, "stock transfer proposals", [
+        """
+        CREATE TABLE IF NOT EXISTS transfer_proposals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            drug_name TEXT NOT NULL,
+            from_location TEXT NOT NULL,
+            to_location TEXT NOT NULL,
+            quantity INTEGER NOT NULL CHECK (quantity > 0),
+            expiry_date DATE,
+            status TEXT NOT NULL DEFAULT 'proposed'
+                CHECK (status IN ('proposed', 'approved', 'completed', 'cancelled')),
+            created_at TIMESTAMP NOT NULL
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_transfer_proposals_open
+        ON transfer_proposals(drug_name, from_location, to_location) WHERE status IN ('proposed', 'approved')
+        """,
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def _ensure_version_table(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP NOT NULL
+        )
+    """)
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    _ensure_version_table(conn)
+    row = conn.execute("SELECT MAX(version) FROM schema_migrations").fetchone()
+    return row[0] or 0
+
+
+def migrate(conn: sqlite3.Connection, target: int = LATEST_VERSION) -> List[int]:
+    """Apply every pending migration up to ``target``, one transaction each.
+
+    BEGIN IMMEDIATE takes the write lock before the version is re-read, so
+    several processes starting at once apply each migration exactly once.
+    An up-to-date database returns after a single read.
+    """
+    applied = []
+    # Already current: one read, no write lock
+    if current_version(conn) >= target:
+        return applied
+    for migration in MIGRATIONS:
+        if migration.version > target:
+            break
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if migration.version <= current_version(conn):
+                conn.rollback()
+                continue
+            migration.apply(conn)
+            conn.execute(
+                "INSERT INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)",
+                (migration.version, migration.name, datetime.now()),
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(migration.version)
+    return applied
+
+
+def query_plan(conn: sqlite3.Connection, sql: str, params=()) -> List[str]:
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def check_query_plans(conn: sqlite3.Connection, queries: Dict[str, Tuple[str, Any]]) -> dict:
+    """Return {query_name: plan} for every query whose plan scans a table."""
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    failures = {}
+    for name, (sql, params) in queries.items():
+        plan = query_plan(conn, sql, params)
+        scans = [
+            step for step in plan
+            if step.startswith("SCAN ") and step.split()[1] in tables
+        ]
+        if scans:
+            failures[name] = plan
+    return failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="show applied and pending migrations")
+    parser.add_argument("--check-plans", action="store_true", help="EXPLAIN the hot queries and fail on table scans")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    from database import DatabaseSettings
+
+    load_dotenv()
+    settings = DatabaseSettings.from_url(os.getenv("DATABASE_URL", "sqlite:///./medchain.db"))
+    conn = sqlite3.connect(settings.path)
+    try:
+        if args.status:
+            version = current_version(conn)
+            for migration in MIGRATIONS:
+                state = "applied" if migration.version <= version else "pending"
+                print(f"{migration.version:4d}  {state:8s} {migration.name}")
+            return 0
+
+        applied = migrate(conn)
+        print(f"Schema at version {current_version(conn)} (applied: {applied or 'none'})")
+
+        if args.check_plans:
+            from hot_queries import HOT_QUERIES
+
+            failures = check_query_plans(conn, HOT_QUERIES)
+            for name, plan in failures.items():
+                print(f"FAIL {name}: {' | '.join(plan)}")
+            if failures:
+                return 1
+            print(f"OK   {len(HOT_QUERIES)} hot queries use indexes")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
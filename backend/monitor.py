@@ -0,0 +1,201 @@
+"""Scheduled expiry / low-stock monitor with set-based alert generation.
+
+Each run works in one write transaction:
+
+1. One INSERT ... SELECT ... ON CONFLICT over the expiry_day and quantity
+   indexes opens an alert for every batch that is expired, expiring within
+   the window, out of stock or low. It refreshes open alerts whose severity
+   or message changed and leaves unchanged ones alone.
+2. One UPDATE resolves open alerts whose condition no longer holds.
+
+Open alerts are unique per (inventory row, type) through a partial unique
+index, so repeated runs never duplicate them.
+"""
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import date, datetime
+from typing import Optional, Tuple
+
+from aggregates import SUMMARY_LOW_STOCK_THRESHOLD
+
+EXPIRY_WINDOW_DAYS = 30
+CRITICAL_STOCK = 10
+URGENT_EXPIRY_DAYS = 7
+
+_EPOCH = date(1970, 1, 1)
+
+_SEVERITY_RANK = "CASE severity WHEN 'critical' THEN 0 WHEN 'high' THEN 1 WHEN 'medium' THEN 2 ELSE 3 END"
+
+# Both halves read through an index (expiry_day, quantity). The trailing
+# WHERE true keeps the upsert parser unambiguous.
+UPSERT_ALERTS_SQL = """
+    INSERT INTO alerts
+        (inventory_id, location, drug_name, batch_id, type, severity, message, first_seen, last_changed)
+    SELECT id, location, drug_name, batch_id, type, severity, message, :now, :now
+    FROM (
+        SELECT id, location, drug_name, batch_id,
+            CASE WHEN expiry_day <= :today THEN 'expired' ELSE 'expiring' END AS type,
+            CASE
+                WHEN expiry_day <= :today THEN 'critical'
+                WHEN expiry_day - :today <= :urgent_days THEN 'high'
+                ELSE 'medium'
+            END AS severity,
+            CASE
+                WHEN expiry_day <= :today THEN
+                    drug_name || ' (Batch: ' || COALESCE(batch_id, 'n/a') || ') at ' || location || ' has expired'
+                ELSE
+                    drug_name || ' (Batch: ' || COALESCE(batch_id, 'n/a') || ') at ' || location
+                    || ' will expire in ' || (expiry_day - :today) || ' days'
+            END AS message
+        FROM inventory
+        WHERE expiry_day <= :today + :window_days
+        UNION ALL
+        SELECT id, location, drug_name, batch_id,
+            CASE WHEN quantity = 0 THEN 'out_of_stock' ELSE 'low_stock' END,
+            CASE WHEN quantity = 0 THEN 'critical' WHEN quantity < :critical_stock THEN 'high' ELSE 'medium' END,
+            drug_name || ' at ' || location || ' is '
+                || CASE WHEN quantity = 0 THEN 'out of stock' ELSE 'running low' END
+                || ' (' || quantity || ' units remaining)'
+        FROM inventory
+        WHERE quantity < :threshold
+    )
+    WHERE true
+    ON CONFLICT(inventory_id, type) WHERE is_resolved = 0 DO UPDATE SET
+        severity = excluded.severity,
+        message = excluded.message,
+        last_changed = excluded.last_changed
+    WHERE alerts.severity != excluded.severity OR alerts.message != excluded.message
+    RETURNING location, first_seen = :now
+"""
+
+RESOLVE_ALERTS_SQL = """
+    UPDATE alerts SET is_resolved = 1, resolved_at = :now, last_changed = :now
+    WHERE is_resolved = 0 AND NOT EXISTS (
+        SELECT 1 FROM inventory i
+        WHERE i.id = alerts.inventory_id AND CASE alerts.type
+            WHEN 'expired' THEN i.expiry_day <= :today
+            WHEN 'expiring' THEN i.expiry_day > :today AND i.expiry_day <= :today + :window_days
+            WHEN 'out_of_stock' THEN i.quantity = 0
+            WHEN 'low_stock' THEN i.quantity > 0 AND i.quantity < :threshold
+        END
+    )
+    RETURNING location
+"""
+
+
+def alerts_query(
+    location: Optional[str] = None, severity: Optional[str] = None, limit: int = 100
+) -> Tuple[str, list]:
+    query = """
+        SELECT id, inventory_id, location, drug_name, batch_id, type, severity, message, first_seen, last_changed
+        FROM alerts WHERE is_resolved = 0
+    """
+    params: list = []
+    if location:
+        query += " AND location = ?"
+        params.append(location)
+    if severity:
+        query += " AND severity = ?"
+        params.append(severity)
+    query += f" ORDER BY {_SEVERITY_RANK}, first_seen DESC LIMIT ?"
+    params.append(limit)
+    return query, params
+
+
+def read_alerts(
+    conn: sqlite3.Connection,
+    location: Optional[str] = None,
+    severity: Optional[str] = None,
+    limit: int = 100,
+) -> dict:
+    """Open alerts, most severe first."""
+
+    alerts = [
+        {
+            "id": row[0],
+            "inventoryId": row[1],
+            "location": row[2],
+            "drugName": row[3],
+            "batchId": row[4],
+            "type": row[5],
+            "severity": row[6],
+            "message": row[7],
+            "firstSeen": row[8],
+            "lastChanged": row[9],
+        }
+        for row in conn.execute(*alerts_query(location, severity, limit))
+    ]
+    counts = dict(conn.execute(
+        "SELECT severity, COUNT(*) FROM alerts WHERE is_resolved = 0"
+        + (" AND location = ?" if location else "")
+        + " GROUP BY severity",
+        [location] if location else [],
+    ).fetchall())
+    return {"alerts": alerts, "count": len(alerts), "openBySeverity": counts}
+
+
+class InventoryMonitor:
+    """Runs the alert statements and keeps timing for recent runs."""
+
+    def __init__(self, interval: float = 300.0, threshold: int = SUMMARY_LOW_STOCK_THRESHOLD,
+                 window_days: int = EXPIRY_WINDOW_DAYS):
+        self.interval = interval
+        self.threshold = threshold
+        self.window_days = window_days
+        self.runs = 0
+        self.last_run: Optional[dict] = None
+        self._durations = deque(maxlen=100)
+        self._lock = threading.Lock()
+
+    def run(self, conn: sqlite3.Connection) -> dict:
+        """One monitoring pass; returns counts, timing and touched locations."""
+        started = time.perf_counter()
+        now = datetime.now()
+        params = {
+            "now": now,
+            "today": (date.today() - _EPOCH).days,
+            "window_days": self.window_days,
+            "urgent_days": URGENT_EXPIRY_DAYS,
+            "threshold": self.threshold,
+            "critical_stock": CRITICAL_STOCK,
+        }
+        # Runs are serialised; a second caller waits instead of racing the first
+        with self._lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                upserted = conn.execute(UPSERT_ALERTS_SQL, params).fetchall()
+                resolved = conn.execute(RESOLVE_ALERTS_SQL, params).fetchall()
+                open_count = conn.execute("SELECT COUNT(*) FROM alerts WHERE is_resolved = 0").fetchone()[0]
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+            duration = time.perf_counter() - started
+            self._durations.append(duration)
+            self.runs += 1
+            opened = sum(1 for row in upserted if row[1])
+            self.last_run = {
+                "startedAt": now.isoformat(),
+                "durationMs": round(duration * 1000, 2),
+                "opened": opened,
+                "updated": len(upserted) - opened,
+                "resolved": len(resolved),
+                "open": open_count,
+            }
+            touched = {row[0] for row in upserted} | {row[0] for row in resolved}
+            return {**self.last_run, "locations": sorted(touched)}
+
+    def stats(self) -> dict:
+        durations = sorted(self._durations)
+        return {
+            "runs": self.runs,
+            "intervalSeconds": self.interval,
+            "lastRun": self.last_run,
+            "durationMs": {
+                "p50": round(durations[len(durations) // 2] * 1000, 2) if durations else None,
+                "max": round(durations[-1] * 1000, 2) if durations else None,
+            },
+        }
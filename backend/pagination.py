@@ -0,0 +1,183 @@
+"""Keyset pagination, field projection and streaming for inventory listings.
+
+Pages are ordered by (location, drug_name), which is exactly the UNIQUE
+index on inventory, so fetching any page is an index range seek no matter
+how deep into the listing it is.
+"""
+import base64
+import json
+import sqlite3
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+from database import ConnectionPool
+from serialization import dumps
+
+# API field name -> column. Fields listed in NULLABLE_FIELDS are reported as
+# "N/A" when missing, matching the original response shape.
+FIELD_COLUMNS = {
+    "name": "drug_name",
+    "quantity": "quantity",
+    "batchId": "batch_id",
+    "expiryDate": "expiry_date",
+    "manufacturer": "manufacturer",
+    "lastUpdated": "last_updated",
+}
+NULLABLE_FIELDS = {"batchId", "expiryDate", "manufacturer"}
+DEFAULT_FIELDS = list(FIELD_COLUMNS)
+
+STREAM_CHUNK_SIZE = 1000
+
+
+class InvalidPageRequest(ValueError):
+    pass
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    if not fields:
+        return DEFAULT_FIELDS
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in FIELD_COLUMNS]
+    if unknown:
+        raise InvalidPageRequest(
+            f"Unknown field(s): {', '.join(unknown)}; expected any of {', '.join(FIELD_COLUMNS)}"
+        )
+    return requested
+
+
+def encode_cursor(location: str, drug_name: str) -> str:
+    raw = json.dumps([location, drug_name], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[str, str]]:
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        location, drug_name = json.loads(raw)
+        return str(location), str(drug_name)
+    except (ValueError, TypeError):
+        raise InvalidPageRequest("Invalid cursor")
+
+
+def shape_row(fields: List[str], values) -> dict:
+    drug = {}
+    for name, value in zip(fields, values):
+        drug[name] = (value or "N/A") if name in NULLABLE_FIELDS else value
+    return drug
+
+
+def columnar_page(fields: List[str], rows: List[tuple], with_location: bool = True) -> dict:
+    """fetch_page rows as one columnar block; drug_name appears only as "name".
+
+    Pages read for a single location leave out the location column, which
+    would only repeat the requested value once per row.
+    """
+    columns = list(zip(*rows)) if rows else [()] * (len(fields) + 2)
+    if not with_location:
+        return {"columns": list(fields), "data": columns[2:]}
+    return {"columns": ["location", *fields], "data": [columns[0], *columns[2:]]}
+
+
+def page_query(
+    fields: List[str],
+    limit: Optional[int],
+    after: Optional[Tuple[str, str]] = None,
+    location: Optional[str] = None,
+) -> Tuple[str, list]:
+    """SQL and parameters for one page; see fetch_page."""
+    columns = ", ".join(FIELD_COLUMNS[name] for name in fields)
+    query = f"SELECT location, drug_name{', ' + columns if columns else ''} FROM inventory"
+    conditions, params = [], []
+
+    if location is not None:
+        conditions.append("location = ?")
+        params.append(location)
+    if after is not None:
+        if location is not None:
+            conditions.append("drug_name > ?")
+            params.append(after[1])
+        else:
+            conditions.append("(location, drug_name) > (?, ?)")
+            params.extend(after)
+
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY location, drug_name"
+    if limit is not None:
+        # Fetch one extra row to learn whether another page exists
+        query += " LIMIT ?"
+        params.append(limit + 1)
+    return query, params
+
+
+def fetch_page(
+    conn: sqlite3.Connection,
+    fields: List[str],
+    limit: Optional[int],
+    after: Optional[Tuple[str, str]] = None,
+    location: Optional[str] = None,
+) -> Tuple[List[tuple], Optional[str]]:
+    """Return rows of (location, drug_name, *fields) plus the next cursor."""
+    rows = conn.execute(*page_query(fields, limit, after, location)).fetchall()
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][0], rows[-1][1])
+    return rows, next_cursor
+
+
+def _iter_pages(pool: ConnectionPool, fields: List[str], location: Optional[str]) -> Iterator[List[tuple]]:
+    # Each chunk takes its own pooled connection, so a slow client never pins
+    # a connection or an open read transaction for the length of the download.
+    after = None
+    while True:
+        with pool.connection() as conn:
+            rows, next_cursor = fetch_page(conn, fields, STREAM_CHUNK_SIZE, after=after, location=location)
+        if rows:
+            yield rows
+        if next_cursor is None:
+            return
+        after = decode_cursor(next_cursor)
+
+
+def stream_all_inventory(pool: ConnectionPool, fields: List[str]) -> Iterator[bytes]:
+    """Yield the /inventory/all document incrementally, chunk by chunk."""
+    yield b'{"locations":{'
+    current = None
+    location_count = 0
+    first_drug = True
+    for rows in _iter_pages(pool, fields, None):
+        parts = []
+        for row in rows:
+            if row[0] != current:
+                if current is not None:
+                    parts.append(b"],")
+                current = row[0]
+                location_count += 1
+                parts.append(dumps(current) + b":[")
+                first_drug = True
+            if not first_drug:
+                parts.append(b",")
+            parts.append(dumps(shape_row(fields, row[2:])))
+            first_drug = False
+        yield b"".join(parts)
+    tail = "]" if current is not None else ""
+    yield (
+        f'{tail}}},"totalLocations":{location_count},'
+        f'"lastSync":{json.dumps(datetime.now().isoformat())}}}'
+    ).encode()
+
+
+def stream_location_inventory(pool: ConnectionPool, fields: List[str], location: str) -> Iterator[bytes]:
+    """Yield the /inventory/{location} document incrementally."""
+    yield b'{"location":' + dumps(location) + b',"drugs":['
+    total = 0
+    for rows in _iter_pages(pool, fields, location):
+        chunk = b",".join(dumps(shape_row(fields, row[2:])) for row in rows)
+        yield (b"," if total else b"") + chunk
+        total += len(rows)
+    yield (
+        f'],"totalItems":{total},"lastSync":{json.dumps(datetime.now().isoformat())}}}'
+    ).encode()
@@ -0,0 +1,140 @@
+"""Opt-in sampling profiler for individual requests.
+
+With PROFILING_ENABLED=1, a request sent with an ``X-Profile: 1`` header is
+sampled while it runs. A background thread reads every thread's stack
+through sys._current_frames() once per interval. It folds the stacks into
+"thread;module:function;... count" lines, the input format for
+flamegraph.pl and speedscope. The response carries an X-Profile-Id header,
+and /debug/profiles/{id} serves the result.
+
+One request is profiled at a time; while it runs, other requests in flight
+show up in the samples too. Threads parked in a wait are left out.
+"""
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Optional
+
+# Leaf frames of threads that are idle rather than working
+IDLE_LEAVES = {
+    ("threading", "wait"),
+    ("threading", "_wait_for_tstate_lock"),
+    ("selectors", "select"),
+    ("queue", "get"),
+}
+
+
+def _frame_name(frame) -> tuple:
+    module = os.path.splitext(os.path.basename(frame.f_code.co_filename))[0]
+    return module, frame.f_code.co_name
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.001, max_profiles: int = 20, max_seconds: float = 30.0):
+        self.interval = interval
+        self.max_profiles = max_profiles
+        self.max_seconds = max_seconds
+        self._busy = threading.Lock()
+        self._profiles: "OrderedDict[str, dict]" = OrderedDict()
+        self._stop: Optional[threading.Event] = None
+        self._thread: Optional[threading.Thread] = None
+        self._samples: Counter = Counter()
+        self._sample_count = 0
+
+    def start(self) -> bool:
+        """Begin sampling; False if another request is being profiled."""
+        if not self._busy.acquire(blocking=False):
+            return False
+        self._samples = Counter()
+        self._sample_count = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            self._sample_count += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == own or _frame_name(frame) in IDLE_LEAVES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append("%s:%s" % _frame_name(frame))
+                    frame = frame.f_back
+                if ident not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack.append(names.get(ident, str(ident)))
+                self._samples[";".join(reversed(stack))] += 1
+
+    def stop(self, method: str, path: str, duration: float) -> str:
+        """Finish sampling and store the profile; returns its id."""
+        self._stop.set()
+        self._thread.join()
+        profile_id = secrets.token_hex(6)
+        self._profiles[profile_id] = {
+            "id": profile_id,
+            "method": method,
+            "path": path,
+            "durationMs": round(duration * 1000, 2),
+            "intervalMs": self.interval * 1000,
+            "samples": self._sample_count,
+            "stacks": self._samples.most_common(),
+            "takenAt": datetime.now().isoformat(),
+        }
+        while len(self._profiles) > self.max_profiles:
+            self._profiles.popitem(last=False)
+        self._busy.release()
+        return profile_id
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        return self._profiles.get(profile_id)
+
+    def list(self) -> list:
+        return [
+            {key: profile[key] for key in ("id", "method", "path", "durationMs", "samples", "takenAt")}
+            for profile in reversed(self._profiles.values())
+        ]
+
+
+def folded(profile: dict) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in profile["stacks"])
+
+
+class ProfilingMiddleware:
+    """Profile requests that ask for it with an ``X-Profile: 1`` header."""
+
+    def __init__(self, app, profiler: SamplingProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (b"x-profile", b"1") not in scope["headers"]:
+            return await self.app(scope, receive, send)
+        if not self.profiler.start():
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        stopped = False
+
+        async def send_wrapper(message):
+            nonlocal stopped
+            if message["type"] == "http.response.start" and not stopped:
+                # Sampling covers the handler up to the response start; the
+                # body of a streamed response is not included.
+                stopped = True
+                profile_id = self.profiler.stop(scope["method"], scope["path"], time.perf_counter() - started)
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if not stopped:
+                self.profiler.stop(scope["method"], scope["path"], time.perf_counter() - started)
@@ -0,0 +1,217 @@
+"""Set-based reorder planning.
+
+A single query finds every (location, drug) pair that is below threshold
+once inbound deliveries are counted, skips pairs that already have a
+pending order, and sizes each order from current stock, inbound quantity
+and the latest demand prediction. Orders are then written with one
+INSERT ... SELECT over the plan.
+"""
+import json
+import sqlite3
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import search
+
+# Orders in these states have been placed but not yet received into stock
+INBOUND_STATUSES = ("approved", "shipped", "in_transit")
+MIN_ORDER_QUANTITY = 500
+DEFAULT_LEAD_TIME_DAYS = 5
+
+_INBOUND_SQL = ", ".join(f"'{status}'" for status in INBOUND_STATUSES)
+
+# Target stock after delivery: predicted demand plus the threshold as safety
+# stock, and never less than twice the threshold (the previous fixed rule).
+PLAN_SQL = f"""
+    WITH candidates AS (
+        SELECT
+            i.location,
+            i.drug_name,
+            i.quantity,
+            i.manufacturer,
+            COALESCE((
+                SELECT SUM(r.quantity) FROM reorders r
+                WHERE r.location = i.location AND r.drug_name = i.drug_name
+                  AND r.status IN ({_INBOUND_SQL})
+            ), 0) AS inbound,
+            COALESCE((
+                SELECT p.predicted_demand FROM demand_predictions p
+                WHERE p.location = i.location AND p.drug_name = i.drug_name
+                ORDER BY p.id DESC LIMIT 1
+            ), 0) AS predicted_demand
+        FROM inventory i
+        WHERE i.quantity < :threshold
+          {{filters}}
+          AND NOT EXISTS (
+              SELECT 1 FROM reorders r
+              WHERE r.status = 'pending' AND r.location = i.location AND r.drug_name = i.drug_name
+          )
+    )
+    SELECT
+        location,
+        drug_name,
+        quantity,
+        manufacturer,
+        inbound,
+        predicted_demand,
+        MAX(
+            :min_order,
+            MAX(predicted_demand + :threshold, :threshold * 2) - quantity - inbound
+        ) AS order_quantity
+    FROM candidates
+    WHERE quantity + inbound < :threshold
+    ORDER BY location, drug_name
+"""
+
+
+class UnknownDrugNames(ValueError):
+    """Requested drug names that match nothing stored in inventory."""
+
+    def __init__(self, suggestions: Dict[str, List[str]]):
+        # {requested name: closest stored names}, for the caller to pick from
+        self.suggestions = suggestions
+        super().__init__("No inventory drug matches " + ", ".join(repr(name) for name in suggestions))
+
+
+class AmbiguousDrugNames(ValueError):
+    """Requested drug names that match more than one drug stored in inventory."""
+
+    def __init__(self, matches: Dict[str, List[str]]):
+        # {requested name: every stored name it matched}
+        self.matches = matches
+        super().__init__("More than one inventory drug matches " + ", ".join(repr(name) for name in matches))
+
+
+def resolve_drug_names(
+    conn: sqlite3.Connection, names: Iterable[str], fuzzy: bool = False, single: bool = False
+) -> List[str]:
+    """Map user-supplied drug names to the exact names stored in inventory.
+
+    Exact matches win; otherwise the name is resolved through the trigram
+    drug-name index as a substring. Typo-tolerant matching is opt-in
+    (``fuzzy``) and meant for dry runs only: a missing strength such as
+    "Paracetamol 650mg" is close enough to resolve to "Paracetamol 500mg".
+
+    Raises UnknownDrugNames, carrying fuzzy suggestions, for any name that
+    still matches nothing. With ``single`` (write paths), a name matching
+    more than one drug raises AmbiguousDrugNames instead of expanding.
+    """
+    resolved = []
+    unmatched = {}
+    ambiguous = {}
+    for name in names:
+        exact = conn.execute(
+            "SELECT drug_name FROM inventory_drug_stats WHERE drug_name = ?", (name,)
+        ).fetchone()
+        if exact:
+            resolved.append(exact[0])
+            continue
+        matches = search.match_drug_names(conn, name, fuzzy=fuzzy)
+        if single and len(matches) > 1:
+            ambiguous[name] = sorted(matches)
+        elif matches:
+            resolved.extend(matches)
+        else:
+            unmatched[name] = [match for match, _ in search.fuzzy_drug_names(conn, name, limit=5)]
+    if unmatched:
+        raise UnknownDrugNames(unmatched)
+    if ambiguous:
+        raise AmbiguousDrugNames(ambiguous)
+    return sorted(set(resolved))
+
+
+def plan_query(
+    threshold: int,
+    drug_names: Optional[List[str]] = None,
+    location: Optional[str] = None,
+    min_order: int = MIN_ORDER_QUANTITY,
+) -> Tuple[str, dict]:
+    filters = []
+    params = {"threshold": threshold, "min_order": min_order}
+    if drug_names is not None:
+        filters.append("AND i.drug_name IN (SELECT value FROM json_each(:drug_names))")
+        params["drug_names"] = json.dumps(drug_names)
+    if location:
+        filters.append("AND i.location = :location")
+        params["location"] = location
+    return PLAN_SQL.format(filters="\n          ".join(filters)), params
+
+
+def plan_reorders(
+    conn: sqlite3.Connection,
+    threshold: int,
+    drug_names: Optional[List[str]] = None,
+    location: Optional[str] = None,
+    min_order: int = MIN_ORDER_QUANTITY,
+) -> List[dict]:
+    """Compute the reorders that would be placed, without writing anything.
+
+    ``drug_names=None`` plans across every drug in the network.
+    """
+    rows = conn.execute(*plan_query(threshold, drug_names, location, min_order)).fetchall()
+    return shape_plan(rows)
+
+
+def shape_plan(rows: List[tuple]) -> List[dict]:
+    """PLAN_SQL rows as plan entries."""
+    return [
+        {
+            "location": row[0],
+            "drugName": row[1],
+            "currentStock": row[2],
+            "supplier": row[3],
+            "inboundQuantity": row[4],
+            "predictedDemand": row[5],
+            "orderQuantity": row[6],
+        }
+        for row in rows
+    ]
+
+
+def create_reorders(
+    conn: sqlite3.Connection,
+    plan: List[dict],
+    lead_time_days: int = DEFAULT_LEAD_TIME_DAYS,
+) -> List[dict]:
+    """Insert a computed plan in one statement and return it with order ids.
+
+    The caller is expected to hold a write transaction (BEGIN IMMEDIATE)
+    spanning both planning and insertion so the pending-order check holds.
+    """
+    if not plan:
+        return []
+    expected_delivery = expected_delivery_date(lead_time_days)
+    inserted = conn.execute(
+        """
+        INSERT INTO reorders (drug_name, quantity, location, expected_delivery, supplier)
+        SELECT
+            json_extract(value, '$.drugName'),
+            json_extract(value, '$.orderQuantity'),
+            json_extract(value, '$.location'),
+            ?,
+            json_extract(value, '$.supplier')
+        FROM json_each(?)
+        RETURNING id, location, drug_name
+        """,
+        (expected_delivery, json.dumps(plan)),
+    ).fetchall()
+
+    return confirm_orders(plan, inserted, expected_delivery)
+
+
+def expected_delivery_date(lead_time_days: int) -> str:
+    return (date.today() + timedelta(days=lead_time_days)).strftime('%Y-%m-%d')
+
+
+def confirm_orders(plan: List[dict], inserted: List[tuple], expected_delivery: str) -> List[dict]:
+    """Plan entries with the order ids of their inserted (id, location, drug_name) rows."""
+    ids = {(row[1], row[2]): row[0] for row in inserted}
+    order_prefix = f"MED-{date.today().strftime('%Y%m%d')}"
+    return [
+        {
+            **item,
+            "expectedDelivery": expected_delivery,
+            "orderId": f"{order_prefix}-{ids[(item['location'], item['drugName'])]}",
+        }
+        for item in plan
+    ]
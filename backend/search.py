@@ -0,0 +1,175 @@
+"""Trigram full-text search over inventory.
+
+Two FTS5 indexes use the trigram tokenizer:
+
+* inventory_fts   - one entry per inventory row over drug name, manufacturer
+                    and batch ID; answers substring and prefix queries.
+* drug_names_fts  - one entry per distinct drug name (backed by
+                    inventory_drug_stats); used for typo-tolerant matching,
+                    so fuzzy queries search the small name vocabulary instead
+                    of every inventory row.
+
+Both are external-content tables kept in sync by triggers.
+"""
+import difflib
+import json
+import sqlite3
+from typing import List, Optional
+
+MIN_TRIGRAM_QUERY = 3
+FUZZY_CANDIDATES = 50
+FUZZY_MIN_SIMILARITY = 0.5
+
+def escape_like(text: str) -> str:
+    """Escape LIKE wildcards so user input only ever matches literally.
+
+    SQLite needs ``ESCAPE '\\'`` on the LIKE; backslash is PostgreSQL's default.
+    """
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def trigrams(text: str) -> List[str]:
+    text = " ".join(text.lower().split())
+    grams = {text[i:i + 3] for i in range(len(text) - 2)}
+    return sorted(gram for gram in grams if gram.strip() and len(gram.strip()) == 3)
+
+
+def _similarity(query: str, name: str) -> float:
+    query, name = query.lower(), name.lower()
+    score = difflib.SequenceMatcher(None, query, name).ratio()
+    # Partial queries ("amoxi") should still score well against the full name
+    prefix = difflib.SequenceMatcher(None, query, name[:len(query)]).ratio()
+    return max(score, prefix * 0.95)
+
+
+def fuzzy_drug_names(conn: sqlite3.Connection, query: str, limit: int = 10) -> List[tuple]:
+    """Return [(drug_name, similarity)] for names that resemble ``query``.
+
+    Candidates share at least one trigram with the query and are re-ranked
+    by edit similarity, which tolerates typos and transpositions.
+    """
+    grams = trigrams(query)
+    if not grams:
+        return []
+    candidates = conn.execute(
+        "SELECT drug_name FROM drug_names_fts WHERE drug_names_fts MATCH ? ORDER BY rank LIMIT ?",
+        (" OR ".join(_quote(gram) for gram in grams), FUZZY_CANDIDATES),
+    ).fetchall()
+    return rank_fuzzy(query, [row[0] for row in candidates], limit)
+
+
+def rank_fuzzy(query: str, candidates: List[str], limit: int = 10) -> List[tuple]:
+    """Score candidate names against ``query``, best first, dropping weak matches."""
+    scored = [(name, _similarity(query, name)) for name in candidates]
+    scored = [item for item in scored if item[1] >= FUZZY_MIN_SIMILARITY]
+    scored.sort(key=lambda item: -item[1])
+    return scored[:limit]
+
+
+def match_drug_names(conn: sqlite3.Connection, query: str, fuzzy: bool = True) -> List[str]:
+    """Resolve a free-text drug name to stored names (substring, then fuzzy)."""
+    query = query.strip()
+    if len(query) < MIN_TRIGRAM_QUERY:
+        rows = conn.execute(
+            "SELECT drug_name FROM inventory_drug_stats WHERE drug_name LIKE ? ESCAPE '\\'",
+            (f"{escape_like(query)}%",),
+        ).fetchall()
+        return [row[0] for row in rows]
+    rows = conn.execute(
+        "SELECT drug_name FROM drug_names_fts WHERE drug_names_fts MATCH ?", (_quote(query),)
+    ).fetchall()
+    if rows or not fuzzy:
+        return [row[0] for row in rows]
+    return [name for name, _ in fuzzy_drug_names(conn, query, limit=1)]
+
+
+_RESULT_COLUMNS = """
+    i.location, i.drug_name, i.quantity, i.batch_id, i.expiry_date, i.manufacturer
+"""
+
+
+def shape_result(row, score: float, match: str) -> dict:
+    return {
+        "location": row[0],
+        "name": row[1],
+        "quantity": row[2],
+        "batchId": row[3],
+        "expiryDate": row[4],
+        "manufacturer": row[5],
+        "score": round(score, 4),
+        "match": match,
+    }
+
+
+def search_inventory(
+    conn: sqlite3.Connection,
+    query: str,
+    limit: int = 20,
+    location: Optional[str] = None,
+    fuzzy: bool = True,
+) -> dict:
+    query = query.strip()
+    location_filter = " AND i.location = ?" if location else ""
+    location_params = [location] if location else []
+
+    results = []
+    mode = "substring"
+    if len(query) >= MIN_TRIGRAM_QUERY:
+        # bm25() is negative (more negative = better). Within the page, rows
+        # whose drug name starts with the query are listed first.
+        rows = conn.execute(
+            f"""
+            SELECT {_RESULT_COLUMNS}, bm25(inventory_fts, 10.0, 2.0, 5.0) AS score
+            FROM inventory_fts
+            JOIN inventory i ON i.id = inventory_fts.rowid
+            WHERE inventory_fts MATCH ?{location_filter}
+            ORDER BY score
+            LIMIT ?
+            """,
+            [_quote(query), *location_params, limit],
+        ).fetchall()
+        lowered = query.lower()
+        results = [
+            shape_result(row, -row[6], "prefix" if row[1].lower().startswith(lowered) else "substring")
+            for row in rows
+        ]
+        results.sort(key=lambda item: item["match"] != "prefix")
+    else:
+        mode = "prefix"
+        rows = conn.execute(
+            f"""
+            SELECT {_RESULT_COLUMNS}
+            FROM inventory_drug_stats s
+            JOIN inventory i ON i.drug_name = s.drug_name
+            WHERE s.drug_name LIKE ? ESCAPE '\\'{location_filter}
+            ORDER BY i.drug_name, i.location
+            LIMIT ?
+            """,
+            [f"{escape_like(query)}%", *location_params, limit],
+        ).fetchall()
+        results = [shape_result(row, 1.0, "prefix") for row in rows]
+
+    if not results and fuzzy and len(query) >= MIN_TRIGRAM_QUERY:
+        mode = "fuzzy"
+        names = fuzzy_drug_names(conn, query)
+        if names:
+            similarity = dict(names)
+            rows = conn.execute(
+                f"""
+                SELECT {_RESULT_COLUMNS}
+                FROM inventory i
+                WHERE i.drug_name IN (SELECT value FROM json_each(?)){location_filter}
+                LIMIT ?
+                """,
+                [json.dumps(list(similarity)), *location_params, limit],
+            ).fetchall()
+            results = sorted(
+                (shape_result(row, similarity[row[1]], "fuzzy") for row in rows),
+                key=lambda item: -item["score"],
+            )
+
+    return {"query": query, "mode": mode, "results": results, "count": len(results)}
@@ -0,0 +1,62 @@
+"""JSON encoding for the inventory listings.
+
+Responses are encoded straight to bytes with orjson and returned as a plain
+Response, so FastAPI's jsonable_encoder never walks them. If orjson is
+missing, the standard library encoder is used with the same output shape.
+
+Listings can also be sent in a columnar shape (``format=columnar``). Each
+list of row objects is replaced by the column names, sent once, and one
+array of values per column:
+
+    {"columns": ["location", "name", ...], "data": [["A", "B"], ["x", "y"], ...]}
+
+The arrays come from zip(*rows) on the database tuples, so no per-row dict
+is built. Missing values stay null rather than "N/A".
+"""
+import json
+import time
+from typing import List, Sequence
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+
+from metrics import add_phase
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+FORMATS = ("rows", "columnar")
+FORMAT_PATTERN = f"^({'|'.join(FORMATS)})$"
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(body) -> bytes:
+        # Anything orjson cannot encode natively (pydantic models, sets,
+        # Decimal) goes through jsonable_encoder, one value at a time
+        return orjson.dumps(body, default=jsonable_encoder, option=_OPTIONS)
+else:
+    def dumps(body) -> bytes:
+        return json.dumps(jsonable_encoder(body), separators=(",", ":")).encode()
+
+
+def encode(body) -> bytes:
+    """``dumps`` timed into the request's encode phase."""
+    started = time.perf_counter()
+    encoded = dumps(body)
+    add_phase("encode", time.perf_counter() - started)
+    return encoded
+
+
+def json_response(body) -> Response:
+    return Response(content=encode(body), media_type="application/json")
+
+
+def table(keys: Sequence[str], rows: List[tuple], columnar: bool = False):
+    """Row tuples as a list of objects, or as one columnar block."""
+    if columnar:
+        return {"columns": list(keys), "data": list(zip(*rows)) if rows else [[] for _ in keys]}
+    return [dict(zip(keys, row)) for row in rows]
+
@@ -0,0 +1,105 @@
+"""Shared fixtures for the backend tests.
+
+Run from backend/:
+
+    pip install -r requirements-dev.txt
+    python -m pytest
+
+Module tests get a migrated SQLite database in a temp directory. Endpoint
+tests import main against their own database through ``make_client``.
+"""
+import importlib
+import json
+import sqlite3
+import sys
+from datetime import date, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from migrations import migrate
+from repository import seed_missing
+
+
+def days_from_today(days: int) -> str:
+    return (date.today() + timedelta(days=days)).isoformat()
+
+
+# Expiry dates are relative to today so the expiry windows in the tests do
+# not drift with the calendar (main.SAMPLE_INVENTORY uses fixed dates).
+INVENTORY = [
+    ("Central Hospital", "Paracetamol 500mg", 1250, "PC-2024-001", days_from_today(200), "PharmaCorp Ltd"),
+    ("Central Hospital", "Amoxicillin 250mg", 40, "ML-2024-045", days_from_today(20), "MediLab Inc"),
+    ("Rural Clinic A", "Paracetamol 500mg", 30, "PC-2024-002", days_from_today(120), "PharmaCorp Ltd"),
+    ("Rural Clinic A", "Aspirin 325mg", 8, "GP-2024-089", days_from_today(-5), "Global Pharma"),
+    ("City Pharmacy", "Ibuprofen 400mg", 75, "HT-2024-128", days_from_today(10), "HealthTech Solutions"),
+    ("City Pharmacy", "Aspirin 325mg", 20, "GP-2024-090", days_from_today(60), "Global Pharma"),
+]
+
+
+def inventory_ndjson(rows=INVENTORY) -> bytes:
+    keys = ("location", "drugName", "quantity", "batchId", "expiryDate", "manufacturer")
+    return "\n".join(json.dumps(dict(zip(keys, row))) for row in rows).encode()
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "medchain.db")
+
+
+@pytest.fixture
+def conn(db_path):
+    """A migrated, empty database."""
+    conn = sqlite3.connect(db_path)
+    migrate(conn)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def stocked(conn):
+    """``conn`` with INVENTORY loaded through the ledger."""
+    seed_missing(conn, INVENTORY)
+    return conn
+
+
+@pytest.fixture
+def make_client(tmp_path, monkeypatch):
+    """Import main against a fresh database and return a started TestClient.
+
+    main reads its settings at import time, so the module is re-imported for
+    every client. Extra keyword arguments are set as environment variables.
+    """
+    clients = []
+
+    def make(database_url=None, **env):
+        settings = {
+            "DATABASE_URL": database_url or f"sqlite:///{tmp_path / 'app.db'}",
+            "GEMINI_API_KEY": "",
+            "SEED_SAMPLE_DATA": "0",
+            "WEB_CONCURRENCY": "1",
+            **env,
+        }
+        for name, value in settings.items():
+            monkeypatch.setenv(name, str(value))
+        sys.modules.pop("main", None)
+        main = importlib.import_module("main")
+        client = TestClient(main.app)
+        client.__enter__()
+        clients.append(client)
+        client.main = main
+        return client
+
+    yield make
+    for client in reversed(clients):
+        client.__exit__(None, None, None)
+    sys.modules.pop("main", None)
+
+
+@pytest.fixture
+def client(make_client):
+    """App on SQLite with INVENTORY uploaded through /inventory/bulk."""
+    client = make_client()
+    response = client.post("/inventory/bulk?format=ndjson", content=inventory_ndjson())
+    assert response.status_code == 200, response.text
+    return client
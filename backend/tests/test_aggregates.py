@@ -0,0 +1,53 @@
+from datetime import date, timedelta
+
+import aggregates
+from conftest import INVENTORY
+
+
+def test_triggers_keep_the_summary_in_step_with_inventory(stocked):
+    stocked.execute(
+        "UPDATE inventory SET quantity = 5 WHERE location = 'Central Hospital' AND drug_name = 'Paracetamol 500mg'"
+    )
+    stocked.execute("DELETE FROM inventory WHERE location = 'City Pharmacy' AND drug_name = 'Ibuprofen 400mg'")
+    stocked.commit()
+    assert aggregates.check_consistency(stocked) == []
+
+    summary = aggregates.read_summary(stocked, expiring_before=(date.today() + timedelta(days=30)).isoformat())
+    assert summary["totalDrugs"] == len(INVENTORY) - 1
+    assert summary["totalQuantity"] == 5 + 40 + 30 + 8 + 20
+    assert summary["lowStockCount"] == 5
+    assert summary["expiringCount"] == 2
+    assert summary["topDrugs"][0] == {"name": "Amoxicillin 250mg", "quantity": 40}
+    assert {row["name"]: row["drugTypes"] for row in summary["locations"]} == {
+        "Central Hospital": 2, "Rural Clinic A": 2, "City Pharmacy": 1,
+    }
+
+
+def test_check_reports_and_repair_fixes_a_corrupted_aggregate(client):
+    with client.main.db_pool.connection() as conn:
+        conn.execute("UPDATE inventory_drug_stats SET total_quantity = 1 WHERE drug_name = 'Aspirin 325mg'")
+        conn.execute("DELETE FROM inventory_location_stats WHERE location = 'City Pharmacy'")
+        conn.commit()
+
+    assert client.get("/inventory/summary").json()["topDrugs"][-1]["name"] == "Aspirin 325mg"
+
+    check = client.get("/inventory/summary/check").json()
+    assert not check["consistent"]
+    assert {(m["table"], m["key"]) for m in check["mismatches"]} == {
+        ("inventory_drug_stats", "Aspirin 325mg"),
+        ("inventory_location_stats", "City Pharmacy"),
+    }
+    # GET only reports; the same mismatches are still there
+    assert client.get("/inventory/summary/check").json()["mismatchCount"] == 2
+    assert client.get("/inventory/summary/check?repair=true").json()["mismatchCount"] == 2
+
+    repair = client.post("/inventory/summary/repair").json()
+    assert repair["repaired"]
+    assert repair["mismatchCount"] == 2
+    assert client.get("/inventory/summary/check").json()["consistent"]
+    assert client.post("/inventory/summary/repair").json()["repaired"] is False
+
+    # The repair invalidates the cached summary
+    summary = client.get("/inventory/summary").json()
+    assert {"name": "Aspirin 325mg", "quantity": 28} in summary["topDrugs"]
+    assert "City Pharmacy" in {row["name"] for row in summary["locations"]}
@@ -0,0 +1,113 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import ai
+from ai import AIClient, AITimeout, AIUnavailable, PromptCache, prompt_key
+
+
+class FakeModel:
+    """Answers each prompt after ``delay`` seconds, or fails with ``error``."""
+
+    def __init__(self, error=None, delay=0.0):
+        self.error = error
+        self.delay = delay
+        self.prompts = []
+        self.active = 0
+        self.peak = 0
+
+    async def generate_content_async(self, prompt):
+        self.prompts.append(prompt)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.error is not None:
+                raise self.error
+            return SimpleNamespace(text=f"answer to {prompt.strip()}")
+        finally:
+            self.active -= 1
+
+
+def test_prompt_key_ignores_whitespace():
+    assert prompt_key("  How much\n   stock?  ") == prompt_key("How much stock?")
+    assert prompt_key("How much stock?") != prompt_key("How much stock")
+
+
+def test_completions_are_cached_by_prompt():
+    model = FakeModel()
+    client = AIClient(model, cache=PromptCache())
+
+    async def scenario():
+        return [await client.generate(prompt) for prompt in ("Q1", " Q1 ", "Q2")]
+
+    assert asyncio.run(scenario()) == ["answer to Q1", "answer to Q1", "answer to Q2"]
+    assert model.prompts == ["Q1", "Q2"]
+    stats = client.stats()
+    assert (stats["cacheHits"], stats["cacheMisses"], stats["upstreamCalls"]) == (1, 2, 2)
+
+
+def test_identical_prompts_in_flight_share_one_call():
+    model = FakeModel(delay=0.05)
+    client = AIClient(model, cache=PromptCache())
+
+    async def scenario():
+        return await asyncio.gather(*(client.generate("Q") for _ in range(5)))
+
+    assert asyncio.run(scenario()) == ["answer to Q"] * 5
+    assert len(model.prompts) == 1
+    assert client.coalesced == 4
+
+
+def test_concurrency_is_capped():
+    model = FakeModel(delay=0.02)
+    client = AIClient(model, max_concurrency=2)
+
+    async def scenario():
+        await asyncio.gather(*(client.generate(f"Q{i}") for i in range(6)))
+
+    asyncio.run(scenario())
+    assert model.peak == 2
+
+
+def test_failures_fall_back_to_a_stale_answer(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(ai.time, "monotonic", lambda: now[0])
+    model = FakeModel()
+    outcomes = []
+    client = AIClient(model, cache=PromptCache(ttl=10, stale_ttl=60), observer=lambda outcome, _: outcomes.append(outcome))
+
+    async def ask():
+        return await client.generate("Q")
+
+    assert asyncio.run(ask()) == "answer to Q"
+    model.error = RuntimeError("quota exceeded")
+    now[0] += 30
+    assert asyncio.run(ask()) == "answer to Q"
+    assert client.stale_served == 1
+
+    now[0] += 60
+    with pytest.raises(RuntimeError, match="quota"):
+        asyncio.run(ask())
+    assert outcomes == ["ok", "error", "error"]
+
+
+def test_timeouts_and_missing_model():
+    client = AIClient(FakeModel(delay=1.0), timeout=0.01)
+    with pytest.raises(AITimeout):
+        asyncio.run(client.generate("Q"))
+    assert client.timeouts == 1 and client.stats()["inFlight"] == 0
+
+    with pytest.raises(AIUnavailable):
+        asyncio.run(AIClient().generate("Q"))
+
+
+def test_prompt_cache_evicts_least_recently_used():
+    cache = PromptCache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == ("1", None, "3")
+    assert cache.evictions == 1 and len(cache) == 2
@@ -0,0 +1,44 @@
+from batches import BatchIndex
+
+
+def test_verify_reports_each_distinct_id_in_request_order(stocked):
+    index = BatchIndex()
+    result = index.verify(stocked, ["GP-2024-089", "PC-2024-001", "NOPE-1", "PC-2024-001"])
+    assert [(r["batchId"], r["status"]) for r in result["results"]] == [
+        ("GP-2024-089", "expired"), ("PC-2024-001", "verified"), ("NOPE-1", "not_found"),
+    ]
+    assert result["counts"] == {"verified": 1, "expired": 1, "notFound": 1}
+    assert (result["queried"], result["rejectedFromIndex"]) == (2, 1)
+
+    paracetamol = result["results"][1]
+    assert (paracetamol["drugName"], paracetamol["quantity"], paracetamol["daysToExpiry"]) == (
+        "Paracetamol 500mg", 1250, 200
+    )
+    assert paracetamol["locations"] == [{"location": "Central Hospital", "quantity": 1250}]
+
+
+def test_a_batch_held_at_several_locations_is_merged(stocked):
+    stocked.execute("""
+        INSERT INTO inventory (location, drug_name, quantity, batch_id, expiry_date, manufacturer)
+        VALUES ('City Pharmacy', 'Paracetamol 500mg', 50, 'PC-2024-001', date('now', '+3 days'), 'PharmaCorp Ltd')
+    """)
+    entry = BatchIndex().verify(stocked, ["PC-2024-001"])["results"][0]
+    assert entry["quantity"] == 1300
+    assert [place["location"] for place in entry["locations"]] == ["Central Hospital", "City Pharmacy"]
+    # The earliest expiry across locations is reported
+    assert entry["daysToExpiry"] == 3
+
+
+def test_index_reloads_only_after_invalidation(stocked):
+    index = BatchIndex()
+    assert index.verify(stocked, ["NEW-1"])["counts"]["notFound"] == 1
+    stocked.execute("INSERT INTO inventory (location, drug_name, quantity, batch_id) VALUES ('X', 'Y', 1, 'NEW-1')")
+    # Still served from the loaded set until a write path invalidates it
+    assert index.verify(stocked, ["NEW-1"])["counts"]["notFound"] == 1
+    assert index.loads == 1
+
+    index.invalidate()
+    assert index.stats()["stale"]
+    assert index.verify(stocked, ["NEW-1"])["counts"]["verified"] == 1
+    assert index.loads == 2 and index.stats()["knownBatches"] == 7
+
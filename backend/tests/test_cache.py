@@ -0,0 +1,111 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+import cache as cache_module
+from cache import ALL_LOCATIONS, ResponseCache, cached_json_response
+
+
+def fill(cache, key, tags):
+    return cache.set(key, b"{}", tags, cache.generation)
+
+
+def test_lru_eviction_keeps_recently_used_entries():
+    cache = ResponseCache(max_entries=2)
+    fill(cache, "a", ["A"])
+    fill(cache, "b", ["B"])
+    assert cache.get("a") is not None
+    fill(cache, "c", ["C"])
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = ResponseCache(ttl=5)
+    fill(cache, "a", ["A"])
+    now[0] += 4
+    assert cache.get("a") is not None
+    now[0] += 2
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_invalidation_drops_the_location_and_network_wide_entries():
+    cache = ResponseCache()
+    fill(cache, "central", ["Central Hospital"])
+    fill(cache, "clinic", ["Rural Clinic A"])
+    fill(cache, "summary", [ALL_LOCATIONS])
+
+    cache.invalidate(["Central Hospital"])
+    assert cache.get("central") is None and cache.get("summary") is None
+    assert cache.get("clinic") is not None
+
+    cache.invalidate()
+    assert cache.get("clinic") is None
+    assert cache.stats()["invalidations"] == 3
+
+
+def test_response_computed_across_a_write_is_not_cached():
+    cache = ResponseCache()
+    generation = cache.generation
+    cache.invalidate(["Central Hospital"])
+    entry = cache.set("central", b"{}", ["Central Hospital"], generation)
+    assert entry.etag
+    assert cache.get("central") is None
+
+
+@pytest.fixture
+def app_client():
+    cache = ResponseCache()
+    calls = []
+    app = FastAPI()
+
+    @app.get("/inventory/{location}")
+    def read(request: Request, location: str):
+        return cached_json_response(cache, request, location, lambda: calls.append(location) or {"n": len(calls)})
+
+    with TestClient(app) as client:
+        yield client, cache, calls
+
+
+def test_cached_responses_carry_an_etag_and_answer_304(app_client):
+    client, cache, calls = app_client
+    first = client.get("/inventory/A", params={"x": 1})
+    etag = first.headers["etag"]
+    assert first.json() == {"n": 1}
+    assert first.headers["cache-control"] == "no-cache"
+
+    # Same path and query in any order is the same entry
+    assert client.get("/inventory/A?x=1").headers["etag"] == etag
+    assert len(calls) == 1
+    assert client.get("/inventory/A", params={"x": 1}, headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+    assert client.get("/inventory/A", params={"x": 1}, headers={"If-None-Match": '"other"'}).status_code == 200
+    assert cache.stats()["notModified"] == 1
+
+    cache.invalidate(["A"])
+    refreshed = client.get("/inventory/A", params={"x": 1})
+    assert refreshed.json() == {"n": 2}
+    assert refreshed.headers["etag"] != etag
+
+
+def test_etag_ignores_build_timestamps():
+    cache = ResponseCache()
+    calls = []
+    app = FastAPI()
+
+    @app.get("/inventory/{location}")
+    def read(request: Request, location: str):
+        calls.append(location)
+        return cached_json_response(
+            cache, request, location, lambda: {"count": 3, "generatedAt": f"2024-03-01T10:00:0{len(calls)}"}
+        )
+
+    with TestClient(app) as client:
+        first = client.get("/inventory/A")
+        cache.invalidate(["A"])
+        rebuilt = client.get("/inventory/A", headers={"If-None-Match": first.headers["etag"]})
+    assert rebuilt.status_code == 304
+    assert rebuilt.headers["etag"] == first.headers["etag"]
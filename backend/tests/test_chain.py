@@ -0,0 +1,162 @@
+import os
+import sqlite3
+
+import pytest
+
+import chain
+from chain import ChainMirror, ChainRpcError, ChainSourceError, LocalChain
+from migrations import migrate
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures",
+                       "drug_register_events.json")
+ADDRESS = "0xd4763ed0b2ac82a5ff322715869743c28a98ab52"
+SENDER = "0x90F8bf6A479f320ead074411a4B0e7944Ea8c9C1"
+
+
+@pytest.fixture
+def mirror_conn(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "chain.db"), isolation_level=None)
+    migrate(conn)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def fixture_chain():
+    return LocalChain.load(FIXTURE)
+
+
+def test_keccak256_matches_ethereum():
+    assert chain.keccak256(b"").hex() == "c5d2460186f7233c927e7db2dcc703c0e500b653ca82273b7bfad8045d85a470"
+    assert chain.keccak256(b"Transfer(address,address,uint256)").hex() == (
+        "ddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+    )
+
+
+def test_fixture_logs_decode(fixture_chain):
+    rows = [chain.decode_log(log) for log in fixture_chain.logs]
+    assert [row["event"] for row in rows].count("DrugRegistered") == 8
+    assert [row["event"] for row in rows].count("DrugVerified") == 4
+
+    first = rows[0]
+    assert first["batchHash"] == chain.batch_hash("PC-2024-001")
+    assert (first["name"], first["manufacturer"]) == ("Paracetamol 500mg", "PharmaCorp Ltd")
+    assert first["account"] == SENDER.lower()
+    assert first["blockNumber"] == 5000001
+
+    verified = next(row for row in rows if row["event"] == "DrugVerified")
+    assert verified["batchHash"] == chain.batch_hash("PC-2024-001")
+    assert verified["timestamp"] > 0
+
+
+def test_decode_ignores_other_events():
+    log = {"topics": [chain.batch_hash("Transfer"), chain.batch_hash("x")], "data": "0x",
+           "blockNumber": "0x1", "transactionHash": "0x00", "logIndex": "0x0"}
+    assert chain.decode_log(log) is None
+    assert chain.decode_log({**log, "topics": [chain.DRUG_REGISTERED_TOPIC]}) is None
+
+
+def test_local_chain_round_trips_encoded_logs(tmp_path):
+    local = LocalChain(ADDRESS)
+    local.register_drug("Aspirin 325mg", "GP-2024-089", "Global Pharma", SENDER, timestamp=1700000000)
+    local.verify_drug("GP-2024-089", SENDER, timestamp=1700000100)
+    with pytest.raises(ChainSourceError):
+        local.register_drug("Aspirin 325mg", "GP-2024-089", "Global Pharma", SENDER)
+    with pytest.raises(ChainSourceError):
+        local.verify_drug("NOT-A-BATCH", SENDER)
+
+    registered, verified = (chain.decode_log(log) for log in local.logs)
+    assert (registered["name"], registered["manufacturer"], registered["timestamp"]) == (
+        "Aspirin 325mg", "Global Pharma", 1700000000
+    )
+    assert (verified["account"], verified["timestamp"]) == (SENDER.lower(), 1700000100)
+    assert local.get_logs(ADDRESS, 2, 2, [[chain.DRUG_VERIFIED_TOPIC]]) == local.logs[1:]
+    assert local.get_logs(ADDRESS, 1, 2, [[chain.DRUG_VERIFIED_TOPIC]]) == local.logs[1:]
+    assert local.get_logs("0x" + "0" * 40, 1, 2, []) == []
+
+    path = str(tmp_path / "events.json")
+    local.save(path)
+    loaded = LocalChain.load(path)
+    assert (loaded.head, loaded.logs) == (local.head, local.logs)
+    with pytest.raises(ChainSourceError):
+        loaded.register_drug("Aspirin 325mg", "GP-2024-089", "Global Pharma", SENDER)
+
+
+def test_mirror_syncs_fixture_and_advances_cursor(mirror_conn, fixture_chain):
+    mirror = ChainMirror(fixture_chain, ADDRESS, confirmations=0, start_block=5000000, page_blocks=10)
+    result = mirror.sync(mirror_conn)
+    assert (result["registered"], result["verified"], result["logs"]) == (8, 4, 12)
+    assert result["cursor"] == fixture_chain.head == mirror.cursor(mirror_conn)
+
+    again = mirror.sync(mirror_conn)
+    assert (again["registered"], again["verified"], again["pages"]) == (0, 0, 0)
+
+    found = mirror.verify(mirror_conn, "PC-2024-001")
+    assert found["registered"] and found["name"] == "Paracetamol 500mg"
+    assert found["verificationCount"] == 2
+    assert found["mirroredThroughBlock"] == fixture_chain.head
+    assert mirror.verify(mirror_conn, "GP-2024-090")["registered"] is False
+
+
+def test_mirror_resumes_from_cursor_after_partial_sync(mirror_conn, fixture_chain):
+    mirror = ChainMirror(fixture_chain, ADDRESS, confirmations=0, start_block=5000000, page_blocks=10)
+    partial = mirror.sync(mirror_conn, max_pages=1)
+    assert partial["cursor"] == 5000009
+    assert partial["registered"] == 3
+
+    rest = mirror.sync(mirror_conn)
+    assert (rest["registered"], rest["verified"]) == (5, 4)
+    count = mirror_conn.execute("SELECT COUNT(*) FROM chain_drugs").fetchone()[0]
+    assert count == 8
+
+
+def test_mirror_leaves_unconfirmed_blocks(mirror_conn):
+    local = LocalChain(ADDRESS)
+    mirror = ChainMirror(local, ADDRESS, confirmations=3)
+    local.register_drug("Aspirin 325mg", "GP-2024-089", "Global Pharma", SENDER)
+    local.mine(2)
+
+    first = mirror.sync(mirror_conn)
+    assert first["confirmedHead"] == 0 and first["registered"] == 0
+    assert mirror.verify(mirror_conn, "GP-2024-089")["registered"] is False
+
+    local.mine(1)
+    second = mirror.sync(mirror_conn)
+    assert second["registered"] == 1
+    assert mirror.cursor(mirror_conn) == 1
+
+
+def test_removed_logs_are_not_mirrored(mirror_conn):
+    local = LocalChain(ADDRESS)
+    local.register_drug("Aspirin 325mg", "GP-2024-089", "Global Pharma", SENDER)
+    local.register_drug("Ibuprofen 400mg", "HT-2024-128", "HealthTech Solutions", SENDER)
+    # The second registration was dropped by a reorg
+    local.logs[1]["removed"] = True
+
+    mirror = ChainMirror(local, ADDRESS, confirmations=0)
+    assert mirror.sync(mirror_conn)["registered"] == 1
+    assert mirror.verify(mirror_conn, "GP-2024-089")["registered"] is True
+    assert mirror.verify(mirror_conn, "HT-2024-128")["registered"] is False
+
+
+def test_mirror_halves_the_range_when_the_node_refuses(mirror_conn, fixture_chain):
+    class CappedSource:
+        def __init__(self, inner, max_blocks):
+            self.inner = inner
+            self.max_blocks = max_blocks
+            self.ranges = []
+
+        def block_number(self):
+            return self.inner.block_number()
+
+        def get_logs(self, address, from_block, to_block, topics):
+            if to_block - from_block + 1 > self.max_blocks:
+                raise ChainRpcError("query returned more than 10000 results")
+            self.ranges.append((from_block, to_block))
+            return self.inner.get_logs(address, from_block, to_block, topics)
+
+    source = CappedSource(fixture_chain, max_blocks=16)
+    mirror = ChainMirror(source, ADDRESS, confirmations=0, start_block=5000000, page_blocks=64)
+    result = mirror.sync(mirror_conn)
+    assert (result["registered"], result["verified"]) == (8, 4)
+    assert all(to_block - from_block < 16 for from_block, to_block in source.ranges)
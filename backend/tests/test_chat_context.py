@@ -0,0 +1,60 @@
+from chat_context import ChatContextBuilder, estimate_tokens, read_snapshot
+
+
+def add_pending(conn, location, drug_name, quantity):
+    conn.execute(
+        "INSERT INTO reorders (drug_name, quantity, location, expected_delivery) VALUES (?, ?, ?, '2030-01-01')",
+        (drug_name, quantity, location),
+    )
+
+
+def test_snapshot_reads_the_aggregates_and_hot_lists(stocked):
+    add_pending(stocked, "Rural Clinic A", "Aspirin 325mg", 500)
+    snapshot = read_snapshot(stocked)
+    assert snapshot.drug_types == 4
+    assert [row[0] for row in snapshot.locations] == ["Central Hospital", "City Pharmacy", "Rural Clinic A"]
+    assert [row[2] for row in snapshot.low_stock] == [8, 20, 30, 40]
+    assert [(row[1], row[4]) for row in snapshot.expiring] == [
+        ("Aspirin 325mg", -5), ("Ibuprofen 400mg", 10), ("Amoxicillin 250mg", 20),
+    ]
+    assert snapshot.pending_reorders == [("Rural Clinic A", "Aspirin 325mg", 500, "2030-01-01")]
+    assert snapshot.pending_count == 1
+
+
+def test_render_without_a_snapshot():
+    assert "not available" in ChatContextBuilder().render("anything")
+
+
+def test_render_keeps_only_the_sections_and_rows_asked_about(stocked):
+    builder = ChatContextBuilder()
+    builder.refresh(stocked)
+
+    expiring = builder.render("What is expiring at City Pharmacy?")
+    assert "Expired or expiring soon" in expiring
+    assert "Ibuprofen 400mg @ City Pharmacy: 75" in expiring
+    assert "Amoxicillin" not in expiring
+    assert "Low stock" not in expiring and "Pending reorders" not in expiring
+
+    aspirin = builder.render("How low is aspirin?")
+    assert "Aspirin 325mg @ Rural Clinic A: 8" in aspirin
+    assert "Paracetamol" not in aspirin
+
+    # Unrecognised questions get every section
+    overview = builder.render("¿Qué tal?")
+    for title in ("Per-location totals", "Expired or expiring soon", "Low stock", "Pending reorders"):
+        assert title in overview
+    assert overview.splitlines()[0].startswith("Live data as of")
+
+
+def test_render_stays_within_the_token_budget(stocked):
+    stocked.executemany(
+        "INSERT INTO inventory (location, drug_name, quantity) VALUES (?, ?, 1)",
+        [(f"Site {i:03d}", f"Drug {i:03d}") for i in range(150)],
+    )
+    builder = ChatContextBuilder(token_budget=200)
+    builder.refresh(stocked)
+    context = builder.render("low stock")
+    # Budgeting counts items, not the "- " prefixes or the trailer line
+    assert estimate_tokens(context) <= 200 * 1.1
+    assert "more not shown" in context
+    assert builder.stats()["refreshes"] == 1
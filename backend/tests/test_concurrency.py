@@ -0,0 +1,48 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+TIMEOUT = 5
+
+
+class GatedModel:
+    """Parks every Gemini call on an event until the test opens the gate."""
+
+    def __init__(self):
+        self.gate = asyncio.Event()
+        self.started = threading.Semaphore(0)
+        self.loop = None
+
+    async def generate_content_async(self, prompt):
+        self.loop = asyncio.get_running_loop()
+        self.started.release()
+        await self.gate.wait()
+        return SimpleNamespace(text="Restock paracetamol.")
+
+    def open(self):
+        self.loop.call_soon_threadsafe(self.gate.set)
+
+
+def test_reads_are_served_while_ai_calls_are_in_flight(make_client):
+    client = make_client()
+    model = client.main.ai_client.model = GatedModel()
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        predictions = [
+            pool.submit(client.get, "/predict-demand", params={"location": f"Site {i}", "source": "gemini"})
+            for i in range(4)
+        ]
+        for _ in predictions:
+            assert model.started.acquire(timeout=TIMEOUT)
+
+        # Every upstream call is parked on the gate; the reads must not wait for them
+        listing = pool.submit(client.get, "/inventory/Central Hospital").result(timeout=TIMEOUT)
+        health = pool.submit(client.get, "/health").result(timeout=TIMEOUT)
+        assert not model.gate.is_set()
+        assert not any(prediction.done() for prediction in predictions)
+
+        model.open()
+        assert [prediction.result(timeout=TIMEOUT).status_code for prediction in predictions] == [200] * 4
+
+    assert listing.status_code == health.status_code == 200
+    assert client.main.ai_client.stats()["upstreamCalls"] == 4
@@ -0,0 +1,69 @@
+import pytest
+
+from batches import BatchIndex
+from cache import ALL_LOCATIONS, ResponseCache
+from coordination import RESET_SLOT, WRITES_SLOT, LeaderLock, SharedCounters
+
+
+@pytest.fixture
+def counters(tmp_path):
+    """Two handles on one counter file, standing in for two workers."""
+    path = str(tmp_path / "medchain.counters")
+    first, second = SharedCounters(path), SharedCounters(path)
+    yield first, second
+    first.close()
+    second.close()
+
+
+def test_counters_are_shared_between_handles(counters):
+    first, second = counters
+    slot = first.slot("Central Hospital")
+    assert slot == second.slot("Central Hospital") and slot > RESET_SLOT
+    first.bump([WRITES_SLOT, slot, slot])
+    second.bump([slot])
+    assert (second.read(WRITES_SLOT), first.read(slot)) == (1, 2)
+
+
+def test_writes_in_one_worker_invalidate_cached_entries_in_another(counters):
+    first, second = (ResponseCache(shared=shared) for shared in counters)
+    for cache in (first, second):
+        for key, tag in (("central", "Central Hospital"), ("clinic", "Rural Clinic A"), ("summary", ALL_LOCATIONS)):
+            cache.set(key, b"{}", [tag], cache.generation)
+
+    second.invalidate(["Central Hospital"])
+    assert first.get("central") is None and first.get("summary") is None
+    assert first.get("clinic") is not None
+    assert first.stats()["remoteInvalidations"] == 2
+
+    second.invalidate()
+    assert first.get("clinic") is None
+
+
+def test_entries_computed_across_a_remote_write_are_not_stored(counters):
+    first, second = (ResponseCache(shared=shared) for shared in counters)
+    generation = first.generation
+    second.invalidate(["Rural Clinic A"])
+    first.set("clinic", b"{}", ["Rural Clinic A"], generation)
+    assert first.get("clinic") is None
+
+
+def test_batch_index_reloads_after_a_remote_invalidation(counters, stocked):
+    mine, theirs = (BatchIndex(shared) for shared in counters)
+    theirs.known(stocked)
+    mine.invalidate()
+    assert theirs.stats()["stale"]
+    theirs.known(stocked)
+    assert theirs.loads == 2
+
+
+def test_only_one_leader_at_a_time(tmp_path):
+    path = str(tmp_path / "medchain.leader")
+    first, second = LeaderLock(path), LeaderLock(path)
+    try:
+        assert first.try_acquire() and first.try_acquire()
+        assert not second.try_acquire() and not second.held
+        first.release()
+        assert second.try_acquire()
+    finally:
+        first.release()
+        second.release()
@@ -0,0 +1,66 @@
+import threading
+
+import pytest
+
+from database import DatabaseSettings, ConnectionPool
+
+
+def test_settings_from_url_parses_path_pool_and_pragmas():
+    settings = DatabaseSettings.from_url("sqlite:////data/x.db?pool_size=3&synchronous=FULL&pool_timeout=2")
+    assert settings.path == "/data/x.db"
+    assert settings.pool_size == 3
+    assert settings.pool_timeout == 2.0
+    assert settings.pragmas["synchronous"] == "FULL"
+    assert settings.pragmas["journal_mode"] == "WAL"
+
+
+def test_settings_reject_unknown_options_and_schemes():
+    with pytest.raises(ValueError):
+        DatabaseSettings.from_url("sqlite:///./x.db?journal=WAL")
+    with pytest.raises(ValueError):
+        DatabaseSettings.from_url("mysql://localhost/x")
+
+
+def test_pool_applies_pragmas_and_reuses_connections(db_path):
+    pool = ConnectionPool(DatabaseSettings(db_path, pool_size=2))
+    pool.open()
+    try:
+        with pool.connection() as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            first = conn
+        with pool.connection() as conn:
+            assert conn is first
+        assert pool.stats() == {"size": 2, "open": 1, "idle": 1}
+    finally:
+        pool.close()
+
+
+def test_pool_rolls_back_open_transactions_on_release(db_path):
+    pool = ConnectionPool(DatabaseSettings(db_path, pool_size=1))
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.execute("INSERT INTO t VALUES (1)")
+        assert conn.in_transaction
+    with pool.connection() as conn:
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    pool.close()
+
+
+def test_pool_times_out_when_exhausted(db_path):
+    pool = ConnectionPool(DatabaseSettings(db_path, pool_size=1, pool_timeout=0.05))
+    with pool.connection():
+        errors = []
+
+        def acquire():
+            try:
+                with pool.connection():
+                    pass
+            except RuntimeError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=acquire)
+        thread.start()
+        thread.join()
+    assert len(errors) == 1
+    pool.close()
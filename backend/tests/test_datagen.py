@@ -0,0 +1,40 @@
+import sqlite3
+
+from benchmarks.datagen import generate
+
+OPTIONS = dict(locations=20, skus=400, drugs=60, history_days=30, history_share=0.2, reorder_share=0.2)
+
+# last_updated is stamped from the clock; every other column comes from the seed
+TABLES = {
+    "inventory": "location, drug_name, quantity, batch_id, expiry_date, manufacturer",
+    "stock_movements": "location, drug_name, delta, reason, recorded_at",
+    "reorders": "drug_name, quantity, location, status, order_date, expected_delivery, supplier",
+}
+
+
+def dump(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {table: conn.execute(f"SELECT {columns} FROM {table} ORDER BY id").fetchall()
+                for table, columns in TABLES.items()}
+    finally:
+        conn.close()
+
+
+def test_counts_match_the_written_rows(tmp_path):
+    path = str(tmp_path / "bench.db")
+    stats = generate(path, seed=7, **OPTIONS)
+    rows = dump(path)
+    assert stats["locations"] == 20
+    assert (stats["skus"], stats["movements"], stats["reorders"]) == tuple(len(rows[table]) for table in TABLES)
+    # One opening balance per pair plus the consumption history
+    assert stats["movements"] > stats["skus"] and stats["reorders"] > 0
+
+
+def test_same_seed_gives_the_same_database(tmp_path):
+    paths = [str(tmp_path / name) for name in ("first.db", "second.db", "other.db")]
+    for path, seed in zip(paths, (7, 7, 8)):
+        generate(path, seed=seed, **OPTIONS)
+    first, second, other = (dump(path) for path in paths)
+    assert first == second
+    assert first["inventory"] != other["inventory"]
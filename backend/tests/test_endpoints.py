@@ -0,0 +1,260 @@
+"""The inventory endpoint suite, run against every storage backend.
+
+PostgreSQL runs when MEDCHAIN_TEST_POSTGRES_URL points at a database the
+tests may wipe, for example:
+
+    MEDCHAIN_TEST_POSTGRES_URL=postgresql://postgres@localhost/medchain_test python -m pytest
+"""
+import asyncio
+import json
+import os
+
+import pytest
+
+from conftest import INVENTORY, days_from_today, inventory_ndjson
+
+POSTGRES_URL = os.getenv("MEDCHAIN_TEST_POSTGRES_URL")
+POSTGRES_TABLES = ("inventory", "stock_movements", "reorders", "demand_predictions", "forecast_runs")
+
+requires_postgres = pytest.mark.skipif(not POSTGRES_URL, reason="MEDCHAIN_TEST_POSTGRES_URL is not set")
+
+
+def reset_postgres():
+    import asyncpg
+
+    async def drop():
+        conn = await asyncpg.connect(POSTGRES_URL)
+        try:
+            await conn.execute(f"DROP TABLE IF EXISTS {', '.join(POSTGRES_TABLES)}")
+        finally:
+            await conn.close()
+
+    asyncio.run(drop())
+
+
+def start(make_client, backend):
+    if backend == "postgresql":
+        reset_postgres()
+        client = make_client(POSTGRES_URL)
+    else:
+        client = make_client()
+    assert client.main.repository.backend == backend
+    return client
+
+
+@pytest.fixture(params=["sqlite", pytest.param("postgresql", marks=requires_postgres)])
+def api(request, make_client):
+    client = start(make_client, request.param)
+    response = client.post("/inventory/bulk?format=ndjson", content=inventory_ndjson())
+    assert response.json()["rowsWritten"] == len(INVENTORY)
+    return client
+
+
+def stocked_pairs(rows=INVENTORY):
+    return {(row[0], row[1]): row[2] for row in rows}
+
+
+def test_location_listing(api):
+    body = api.get("/inventory/Central Hospital").json()
+    assert body["totalItems"] == 2
+    drugs = {drug["name"]: drug for drug in body["drugs"]}
+    assert drugs["Paracetamol 500mg"]["quantity"] == 1250
+    assert drugs["Paracetamol 500mg"]["expiryDate"] == INVENTORY[0][4]
+    assert drugs["Amoxicillin 250mg"]["batchId"] == "ML-2024-045"
+
+    projected = api.get("/inventory/Rural Clinic A", params={"fields": "name,quantity"}).json()
+    assert {tuple(drug) for drug in projected["drugs"]} == {("name", "quantity")}
+
+    names, cursor = [], None
+    while True:
+        page = api.get("/inventory/Rural Clinic A", params={"limit": 1, **({"cursor": cursor} if cursor else {})}).json()
+        names += [drug["name"] for drug in page["drugs"]]
+        cursor = page["nextCursor"]
+        if cursor is None:
+            break
+    assert sorted(names) == ["Aspirin 325mg", "Paracetamol 500mg"]
+
+    columnar = api.get("/inventory/City Pharmacy", params={"format": "columnar", "fields": "name,quantity"}).json()
+    assert columnar["drugs"]["columns"] == ["name", "quantity"]
+    assert sorted(zip(*columnar["drugs"]["data"])) == [("Aspirin 325mg", 20), ("Ibuprofen 400mg", 75)]
+
+    assert api.get("/inventory/Nowhere").json()["drugs"] == []
+    assert api.get("/inventory/Central Hospital", params={"fields": "colour"}).status_code == 400
+
+
+def test_update_writes_through_to_listings(api):
+    assert api.get("/inventory/low-stock").json()["count"] == 4
+    response = api.post("/inventory/update", json={
+        "location": "Central Hospital", "drugName": "Paracetamol 500mg", "quantity": 12,
+    })
+    assert response.status_code == 200
+    drugs = {drug["name"]: drug["quantity"] for drug in api.get("/inventory/Central Hospital").json()["drugs"]}
+    assert drugs["Paracetamol 500mg"] == 12
+    assert api.get("/inventory/low-stock").json()["count"] == 5
+
+    api.post("/inventory/update", json={"location": "New Clinic", "drugName": "Aspirin 325mg", "quantity": 3})
+    assert api.get("/inventory/New Clinic").json()["drugs"][0]["batchId"] == "N/A"
+
+
+def test_all_inventory(api):
+    body = api.get("/inventory/all").json()
+    assert body["totalLocations"] == 3
+    listed = {
+        (location, drug["name"]): drug["quantity"]
+        for location, drugs in body["locations"].items() for drug in drugs
+    }
+    assert listed == stocked_pairs()
+
+    pages, cursor = [], None
+    while True:
+        page = api.get("/inventory/all", params={"limit": 4, "fields": "quantity", **({"cursor": cursor} if cursor else {})}).json()
+        pages.append(page)
+        cursor = page["nextCursor"]
+        if cursor is None:
+            break
+    assert len(pages) == 2
+    assert sum(len(drugs) for page in pages for drugs in page["locations"].values()) == len(INVENTORY)
+
+    streamed = json.loads(api.get("/inventory/all", params={"stream": True}).content)
+    assert streamed["locations"] == body["locations"]
+
+    columnar = api.get("/inventory/all", params={"format": "columnar", "fields": "quantity"}).json()
+    assert columnar["totalLocations"] == 3
+    assert sum(columnar["inventory"]["data"][1]) == sum(stocked_pairs().values())
+    assert api.get("/inventory/all", params={"format": "columnar", "stream": True}).status_code == 400
+    assert api.get("/inventory/all", params={"cursor": "???"}).status_code == 400
+
+
+def test_expired(api):
+    expired = api.get("/inventory/expired").json()
+    assert [(d["location"], d["name"], d["daysUntilExpiry"]) for d in expired["expiredDrugs"]] == [
+        ("Rural Clinic A", "Aspirin 325mg", -5),
+    ]
+    assert expired["checkDate"] == days_from_today(0)
+
+    month = api.get("/inventory/expired", params={"days": 30}).json()
+    assert [d["daysUntilExpiry"] for d in month["expiredDrugs"]] == [-5, 10, 20]
+
+    window = api.get("/inventory/expired", params={"from_days": 0, "to_days": 30}).json()
+    assert [d["name"] for d in window["expiredDrugs"]] == ["Ibuprofen 400mg", "Amoxicillin 250mg"]
+    assert window["fromDate"] == days_from_today(0)
+
+    central = api.get("/inventory/expired", params={"days": 365, "location": "Central Hospital"}).json()
+    assert central["count"] == 2
+
+    columnar = api.get("/inventory/expired", params={"days": 30, "format": "columnar"}).json()
+    assert columnar["expiredDrugs"]["data"][6] == [-5, 10, 20]
+
+
+def test_low_stock(api):
+    body = api.get("/inventory/low-stock").json()
+    assert [(d["quantity"], d["status"]) for d in body["lowStockDrugs"]] == [
+        (8, "critical"), (20, "low"), (30, "moderate"), (40, "moderate"),
+    ]
+    clinic = api.get("/inventory/low-stock", params={"threshold": 100, "location": "City Pharmacy"}).json()
+    assert [d["name"] for d in clinic["lowStockDrugs"]] == ["Aspirin 325mg", "Ibuprofen 400mg"]
+
+
+def test_summary(api):
+    summary = api.get("/inventory/summary").json()
+    assert summary["totalDrugs"] == len(INVENTORY)
+    assert summary["totalQuantity"] == sum(stocked_pairs().values())
+    assert summary["lowStockCount"] == 4
+    assert summary["expiringCount"] == 3
+    assert {(row["name"], row["drugTypes"], row["totalQuantity"]) for row in summary["locations"]} == {
+        ("Central Hospital", 2, 1290), ("Rural Clinic A", 2, 38), ("City Pharmacy", 2, 95),
+    }
+    assert summary["topDrugs"][0] == {"name": "Paracetamol 500mg", "quantity": 1280}
+
+    api.post("/inventory/update", json={"location": "City Pharmacy", "drugName": "Ibuprofen 400mg", "quantity": 0})
+    assert api.get("/inventory/summary").json()["totalQuantity"] == sum(stocked_pairs().values()) - 75
+
+
+def test_search(api):
+    prefix = api.get("/inventory/search", params={"q": "As"}).json()
+    assert prefix["mode"] == "prefix"
+    assert {r["location"] for r in prefix["results"]} == {"Rural Clinic A", "City Pharmacy"}
+
+    substring = api.get("/inventory/search", params={"q": "cetamol"}).json()
+    assert substring["mode"] == "substring"
+    assert {(r["location"], r["name"]) for r in substring["results"]} == {
+        ("Central Hospital", "Paracetamol 500mg"), ("Rural Clinic A", "Paracetamol 500mg"),
+    }
+
+    by_manufacturer = api.get("/inventory/search", params={"q": "medilab"}).json()
+    assert [r["name"] for r in by_manufacturer["results"]] == ["Amoxicillin 250mg"]
+
+    fuzzy = api.get("/inventory/search", params={"q": "Amoxicilin"}).json()
+    assert fuzzy["mode"] == "fuzzy"
+    assert [r["name"] for r in fuzzy["results"]] == ["Amoxicillin 250mg"]
+
+    located = api.get("/inventory/search", params={"q": "aspirin", "location": "City Pharmacy"}).json()
+    assert [r["batchId"] for r in located["results"]] == ["GP-2024-090"]
+
+
+def test_reorders(api):
+    plan = api.get("/inventory/reorder/plan", params={"threshold": 50}).json()
+    assert {(item["location"], item["drugName"]) for item in plan["plan"]} == {
+        ("Central Hospital", "Amoxicillin 250mg"), ("Rural Clinic A", "Paracetamol 500mg"),
+        ("Rural Clinic A", "Aspirin 325mg"), ("City Pharmacy", "Aspirin 325mg"),
+    }
+    assert all(item["orderQuantity"] == 500 for item in plan["plan"])
+
+    dry_run = api.post("/inventory/reorder", json={"threshold": 50, "drugName": "Asprin", "dryRun": True}).json()
+    assert dry_run["drugNames"] == ["Aspirin 325mg"]
+    assert len(dry_run["reordersCreated"]) == 2
+    assert api.post("/inventory/reorder", json={"threshold": 50, "drugName": "Asprin"}).status_code == 422
+
+    # A name that picks out several drugs may be planned but not ordered
+    planned = api.post("/inventory/reorder", json={"threshold": 50, "drugName": "0mg", "dryRun": True}).json()
+    assert len(planned["drugNames"]) == 3
+    ambiguous = api.post("/inventory/reorder", json={"threshold": 50, "drugName": "0mg"})
+    assert ambiguous.status_code == 422
+    assert sorted(ambiguous.json()["detail"]["matches"]) == ["0mg"]
+
+    created = api.post("/inventory/reorder", json={"threshold": 50, "drugName": "aspirin", "leadTimeDays": 3}).json()
+    assert created["drugNames"] == ["Aspirin 325mg"]
+    orders = created["reordersCreated"]
+    assert {order["location"] for order in orders} == {"Rural Clinic A", "City Pharmacy"}
+    assert all(order["orderId"].startswith("MED-") and order["expectedDelivery"] == days_from_today(3) for order in orders)
+
+    # Pending orders are not placed twice
+    again = api.post("/inventory/reorder", json={"threshold": 50, "drugName": "Aspirin 325mg"}).json()
+    assert again["reordersCreated"] == []
+    assert api.get("/inventory/reorder/plan", params={"threshold": 50}).json()["count"] == 2
+
+    network = api.post("/inventory/reorder", json={"threshold": 50}).json()
+    assert len(network["reordersCreated"]) == 2
+    assert network["drugNames"] is None
+
+
+def test_batch_verification(api):
+    expired = api.post("/ai/batch-verify", json={"batchId": "GP-2024-089"}).json()
+    assert expired["verified"] and expired["isExpired"]
+    assert expired["expiryDate"] == INVENTORY[3][4]
+
+    current = api.post("/ai/batch-verify", json={"batchId": "PC-2024-001"}).json()
+    assert current["status"] == "verified"
+    assert current["location"] == "Central Hospital"
+
+    assert api.post("/ai/batch-verify", json={"batchId": "nope"}).json()["verified"] is False
+
+
+def test_predictions_and_chat(api):
+    assert api.get("/predict-demand").json()["source"] == "mock_data"
+    chat = api.post("/ai/chat", json={"message": "What is low on stock?"})
+    assert chat.status_code == 200
+    assert chat.json()["source"] == "mock_response"
+
+
+@requires_postgres
+@pytest.mark.parametrize("method, path", [
+    ("get", "/alerts"),
+    ("get", "/inventory/as-of?at=2025-01-01"),
+    ("get", "/inventory/summary/check"),
+    ("post", "/predict-demand/refit"),
+    ("get", "/chain/status"),
+])
+def test_sqlite_only_endpoints_answer_501_on_postgres(make_client, method, path):
+    client = start(make_client, "postgresql")
+    assert getattr(client, method)(path).status_code == 501
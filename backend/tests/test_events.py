@@ -0,0 +1,125 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from events import ALL_LOCATIONS, MAX_PENDING, EventBroker, EventRelay
+
+WINDOW = 0.02
+
+
+def decode(chunk: bytes) -> list:
+    return [json.loads(line[len(b"data: "):]) for line in chunk.split(b"\n") if line.startswith(b"data: ")]
+
+
+async def next_chunk(stream) -> bytes:
+    return await asyncio.wait_for(stream.__anext__(), timeout=2)
+
+
+def test_publish_coalesces_by_type_and_location():
+    async def scenario():
+        broker = EventBroker(coalesce_window=WINDOW)
+        broker.start()
+        subscriber = broker.subscribe({"Central Hospital"})
+        stream = broker.stream(subscriber)
+        await next_chunk(stream)  # ready
+
+        for quantity in (10, 20, 30):
+            broker.publish("inventory", ["Central Hospital"], quantity=quantity)
+        broker.publish("inventory", ["City Pharmacy"], quantity=5)
+        events = decode(await next_chunk(stream))
+        broker.stop()
+        await stream.aclose()
+        return broker, events
+
+    broker, events = asyncio.run(scenario())
+    assert [(e["location"], e["count"], e["quantity"]) for e in events] == [("Central Hospital", 3, 30)]
+    assert broker.coalesced == 2
+    assert broker.stats()["subscribers"] == 0
+
+
+def test_network_wide_events_reach_every_subscriber():
+    async def scenario():
+        broker = EventBroker(coalesce_window=WINDOW)
+        broker.start()
+        streams = [broker.stream(broker.subscribe(locations)) for locations in ({"Rural Clinic A"}, None)]
+        for stream in streams:
+            await next_chunk(stream)
+        broker.publish("reorders", None)
+        received = [decode(await next_chunk(stream)) for stream in streams]
+        broker.stop()
+        return received
+
+    for events in asyncio.run(scenario()):
+        assert [(e["type"], e["location"]) for e in events] == [("reorders", ALL_LOCATIONS)]
+
+
+def test_slow_subscriber_is_told_to_resync():
+    async def scenario():
+        broker = EventBroker(coalesce_window=WINDOW)
+        broker.start()
+        subscriber = broker.subscribe()
+        for i in range(MAX_PENDING + 1):
+            broker._dispatch({"type": "inventory", "location": f"site-{i}"})
+        stream = broker.stream(subscriber)
+        await next_chunk(stream)
+        chunk = await next_chunk(stream)
+        broker.stop()
+        return broker, chunk
+
+    broker, chunk = asyncio.run(scenario())
+    assert chunk.startswith(b"event: resync")
+    assert broker.resyncs == 1
+
+
+@pytest.fixture
+def relay_path(tmp_path):
+    return str(tmp_path / "medchain.events")
+
+
+def test_relay_carries_events_between_workers_off_the_loop(relay_path):
+    first, second = EventRelay(relay_path), EventRelay(relay_path)
+    second.origin = first.origin + 1
+    threads = set()
+    for relay in (first, second):
+        for name in ("push", "pull"):
+            method = getattr(relay, name)
+
+            def recorded(*args, _method=method):
+                threads.add(threading.current_thread().name)
+                return _method(*args)
+
+            setattr(relay, name, recorded)
+
+    async def scenario():
+        sender = EventBroker(coalesce_window=WINDOW, relay=first)
+        receiver = EventBroker(coalesce_window=WINDOW, relay=second)
+        sender.start()
+        receiver.start()
+        stream = receiver.stream(receiver.subscribe({"Central Hospital"}))
+        await next_chunk(stream)
+        sender.publish("inventory", ["Central Hospital"], quantity=42)
+        events = decode(await next_chunk(stream))
+        sender.stop()
+        receiver.stop()
+        return events
+
+    try:
+        events = asyncio.run(scenario())
+    finally:
+        first.close()
+        second.close()
+    assert [(e["location"], e["quantity"]) for e in events] == [("Central Hospital", 42)]
+    assert first.pushed == 1 and second.pulled == 1
+    assert threads == {"event-relay"}
+
+
+def test_relay_skips_its_own_events(relay_path):
+    relay = EventRelay(relay_path)
+    try:
+        relay.push([{"type": "inventory", "location": "Central Hospital"}])
+        assert relay.pull() == []
+        assert relay.pushed == 1 and relay.pulled == 0
+    finally:
+        relay.close()
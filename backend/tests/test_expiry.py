@@ -0,0 +1,49 @@
+from datetime import date
+
+import repository
+from conftest import days_from_today
+
+
+def test_expiry_day_is_derived_from_expiry_date(stocked):
+    day = stocked.execute(
+        "SELECT expiry_day FROM inventory WHERE batch_id = 'PC-2024-001'"
+    ).fetchone()[0]
+    assert day == repository.epoch_day(date.today()) + 200
+
+    stocked.execute("UPDATE inventory SET expiry_date = '1970-01-11' WHERE batch_id = 'PC-2024-001'")
+    stocked.execute("UPDATE inventory SET expiry_date = NULL WHERE batch_id = 'ML-2024-045'")
+    rows = dict(stocked.execute(
+        "SELECT batch_id, expiry_day FROM inventory WHERE batch_id IN ('PC-2024-001', 'ML-2024-045')"
+    ))
+    assert rows == {"PC-2024-001": 10, "ML-2024-045": None}
+
+
+def test_read_expiring_windows(stocked):
+    def listed(*args, **kwargs):
+        return [(row[1], row[6]) for row in repository.read_expiring(stocked, *args, **kwargs)]
+
+    assert listed(0) == [("Aspirin 325mg", -5)]
+    assert listed(30) == [("Aspirin 325mg", -5), ("Ibuprofen 400mg", 10), ("Amoxicillin 250mg", 20)]
+    assert listed(30, since_days=0) == [("Ibuprofen 400mg", 10), ("Amoxicillin 250mg", 20)]
+    assert listed(365, location="Central Hospital") == [("Amoxicillin 250mg", 20), ("Paracetamol 500mg", 200)]
+
+
+def test_rows_without_an_expiry_date_are_never_listed(stocked):
+    stocked.execute("UPDATE inventory SET expiry_date = NULL WHERE batch_id = 'GP-2024-089'")
+    assert [row[3] for row in repository.read_expiring(stocked, 30)] == ["HT-2024-128", "ML-2024-045"]
+
+
+def test_read_expiring_reports_iso_dates_as_stored(stocked):
+    rows = repository.read_expiring(stocked, 15)
+    assert [row[4] for row in rows] == [days_from_today(-5), days_from_today(10)]
+
+
+def test_read_low_stock_computes_status_in_sql(stocked):
+    rows = repository.read_low_stock(stocked, 50)
+    assert [(row[1], row[2], row[6]) for row in rows] == [
+        ("Aspirin 325mg", 8, "critical"),
+        ("Aspirin 325mg", 20, "low"),
+        ("Paracetamol 500mg", 30, "moderate"),
+        ("Amoxicillin 250mg", 40, "moderate"),
+    ]
+    assert [row[0] for row in repository.read_low_stock(stocked, 50, location="City Pharmacy")] == ["City Pharmacy"]
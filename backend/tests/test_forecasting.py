@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+import forecasting
+
+
+def demand_matrix(series: int = 40, days: int = 30, seed: int = 7) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    active = rng.uniform(size=(series, days)) < rng.uniform(0.1, 1.0, size=(series, 1))
+    return np.where(active, rng.poisson(5.0, size=(series, days)), 0).astype(np.float64)
+
+
+def test_ses_follows_a_level_shift():
+    demand = np.array([[10.0] * 10 + [20.0] * 30])
+    level, mae = forecasting.simple_exponential_smoothing(demand, alpha=0.5)
+    assert level[0] == pytest.approx(20.0)
+    assert mae[0] > 0
+
+
+def test_croston_rate_for_regular_intermittent_demand():
+    # 12 units every third day is 4 units a day; SBA shrinks it by 1 - alpha/2
+    demand = np.array([[12.0 if day % 3 == 0 else 0.0 for day in range(60)]])
+    rate = forecasting.croston_sba(demand, alpha=0.2)
+    assert rate[0] == pytest.approx(0.9 * 4.0, rel=0.05)
+    assert forecasting.croston_sba(np.zeros((1, 10)))[0] == 0
+
+
+def test_fit_chunk_labels_method_and_trend():
+    rising = np.linspace(1, 20, 30)
+    intermittent = np.array([9.0 if day % 5 == 0 else 0.0 for day in range(30)])
+    fitted = forecasting.fit_chunk(np.vstack([rising, intermittent, np.zeros(30)]), horizon_days=30)
+    assert list(fitted["intermittent"]) == [False, True, True]
+    assert list(fitted["trend"]) == [1, 0, 0]
+    assert fitted["predicted_demand"][2] == 0
+    assert fitted["confidence"][2] == 0.5
+
+
+def test_fit_all_matches_one_chunk():
+    demand = demand_matrix(series=25)
+    chunked = forecasting.fit_all(demand, 30, chunk_size=10)
+    whole = forecasting.fit_chunk(demand, 30)
+    for key in whole:
+        np.testing.assert_array_equal(chunked[key], whole[key])
+
+
+def test_fit_all_with_no_series():
+    fitted = forecasting.fit_all(np.zeros((0, 30)))
+    assert all(len(values) == 0 for values in fitted.values())
+
+
+def test_refit_stores_predictions_from_ledger_consumption(stocked):
+    stocked.executemany(
+        "INSERT INTO stock_movements (location, drug_name, delta, reason, recorded_at) "
+        "VALUES (?, ?, ?, 'dispense', datetime('now', ?))",
+        [("Central Hospital", "Paracetamol 500mg", -10, f"-{day} days") for day in range(1, 29)]
+        + [("Rural Clinic A", "Paracetamol 500mg", -6, f"-{day} days") for day in range(1, 29, 7)],
+    )
+    stocked.commit()
+
+    stats = forecasting.refit(stocked, horizon_days=30, lookback_days=28)
+    assert stats["series"] == 2
+    assert stats["intermittent"] == 1
+
+    methods = dict(stocked.execute("SELECT location, method FROM demand_predictions"))
+    assert methods == {"Central Hospital": "ses", "Rural Clinic A": "croston_sba"}
+
+    predictions = forecasting.read_predictions(stocked, days=30)
+    assert [p["drug"] for p in predictions] == ["Paracetamol 500mg"]
+    # ~10 a day at Central Hospital; today has no consumption yet, which
+    # pulls the smoothed level below 10
+    assert 230 <= predictions[0]["predicted_demand"] <= 330
+    assert forecasting.read_predictions(stocked, days=30, location="Rural Clinic A")[0]["predicted_demand"] < 30
+
+
+def test_predict_demand_serves_mocks_only_before_the_first_fit(client):
+    before = client.get("/predict-demand").json()
+    assert before["source"] == "mock_data"
+    assert before["predictions"]
+
+    # No consumption recorded yet: the fit finds no series
+    assert client.post("/predict-demand/refit").json()["series"] == 0
+    after = client.get("/predict-demand").json()
+    assert after["source"] == "forecast_store"
+    assert after["predictions"] == []
+
+    client.post("/inventory/update", json={"location": "City Pharmacy", "drugName": "Ibuprofen 400mg", "quantity": 45})
+    client.post("/predict-demand/refit")
+    predictions = client.get("/predict-demand").json()["predictions"]
+    assert [p["drug"] for p in predictions] == ["Ibuprofen 400mg"]
+    assert client.get("/predict-demand", params={"drug": "Aspirin"}).json()["predictions"] == []
@@ -0,0 +1,122 @@
+import anyio
+import pytest
+
+from ingest import MAX_LINE_BYTES, BulkFormatError, BulkInventoryLoader, detect_format, iter_lines
+
+
+async def chunks(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+def collect_lines(*parts: bytes, max_line_bytes: int = MAX_LINE_BYTES):
+    async def run():
+        return [item async for item in iter_lines(chunks(*parts), max_line_bytes)]
+    return anyio.run(run)
+
+
+def load(fmt: str, *parts: bytes, batch_size: int = 2, max_errors: int = 10):
+    batches = []
+
+    async def write(rows):
+        batches.append(rows)
+
+    loader = BulkInventoryLoader(write, fmt, batch_size=batch_size, max_errors=max_errors)
+    report = anyio.run(loader.load, chunks(*parts))
+    return report, batches, loader
+
+
+def test_iter_lines_joins_lines_split_across_chunks():
+    assert collect_lines(b"a,b\r\nc", b"d\n", b"", b"ef") == [(1, b"a,b\r"), (2, b"cd"), (3, b"ef")]
+
+
+def test_iter_lines_drops_lines_over_the_cap():
+    lines = collect_lines(b"ok\n0123", b"456789", b"\nfine\n", b"abcdefghi", max_line_bytes=8)
+    assert lines == [(1, b"ok"), (2, None), (3, b"fine"), (4, None)]
+
+
+def test_detect_format():
+    assert detect_format(None, "text/csv; charset=utf-8") == "csv"
+    assert detect_format(None, "application/x-ndjson") == "ndjson"
+    assert detect_format("csv", "application/json") == "csv"
+    with pytest.raises(BulkFormatError):
+        detect_format(None, "text/plain")
+    with pytest.raises(BulkFormatError):
+        detect_format("xml", None)
+
+
+def test_ndjson_rows_are_validated_and_written_in_batches():
+    body = b"\n".join([
+        b'{"location": "A", "drugName": "X", "quantity": 5, "expiryDate": "2030-01-01"}',
+        b'{"location": "A", "drugName": "Y", "quantity": -1}',
+        b"not json",
+        b"",
+        b'{"location": "B", "drugName": "X", "quantity": 7}',
+        b'{"location": " ", "drugName": "Z", "quantity": 1}',
+        b'{"location": "C", "drugName": "X", "quantity": 9}',
+    ])
+    report, batches, loader = load("ndjson", body)
+    assert [len(batch) for batch in batches] == [2, 1]
+    assert batches[0][0][:5] == ("A", "X", 5, None, "2030-01-01")
+    assert report["rowsReceived"] == 6
+    assert report["rowsWritten"] == 3
+    assert report["rowsFailed"] == 3
+    assert [error["line"] for error in report["errors"]] == [2, 3, 6]
+    assert not report["success"]
+    assert loader.touched_locations == {"A", "B", "C"}
+
+
+def test_csv_header_maps_columns_and_empty_cells_to_null():
+    report, batches, _ = load("csv", b"drugName,location,quantity,batchId\nX,A,3,\nY,B,4,B-1\nZ,C\n")
+    assert [row[:4] for batch in batches for row in batch] == [("A", "X", 3, None), ("B", "Y", 4, "B-1")]
+    assert report["rowsFailed"] == 1
+    assert "expected 4 columns" in report["errors"][0]["error"]
+
+
+def test_bad_bytes_and_overlong_lines_are_row_errors():
+    body = (b"\xef\xbb\xbflocation,drugName,quantity\nA,X,1\nA,\xff,2\n"
+            + b"A," + b"Y" * MAX_LINE_BYTES + b",3\nB,Z,4\n")
+    report, batches, _ = load("csv", body)
+    assert [row[:3] for batch in batches for row in batch] == [("A", "X", 1), ("B", "Z", 4)]
+    assert [error["line"] for error in report["errors"]] == [3, 4]
+    assert "invalid UTF-8" in report["errors"][0]["error"]
+    assert "longer than" in report["errors"][1]["error"]
+
+
+def test_csv_fields_must_not_span_lines():
+    report, batches, _ = load("csv", b'location,drugName,quantity,manufacturer\nA,X,1,"Acme\nLabs"\nB,Y,2,\n')
+    assert [row[:3] for batch in batches for row in batch] == [("B", "Y", 2)]
+    assert "must not span lines" in report["errors"][0]["error"]
+    assert report["errors"][0]["line"] == 2
+
+
+def test_csv_without_required_columns_is_rejected():
+    with pytest.raises(BulkFormatError):
+        load("csv", b"location,quantity\nA,1\n")
+
+
+def test_error_list_is_truncated():
+    report, _, _ = load("ndjson", b"x\n" * 5, max_errors=2)
+    assert report["rowsFailed"] == 5
+    assert len(report["errors"]) == 2
+    assert report["errorsTruncated"]
+
+
+def test_bulk_endpoint_records_stock_through_the_ledger(make_client):
+    client = make_client()
+    response = client.post(
+        "/inventory/bulk", content=b"location,drugName,quantity\nA,X,10\nA,Y,4\n",
+        headers={"Content-Type": "text/csv"},
+    )
+    assert response.status_code == 200
+    assert response.json()["rowsWritten"] == 2
+    drugs = {drug["name"]: drug["quantity"] for drug in client.get("/inventory/A").json()["drugs"]}
+    assert drugs == {"X": 10, "Y": 4}
+
+    client.post("/inventory/bulk?format=ndjson", content=b'{"location": "A", "drugName": "X", "quantity": 3}')
+    with client.main.db_pool.connection() as conn:
+        deltas = conn.execute(
+            "SELECT delta FROM stock_movements WHERE location = 'A' AND drug_name = 'X' ORDER BY id"
+        ).fetchall()
+    assert deltas == [(10,), (-7,)]
+    assert client.post("/inventory/bulk", content=b"x").status_code == 400
@@ -0,0 +1,123 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import ledger
+from conftest import INVENTORY
+from ledger import LedgerError
+
+CENTRAL = ("Central Hospital", "Paracetamol 500mg")
+
+
+def quantity(conn, pair=CENTRAL):
+    return conn.execute(
+        "SELECT quantity FROM inventory WHERE location = ? AND drug_name = ?", pair
+    ).fetchone()[0]
+
+
+def as_of(conn, at, **filters):
+    result = ledger.stock_as_of(conn, ledger.parse_as_of(at), **filters)
+    return result, {(item["location"], item["name"]): item["quantity"] for item in result["items"]}
+
+
+def test_seeding_records_opening_balances(stocked):
+    rows = stocked.execute("SELECT reason, COUNT(*), SUM(delta) FROM stock_movements GROUP BY reason").fetchall()
+    assert rows == [("opening_balance", len(INVENTORY), sum(row[2] for row in INVENTORY))]
+    assert ledger.check_consistency(stocked) == []
+
+
+def test_appended_movements_are_folded_into_inventory(stocked):
+    appended = ledger.append_movements(stocked, [
+        (*CENTRAL, -50, "dispense", None),
+        (*CENTRAL, -25, "dispense", "RX-1"),
+        ("City Pharmacy", "Aspirin 325mg", 100, "delivery", "MED-1"),
+    ])
+    stocked.commit()
+    assert appended == 3
+    assert quantity(stocked) == 1175
+    assert quantity(stocked, ("City Pharmacy", "Aspirin 325mg")) == 120
+    assert ledger.append_movements(stocked, []) == 0
+    assert ledger.check_consistency(stocked) == []
+
+
+def test_movements_below_zero_are_rejected(stocked):
+    with pytest.raises(LedgerError, match="Aspirin 325mg at Rural Clinic A"):
+        ledger.append_movements(stocked, [("Rural Clinic A", "Aspirin 325mg", -9, "dispense", None)])
+    stocked.rollback()
+    assert quantity(stocked, ("Rural Clinic A", "Aspirin 325mg")) == 8
+
+
+def test_record_levels_appends_only_the_changes(stocked):
+    appended = ledger.record_levels(stocked, [
+        (*CENTRAL, 1250),
+        ("Rural Clinic A", "Aspirin 325mg", 50),
+        ("Rural Clinic A", "Aspirin 325mg", 60),
+    ])
+    stocked.commit()
+    assert appended == 1
+    assert quantity(stocked, ("Rural Clinic A", "Aspirin 325mg")) == 60
+    delta = stocked.execute("SELECT delta, reason FROM stock_movements ORDER BY id DESC LIMIT 1").fetchone()
+    assert delta == (52, "adjustment")
+
+
+def test_stock_as_of_replays_from_the_nearest_snapshot_and_survives_compaction(stocked):
+    stocked.execute("UPDATE stock_movements SET recorded_at = '2024-01-01 00:00:00.000'")
+    snapshot_id = ledger.checkpoint(stocked)
+    assert ledger.checkpoint(stocked) is None
+    stocked.execute("UPDATE inventory_snapshots SET taken_at = '2024-02-01 00:00:00.000'")
+    ledger.append_movements(stocked, [(*CENTRAL, -50, "dispense", None)])
+    stocked.commit()
+
+    result, stock = as_of(stocked, "2024-01-15")
+    assert result["snapshotId"] is None and stock[CENTRAL] == 1250
+    assert as_of(stocked, "2023-12-31")[1] == {}
+
+    result, stock = as_of(stocked, "2024-06-01T12:00:00Z")
+    assert (result["snapshotId"], result["replayedMovements"], stock[CENTRAL]) == (snapshot_id, 0, 1250)
+
+    now = datetime.now(timezone.utc).isoformat()
+    result, stock = as_of(stocked, now, location="Central Hospital", drug_name="Paracetamol 500mg")
+    assert (result["replayedMovements"], result["count"], stock) == (1, 1, {CENTRAL: 1200})
+
+    assert ledger.compact(stocked, retention_days=30) == {"movementsDeleted": len(INVENTORY), "snapshotsDeleted": 0}
+    stocked.commit()
+    assert stocked.execute("SELECT COUNT(*) FROM stock_movements").fetchone()[0] == 1
+    assert ledger.check_consistency(stocked) == []
+    assert as_of(stocked, now)[1][CENTRAL] == 1200
+    with pytest.raises(LedgerError, match="compacted"):
+        as_of(stocked, "2024-01-15")
+
+
+def test_counts_are_right_after_compaction_empties_the_ledger(stocked):
+    stocked.execute("UPDATE stock_movements SET recorded_at = '2024-01-01 00:00:00.000'")
+    ledger.checkpoint(stocked)
+    stocked.execute("UPDATE inventory_snapshots SET taken_at = '2024-02-01 00:00:00.000'")
+    assert ledger.compact(stocked, retention_days=30)["movementsDeleted"] == len(INVENTORY)
+    assert stocked.execute("SELECT COUNT(*) FROM stock_movements").fetchone()[0] == 0
+
+    assert ledger.append_movements(stocked, [(*CENTRAL, -50, "dispense", None)]) == 1
+    assert ledger.record_levels(stocked, [(*CENTRAL, 1000), ("City Pharmacy", "Aspirin 325mg", 20)]) == 1
+    stocked.commit()
+    assert quantity(stocked) == 1000
+    assert ledger.check_consistency(stocked) == []
+
+
+def test_maintain_checkpoints_once_enough_has_moved(stocked):
+    stocked.commit()
+    assert ledger.maintain(stocked, min_movements=len(INVENTORY) + 1)["snapshotId"] is None
+    result = ledger.maintain(stocked, min_movements=len(INVENTORY))
+    assert result["snapshotId"] is not None and result["movementsDeleted"] == 0
+
+
+def test_consistency_check_reports_drift(stocked):
+    stocked.execute("UPDATE inventory SET quantity = 1 WHERE location = ? AND drug_name = ?", CENTRAL)
+    assert ledger.check_consistency(stocked) == [
+        {"location": CENTRAL[0], "drugName": CENTRAL[1], "inventory": 1, "ledger": 1250},
+    ]
+
+
+def test_parse_as_of():
+    assert ledger.parse_as_of("2024-03-01") == "2024-03-01 23:59:59.999"
+    assert ledger.parse_as_of("2024-03-01T10:30:00Z") == "2024-03-01 10:30:00.000"
+    with pytest.raises(LedgerError):
+        ledger.parse_as_of("yesterday")
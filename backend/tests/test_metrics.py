@@ -0,0 +1,78 @@
+import logging
+import sqlite3
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from metrics import Histogram, Metrics, MetricsMiddleware, SqlProfiler, add_phase, normalise_sql
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(("GET",), value)
+    assert histogram.render("latency", ("method",)) == [
+        'latency_bucket{method="GET",le="0.1"} 1',
+        'latency_bucket{method="GET",le="1.0"} 3',
+        'latency_bucket{method="GET",le="+Inf"} 4',
+        'latency_sum{method="GET"} 4.050000',
+        'latency_count{method="GET"} 4',
+    ]
+
+
+def test_profiler_counts_calls_and_rows_per_statement(stocked, db_path):
+    profiler = SqlProfiler(slow_query_ms=10_000)
+    conn = sqlite3.connect(db_path, factory=profiler.connection_factory)
+    try:
+        for location in ("Central Hospital", "Rural Clinic A"):
+            conn.execute("SELECT drug_name FROM inventory WHERE location = ?", (location,)).fetchall()
+        rows = list(conn.execute("SELECT  drug_name\n FROM inventory"))
+    finally:
+        conn.close()
+
+    top = {entry["statement"]: entry for entry in profiler.top()}
+    by_location = top["SELECT drug_name FROM inventory WHERE location = ?"]
+    assert (by_location["calls"], by_location["rows"], by_location["slow"]) == (2, 4, 0)
+    assert top[normalise_sql("SELECT  drug_name\n FROM inventory")]["rows"] == len(rows) == 6
+    assert any(line.startswith("medchain_sql_statement_calls_total{") for line in profiler.render())
+
+
+def test_slow_statements_are_logged_with_their_plan(stocked, db_path, caplog):
+    profiler = SqlProfiler(slow_query_ms=0)
+    conn = sqlite3.connect(db_path, factory=profiler.connection_factory)
+    try:
+        with caplog.at_level(logging.WARNING, logger="medchain.sql"):
+            conn.execute("SELECT quantity FROM inventory WHERE batch_id = ?", ("PC-2024-001",)).fetchall()
+    finally:
+        conn.close()
+    [entry] = profiler.slow_queries
+    assert entry["statement"] == "SELECT quantity FROM inventory WHERE batch_id = ?"
+    assert any("idx_inventory_batch_id" in step for step in entry["plan"])
+    [record] = caplog.records
+    assert record.name == "medchain.sql"
+    assert "idx_inventory_batch_id" in record.getMessage()
+
+
+def test_middleware_times_requests_by_route_template():
+    metrics = Metrics()
+    metrics.add_collector(lambda: [("medchain_cache_entries", "gauge", "Cached responses", 3)])
+    app = FastAPI()
+
+    @app.get("/inventory/{location}")
+    def read(location: str):
+        add_phase("sql", 0.25)
+        return {"location": location}
+
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
+    with TestClient(app) as client:
+        client.get("/inventory/A")
+        client.get("/inventory/B")
+        client.get("/nowhere")
+    metrics.observe_ai("timeout", 20.0)
+
+    text = metrics.render()
+    assert 'medchain_http_requests_total{method="GET",route="/inventory/{location}",status="200"} 2' in text
+    assert 'medchain_http_requests_total{method="GET",route="(unmatched)",status="404"} 1' in text
+    assert 'medchain_http_request_phase_seconds_total{route="/inventory/{location}",phase="sql"} 0.500000' in text
+    assert 'medchain_ai_upstream_seconds_count{outcome="timeout"} 1' in text
+    assert "medchain_cache_entries 3" in text
@@ -0,0 +1,61 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+from hot_queries import HOT_QUERIES
+from migrations import LATEST_VERSION, MIGRATIONS, check_query_plans, current_version, migrate, query_plan
+
+
+def test_versions_are_contiguous_and_migrate_is_idempotent(conn):
+    assert [m.version for m in MIGRATIONS] == list(range(1, LATEST_VERSION + 1))
+    assert current_version(conn) == LATEST_VERSION
+    assert migrate(conn) == []
+
+
+def test_ledger_migration_opens_a_balance_per_stocked_pair(db_path):
+    conn = sqlite3.connect(db_path)
+    migrate(conn, target=7)
+    conn.execute("INSERT INTO inventory (location, drug_name, quantity) VALUES ('A', 'X', 12), ('A', 'Y', 0)")
+    conn.commit()
+    assert migrate(conn) == list(range(8, LATEST_VERSION + 1))
+    movements = conn.execute("SELECT location, drug_name, delta, reason FROM stock_movements").fetchall()
+    assert movements == [("A", "X", 12, "opening_balance")]
+    conn.close()
+
+
+def test_forecast_migration_logs_predictions_stored_before_the_run_log(db_path):
+    conn = sqlite3.connect(db_path)
+    migrate(conn, target=6)
+    conn.execute(
+        "INSERT INTO demand_predictions (location, drug_name, predicted_demand, confidence) VALUES ('A', 'X', 5, 0.5)"
+    )
+    conn.commit()
+    migrate(conn)
+    assert conn.execute("SELECT series, horizon_days, lookback_days FROM forecast_runs").fetchall() == [(1, 30, None)]
+    conn.close()
+
+
+def test_migrations_do_not_import_feature_modules():
+    # Each migration's DDL is frozen in migrations.py, so importing it must not pull in the app
+    script = "import sys, migrations; print(sorted({'aggregates', 'ledger', 'search', 'forecasting'} & set(sys.modules)))"
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.stdout.strip() == "[]"
+
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_query_does_not_scan_a_table(stocked, name):
+    sql, params = HOT_QUERIES[name]
+    tables = {row[0] for row in stocked.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    plan = query_plan(stocked, sql, params)
+    assert not [step for step in plan if step.startswith("SCAN ") and step.split()[1] in tables], plan
+    assert check_query_plans(stocked, {name: (sql, params)}) == {}
+
+
+def test_hot_queries_run_against_the_schema(stocked):
+    # The statements are the ones the endpoints execute, so they must be valid as built
+    for name, (sql, params) in HOT_QUERIES.items():
+        stocked.execute(sql, params).fetchall()
@@ -0,0 +1,64 @@
+from monitor import InventoryMonitor, read_alerts
+
+
+def open_alerts(conn):
+    return {
+        (alert["location"], alert["drugName"], alert["type"]): alert["severity"]
+        for alert in read_alerts(conn)["alerts"]
+    }
+
+
+def test_first_run_opens_one_alert_per_condition(stocked):
+    monitor = InventoryMonitor(threshold=50, window_days=30)
+    result = monitor.run(stocked)
+    assert (result["opened"], result["updated"], result["resolved"], result["open"]) == (7, 0, 0, 7)
+    assert result["locations"] == ["Central Hospital", "City Pharmacy", "Rural Clinic A"]
+    assert open_alerts(stocked) == {
+        ("Rural Clinic A", "Aspirin 325mg", "expired"): "critical",
+        ("City Pharmacy", "Ibuprofen 400mg", "expiring"): "medium",
+        ("Central Hospital", "Amoxicillin 250mg", "expiring"): "medium",
+        ("Rural Clinic A", "Aspirin 325mg", "low_stock"): "high",
+        ("City Pharmacy", "Aspirin 325mg", "low_stock"): "medium",
+        ("Rural Clinic A", "Paracetamol 500mg", "low_stock"): "medium",
+        ("Central Hospital", "Amoxicillin 250mg", "low_stock"): "medium",
+    }
+
+
+def test_repeated_runs_do_not_duplicate_or_touch_unchanged_alerts(stocked):
+    monitor = InventoryMonitor(threshold=50, window_days=30)
+    monitor.run(stocked)
+    again = monitor.run(stocked)
+    assert (again["opened"], again["updated"], again["resolved"], again["locations"]) == (0, 0, 0, [])
+    assert stocked.execute("SELECT COUNT(*) FROM alerts").fetchone()[0] == 7
+    assert monitor.stats()["runs"] == 2
+
+
+def test_changes_update_escalate_and_resolve_alerts(stocked):
+    monitor = InventoryMonitor(threshold=50, window_days=30)
+    monitor.run(stocked)
+    stocked.execute("UPDATE inventory SET quantity = 0 WHERE location = 'Rural Clinic A' AND drug_name = 'Aspirin 325mg'")
+    stocked.execute("UPDATE inventory SET quantity = 100 WHERE location = 'Central Hospital'")
+    stocked.execute("UPDATE inventory SET quantity = 5 WHERE location = 'City Pharmacy' AND drug_name = 'Aspirin 325mg'")
+    stocked.commit()
+
+    result = monitor.run(stocked)
+    assert (result["opened"], result["updated"], result["resolved"]) == (1, 1, 2)
+    alerts = open_alerts(stocked)
+    assert alerts[("Rural Clinic A", "Aspirin 325mg", "out_of_stock")] == "critical"
+    assert alerts[("City Pharmacy", "Aspirin 325mg", "low_stock")] == "high"
+    assert ("Rural Clinic A", "Aspirin 325mg", "low_stock") not in alerts
+    assert ("Central Hospital", "Amoxicillin 250mg", "low_stock") not in alerts
+    resolved = stocked.execute("SELECT COUNT(*) FROM alerts WHERE is_resolved = 1 AND resolved_at IS NOT NULL")
+    assert resolved.fetchone()[0] == 2
+
+
+def test_read_alerts_orders_by_severity_and_filters(stocked):
+    InventoryMonitor(threshold=50, window_days=30).run(stocked)
+    everything = read_alerts(stocked)
+    assert [alert["severity"] for alert in everything["alerts"]][:2] == ["critical", "high"]
+    assert everything["openBySeverity"] == {"critical": 1, "high": 1, "medium": 5}
+
+    clinic = read_alerts(stocked, location="Rural Clinic A", severity="medium")
+    assert [(a["drugName"], a["type"]) for a in clinic["alerts"]] == [("Paracetamol 500mg", "low_stock")]
+    assert clinic["openBySeverity"] == {"critical": 1, "high": 1, "medium": 1}
+    assert read_alerts(stocked, limit=2)["count"] == 2
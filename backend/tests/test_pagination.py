@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+import pagination
+from conftest import INVENTORY
+from database import ConnectionPool, DatabaseSettings
+from pagination import InvalidPageRequest, decode_cursor, encode_cursor, fetch_page, parse_fields
+
+PAIRS = sorted((row[0], row[1]) for row in INVENTORY)
+
+
+def test_parse_fields():
+    assert parse_fields(None) == pagination.DEFAULT_FIELDS
+    assert parse_fields(" name , quantity,") == ["name", "quantity"]
+    with pytest.raises(InvalidPageRequest, match="colour"):
+        parse_fields("name,colour")
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    cursor = encode_cursor("City Pharmacy", "Aspirin 325mg")
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == ("City Pharmacy", "Aspirin 325mg")
+    assert decode_cursor(None) is None
+    for bad in ("???", encode_cursor("a", "b")[:-3], "WzFd"):
+        with pytest.raises(InvalidPageRequest):
+            decode_cursor(bad)
+
+
+def test_pages_walk_the_whole_listing_in_key_order(stocked):
+    seen, after = [], None
+    while True:
+        rows, cursor = fetch_page(stocked, ["quantity"], 4, after=after)
+        seen += [(row[0], row[1]) for row in rows]
+        if cursor is None:
+            break
+        after = decode_cursor(cursor)
+    assert seen == PAIRS
+
+    rows, cursor = fetch_page(stocked, [], None)
+    assert [row[:2] for row in rows] == PAIRS and cursor is None
+
+
+def test_location_pages_seek_on_drug_name(stocked):
+    rows, cursor = fetch_page(stocked, ["name", "quantity"], 1, location="Rural Clinic A")
+    assert rows == [("Rural Clinic A", "Aspirin 325mg", "Aspirin 325mg", 8)]
+    rows, cursor = fetch_page(stocked, ["quantity"], 1, after=decode_cursor(cursor), location="Rural Clinic A")
+    assert rows == [("Rural Clinic A", "Paracetamol 500mg", 30)]
+    assert cursor is None
+
+
+def test_shape_row_fills_missing_nullable_fields():
+    assert pagination.shape_row(["name", "batchId", "quantity"], ("X", None, 0)) == {
+        "name": "X", "batchId": "N/A", "quantity": 0,
+    }
+
+
+def test_columnar_page():
+    rows = [("A", "x", "x", 1), ("A", "y", "y", 2)]
+    assert pagination.columnar_page(["name", "quantity"], rows) == {
+        "columns": ["location", "name", "quantity"], "data": [("A", "A"), ("x", "y"), (1, 2)],
+    }
+    assert pagination.columnar_page(["name", "quantity"], rows, with_location=False) == {
+        "columns": ["name", "quantity"], "data": [("x", "y"), (1, 2)],
+    }
+    assert pagination.columnar_page(["quantity"], [])["data"] == [(), ()]
+
+
+def test_streamed_documents_match_the_paged_listing(stocked, db_path, monkeypatch):
+    monkeypatch.setattr(pagination, "STREAM_CHUNK_SIZE", 2)
+    pool = ConnectionPool(DatabaseSettings(db_path, pool_size=1))
+    try:
+        everything = json.loads(b"".join(pagination.stream_all_inventory(pool, ["name", "quantity"])))
+        central = json.loads(b"".join(
+            pagination.stream_location_inventory(pool, ["name"], "Central Hospital")
+        ))
+        empty = json.loads(b"".join(pagination.stream_location_inventory(pool, ["name"], "Nowhere")))
+    finally:
+        pool.close()
+
+    assert everything["totalLocations"] == 3
+    assert sorted(
+        (location, drug["name"]) for location, drugs in everything["locations"].items() for drug in drugs
+    ) == PAIRS
+    assert central["drugs"] == [{"name": "Amoxicillin 250mg"}, {"name": "Paracetamol 500mg"}]
+    assert central["totalItems"] == 2
+    assert (empty["drugs"], empty["totalItems"]) == ([], 0)
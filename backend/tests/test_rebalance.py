@@ -0,0 +1,61 @@
+import numpy as np
+
+import rebalance
+
+
+def pairs(donors, receivers, quantities):
+    return list(zip(donors.tolist(), receivers.tolist(), quantities.tolist()))
+
+
+def test_match_moves_earliest_expiring_surplus_to_the_neediest_first():
+    drug = np.array([0, 0, 0, 0, 1, 1])
+    surplus = np.array([50, 30, 0, 0, 0, 5])
+    shortfall = np.array([0, 0, 40, 30, 20, 0])
+    expiry = np.array([200, 100, 0, 0, 0, 50])
+    position = np.array([0, 0, 10, 5, 1, 0])
+    result = rebalance.match_transfers(drug, surplus, shortfall, donor_rank=expiry, receiver_rank=position)
+    # Drug 0: row 1 expires first and row 3 is lowest; drug 1 is capped by its 5 units of surplus
+    assert pairs(*result) == [(1, 3, 30), (0, 2, 40), (5, 4, 5)]
+
+
+def test_match_with_nothing_to_move():
+    empty = np.array([], dtype=np.int64)
+    assert all(len(part) == 0 for part in rebalance.match_transfers(empty, empty, empty, empty, empty))
+    drug = np.array([0, 1])
+    result = rebalance.match_transfers(drug, np.array([10, 0]), np.array([0, 10]), np.zeros(2), np.zeros(2))
+    assert pairs(*result) == []
+
+
+def test_plan_proposes_surplus_that_will_not_expire_in_transit(stocked):
+    plan = rebalance.plan_transfers(stocked, 50)
+    assert [(p["drugName"], p["fromLocation"], p["toLocation"], p["quantity"]) for p in plan["proposals"]] == [
+        ("Paracetamol 500mg", "Central Hospital", "Rural Clinic A", 70),
+    ]
+    assert (plan["pairs"], plan["covered"], plan["shortfall"]) == (6, 70, 70 + 92 + 80 + 60)
+    assert plan["proposals"][0]["daysToExpiry"] == 200
+
+    # Central's paracetamol is too close to expiry to send anywhere
+    assert rebalance.plan_transfers(stocked, 50, min_shelf_days=365)["proposals"] == []
+    assert rebalance.plan_transfers(stocked, 50, location="City Pharmacy")["proposals"] == []
+    assert rebalance.plan_transfers(stocked, 50, drug_names=["Aspirin 325mg"])["pairs"] == 2
+
+
+def test_open_proposals_are_not_booked_twice(stocked):
+    stocked.execute("BEGIN IMMEDIATE")
+    created = rebalance.create_transfers(stocked, rebalance.plan_transfers(stocked, 50)["proposals"])
+    stocked.commit()
+    assert len(created) == 1 and created[0]["transferId"]
+    assert rebalance.plan_transfers(stocked, 50)["proposals"] == []
+    assert rebalance.create_transfers(stocked, []) == []
+
+    [proposal] = rebalance.read_proposals(stocked, status="proposed", location="Rural Clinic A")
+    assert (proposal["fromLocation"], proposal["quantity"]) == ("Central Hospital", 70)
+    assert rebalance.read_proposals(stocked, status="completed") == []
+
+
+def test_rebalance_endpoint_rejects_a_name_matching_several_drugs(client):
+    planned = client.post("/inventory/rebalance", json={"drugName": "0mg", "dryRun": True})
+    assert planned.status_code == 200 and len(planned.json()["drugNames"]) == 3
+    proposed = client.post("/inventory/rebalance", json={"drugName": "0mg"})
+    assert proposed.status_code == 422
+    assert proposed.json()["detail"]["matches"]["0mg"] == ["Amoxicillin 250mg", "Ibuprofen 400mg", "Paracetamol 500mg"]
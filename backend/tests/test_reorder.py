@@ -0,0 +1,76 @@
+import repository
+from reorder import MIN_ORDER_QUANTITY, create_reorders, plan_reorders
+
+
+def add_order(conn, location, drug_name, quantity, status):
+    conn.execute(
+        "INSERT INTO reorders (drug_name, quantity, location, status) VALUES (?, ?, ?, ?)",
+        (drug_name, quantity, location, status),
+    )
+
+
+def planned(plan):
+    return {(item["location"], item["drugName"]): item["orderQuantity"] for item in plan}
+
+
+def test_plan_covers_every_pair_below_threshold(stocked):
+    assert planned(plan_reorders(stocked, 50)) == {
+        ("Central Hospital", "Amoxicillin 250mg"): MIN_ORDER_QUANTITY,
+        ("City Pharmacy", "Aspirin 325mg"): MIN_ORDER_QUANTITY,
+        ("Rural Clinic A", "Aspirin 325mg"): MIN_ORDER_QUANTITY,
+        ("Rural Clinic A", "Paracetamol 500mg"): MIN_ORDER_QUANTITY,
+    }
+    assert set(planned(plan_reorders(stocked, 50, drug_names=["Aspirin 325mg"]))) == {
+        ("City Pharmacy", "Aspirin 325mg"), ("Rural Clinic A", "Aspirin 325mg"),
+    }
+    assert set(planned(plan_reorders(stocked, 50, location="Rural Clinic A"))) == {
+        ("Rural Clinic A", "Aspirin 325mg"), ("Rural Clinic A", "Paracetamol 500mg"),
+    }
+    assert plan_reorders(stocked, 50, drug_names=[]) == []
+
+
+def test_orders_are_sized_from_demand_and_inbound_stock(stocked):
+    stocked.execute("""
+        INSERT INTO demand_predictions (location, drug_name, predicted_demand, confidence)
+        VALUES ('Central Hospital', 'Amoxicillin 250mg', 900, 0.5), ('Central Hospital', 'Amoxicillin 250mg', 1000, 0.8)
+    """)
+    add_order(stocked, "Central Hospital", "Amoxicillin 250mg", 5, "shipped")
+    add_order(stocked, "City Pharmacy", "Aspirin 325mg", 40, "in_transit")
+    add_order(stocked, "Central Hospital", "Amoxicillin 250mg", 999, "delivered")
+    add_order(stocked, "Rural Clinic A", "Paracetamol 500mg", 500, "pending")
+
+    plan = {(item["location"], item["drugName"]): item for item in plan_reorders(stocked, 50)}
+    amoxicillin = plan[("Central Hospital", "Amoxicillin 250mg")]
+    # Latest prediction + threshold - stock - inbound
+    assert (amoxicillin["predictedDemand"], amoxicillin["inboundQuantity"]) == (1000, 5)
+    assert amoxicillin["orderQuantity"] == 1000 + 50 - 40 - 5
+    assert amoxicillin["supplier"] == "MediLab Inc"
+    # Already pending, or back above threshold once inbound stock arrives
+    assert ("Rural Clinic A", "Paracetamol 500mg") not in plan
+    assert ("City Pharmacy", "Aspirin 325mg") not in plan
+
+
+def test_create_reorders_writes_the_plan_once(stocked):
+    stocked.execute("BEGIN IMMEDIATE")
+    orders = create_reorders(stocked, plan_reorders(stocked, 50, location="City Pharmacy"), lead_time_days=3)
+    stocked.commit()
+    assert len(orders) == 1
+    order_id = int(orders[0]["orderId"].rsplit("-", 1)[1])
+    row = stocked.execute(
+        "SELECT location, drug_name, quantity, status, supplier FROM reorders WHERE id = ?", (order_id,)
+    ).fetchone()
+    assert row == ("City Pharmacy", "Aspirin 325mg", MIN_ORDER_QUANTITY, "pending", "Global Pharma")
+    assert plan_reorders(stocked, 50, location="City Pharmacy") == []
+    assert create_reorders(stocked, []) == []
+
+
+def test_place_reorders_dry_run_writes_nothing(stocked):
+    drug_names, plan = repository.place_reorders(stocked, ["aspirin"], 50, None, 5, dry_run=True)
+    assert drug_names == ["Aspirin 325mg"]
+    assert len(plan) == 2 and "orderId" not in plan[0]
+    assert stocked.execute("SELECT COUNT(*) FROM reorders").fetchone()[0] == 0
+
+    drug_names, orders = repository.place_reorders(stocked, [], 50, "Rural Clinic A", 5, dry_run=False)
+    assert drug_names is None
+    assert sorted(order["drugName"] for order in orders) == ["Aspirin 325mg", "Paracetamol 500mg"]
+    assert stocked.execute("SELECT COUNT(*) FROM reorders").fetchone()[0] == 2
@@ -0,0 +1,89 @@
+import pytest
+
+import search
+from reorder import AmbiguousDrugNames, UnknownDrugNames, resolve_drug_names
+
+
+def test_search_modes(stocked):
+    prefix = search.search_inventory(stocked, "As")
+    assert prefix["mode"] == "prefix"
+    assert {(r["location"], r["name"]) for r in prefix["results"]} == {
+        ("Rural Clinic A", "Aspirin 325mg"), ("City Pharmacy", "Aspirin 325mg"),
+    }
+
+    substring = search.search_inventory(stocked, "cetamol")
+    assert substring["mode"] == "substring"
+    assert {r["name"] for r in substring["results"]} == {"Paracetamol 500mg"}
+
+    by_manufacturer = search.search_inventory(stocked, "MediLab", location="Central Hospital")
+    assert [r["name"] for r in by_manufacturer["results"]] == ["Amoxicillin 250mg"]
+
+    fuzzy = search.search_inventory(stocked, "Amoxicilin")
+    assert fuzzy["mode"] == "fuzzy"
+    assert [r["name"] for r in fuzzy["results"]] == ["Amoxicillin 250mg"]
+    assert search.search_inventory(stocked, "Amoxicilin", fuzzy=False)["count"] == 0
+
+
+def test_match_drug_names(stocked):
+    assert search.match_drug_names(stocked, "aspirin") == ["Aspirin 325mg"]
+    assert search.match_drug_names(stocked, "Ibuprofen 800mg") == ["Ibuprofen 400mg"]
+    assert search.match_drug_names(stocked, "Ibuprofen 800mg", fuzzy=False) == []
+
+
+def test_resolve_drug_names_is_strict_unless_fuzzy(stocked):
+    assert resolve_drug_names(stocked, ["Aspirin 325mg", "paracetamol"]) == ["Aspirin 325mg", "Paracetamol 500mg"]
+
+    with pytest.raises(UnknownDrugNames) as error:
+        resolve_drug_names(stocked, ["Paracetamol 650mg", "Aspirin"])
+    # Suggestions are ranked by similarity; "Aspirin" matched as a substring
+    assert list(error.value.suggestions) == ["Paracetamol 650mg"]
+    assert error.value.suggestions["Paracetamol 650mg"][0] == "Paracetamol 500mg"
+
+    assert resolve_drug_names(stocked, ["Paracetamol 650mg"], fuzzy=True) == ["Paracetamol 500mg"]
+    with pytest.raises(UnknownDrugNames):
+        resolve_drug_names(stocked, ["Zzyzx"], fuzzy=True)
+
+
+def test_like_wildcards_match_literally(stocked):
+    assert sorted(search.match_drug_names(stocked, "A")) == ["Amoxicillin 250mg", "Aspirin 325mg"]
+    assert search.match_drug_names(stocked, "%") == []
+    assert search.match_drug_names(stocked, "_s") == []
+    assert search.search_inventory(stocked, "%", fuzzy=False)["count"] == 0
+
+
+def test_writes_reject_a_name_matching_several_drugs(stocked):
+    several = ["Amoxicillin 250mg", "Ibuprofen 400mg", "Paracetamol 500mg"]
+    assert resolve_drug_names(stocked, ["0mg"]) == several
+    with pytest.raises(AmbiguousDrugNames) as error:
+        resolve_drug_names(stocked, ["0mg", "aspirin"], single=True)
+    assert error.value.matches == {"0mg": several}
+    assert resolve_drug_names(stocked, ["aspirin"], single=True) == ["Aspirin 325mg"]
+
+
+def test_search_endpoint(client):
+    body = client.get("/inventory/search", params={"q": "ibuprofn"}).json()
+    assert body["mode"] == "fuzzy"
+    assert body["results"][0]["name"] == "Ibuprofen 400mg"
+
+
+@pytest.mark.parametrize("path, payload", [
+    ("/inventory/reorder", {"threshold": 100}),
+    ("/inventory/rebalance", {"threshold": 100, "minTransfer": 1}),
+])
+def test_write_paths_reject_fuzzy_names(client, path, payload):
+    response = client.post(path, json={**payload, "drugName": "Paracetamol 650mg"})
+    assert response.status_code == 422
+    assert response.json()["detail"]["suggestions"]["Paracetamol 650mg"][0] == "Paracetamol 500mg"
+    with client.main.db_pool.connection() as conn:
+        written = conn.execute(
+            "SELECT (SELECT COUNT(*) FROM reorders) + (SELECT COUNT(*) FROM transfer_proposals)"
+        ).fetchone()[0]
+    assert written == 0
+
+    # A dry run may resolve the name by fuzzy match, and says what it used
+    dry_run = client.post(path, json={**payload, "drugName": "Paracetamol 650mg", "dryRun": True})
+    assert dry_run.status_code == 200
+    assert dry_run.json()["drugNames"] == ["Paracetamol 500mg"]
+
+    substring = client.post(path, json={**payload, "drugName": "paracetamol", "dryRun": True})
+    assert substring.json()["drugNames"] == ["Paracetamol 500mg"]
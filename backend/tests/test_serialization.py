@@ -0,0 +1,54 @@
+import json
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from pydantic import BaseModel
+
+import serialization
+from metrics import RequestTimings, _current_timings
+
+
+class Item(BaseModel):
+    name: str
+    quantity: int
+
+
+def test_table_rows_and_columnar():
+    keys = ("name", "quantity")
+    rows = [("Aspirin 325mg", 8), ("Ibuprofen 400mg", None)]
+    assert serialization.table(keys, rows) == [
+        {"name": "Aspirin 325mg", "quantity": 8}, {"name": "Ibuprofen 400mg", "quantity": None},
+    ]
+    assert serialization.table(keys, rows, columnar=True) == {
+        "columns": ["name", "quantity"], "data": [("Aspirin 325mg", "Ibuprofen 400mg"), (8, None)],
+    }
+    assert serialization.table(keys, [], columnar=True) == {"columns": ["name", "quantity"], "data": [[], []]}
+
+
+def test_dumps_matches_the_standard_encoder_for_api_values():
+    body = {
+        "items": [Item(name="Aspirin 325mg", quantity=8)],
+        "checked": date(2024, 3, 1),
+        "total": Decimal("12.5"),
+        "ids": (1, 2),
+    }
+    assert json.loads(serialization.dumps(body)) == {
+        "items": [{"name": "Aspirin 325mg", "quantity": 8}],
+        "checked": "2024-03-01",
+        "total": 12.5,
+        "ids": [1, 2],
+    }
+
+
+@pytest.mark.skipif(serialization.orjson is None, reason="orjson not installed")
+def test_encode_time_is_added_to_the_request():
+    timings = RequestTimings()
+    token = _current_timings.set(timings)
+    try:
+        response = serialization.json_response({"ok": True})
+    finally:
+        _current_timings.reset(token)
+    assert response.body == b'{"ok":true}'
+    assert response.media_type == "application/json"
+    assert timings.encode > 0
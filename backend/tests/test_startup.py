@@ -0,0 +1,35 @@
+import importlib
+import os
+import sys
+
+
+def test_import_touches_neither_the_database_nor_the_gemini_sdk(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'app.db'}")
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    monkeypatch.setenv("WEB_CONCURRENCY", "1")
+    monkeypatch.delitem(sys.modules, "google.generativeai", raising=False)
+    sys.modules.pop("main", None)
+    try:
+        main = importlib.import_module("main")
+        assert os.listdir(tmp_path) == []
+        assert main.ai_client.available and not main.model.loaded
+        assert "google.generativeai" not in sys.modules
+    finally:
+        sys.modules.pop("main", None)
+
+
+def test_sample_rows_are_seeded_only_when_asked_for(make_client):
+    assert make_client().get("/inventory/all").json()["totalLocations"] == 0
+
+
+def test_seeding_adds_only_missing_pairs(make_client):
+    client = make_client(SEED_SAMPLE_DATA="1")
+    sample = client.main.SAMPLE_INVENTORY
+    body = client.get("/inventory/all").json()
+    assert sum(len(drugs) for drugs in body["locations"].values()) == len(sample)
+
+    # A restart finds every pair present and writes nothing
+    count = "SELECT COUNT(*) FROM stock_movements"
+    before = client.main.with_connection(lambda conn: conn.execute(count).fetchone()[0])
+    client.main.init_db()
+    assert client.main.with_connection(lambda conn: conn.execute(count).fetchone()[0]) == before